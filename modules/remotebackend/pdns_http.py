@@ -0,0 +1,77 @@
+"""Decoding the requests of the HTTP connector of the remotebackend, shared by unittest_http.py and
+regression-tests/dnsbackend.py"""
+
+import re
+
+from urllib.parse import parse_qsl, unquote
+
+# The arguments each method takes from the URL path (/dns/<method>/<arg>/...), with their types. The
+# rest comes from the query string or the form encoded body.
+ROUTES = {method: schema for methods, schema in (
+        (('lookup',), (('qname', str), ('qtype', str))),
+        (('list',), (('id', int), ('zonename', str))),
+        (('getbeforeandafternamesabsolute', 'getbeforeandafternames'), (('id', int), ('qname', str))),
+        (('getdomainmetadata', 'setdomainmetadata'), (('name', str), ('kind', str))),
+        (('getdomainkeys',), (('name', str),)),
+        (('removedomainkey', 'activatedomainkey', 'deactivatedomainkey'), (('id', int), ('name', str))),
+        (('adddomainkey', 'gettsigkey', 'getdomaininfo', 'settsigkey', 'deletetsigkey', 'getalldomainmetadata'),
+         (('name', str),)),
+        (('setnotified',), (('id', int),)),
+        (('feedents',), (('id', int), ('trxid', int))),
+        (('ismaster',), (('name', str), ('ip', str))),
+        (('supermasterbackend', 'createslavedomain'), (('ip', str), ('domain', str))),
+        (('feedents3', 'starttransaction'), (('id', int), ('domain', str), ('trxid', int))),
+        (('feedrecord', 'committransaction', 'aborttransaction'), (('trxid', int),)),
+        (('replacerrset',), (('id', int), ('qname', str), ('qtype', str))),
+) for method in methods}
+
+# rrset[0][qname]=... and rr[qname]=... or nsset[]=... in query strings and bodies
+MEMBER_LIST_KEY = re.compile(r"^(.*)\[(.*)\]\[(.*)\]")
+MEMBER_KEY = re.compile(r"^(.*)\[(.*)\]")
+
+
+class RequestArgs:
+    """Mixin for a BaseHTTPRequestHandler that sets self.method and self.args from the path, the
+    query string and the form encoded body of a request"""
+
+    def url_to_args(self):
+        path, _, query = self.path.partition('?')
+        parts = path.split("/")
+        self.method = None
+
+        if len(parts) < 3 or parts[1] != 'dns':
+            return
+
+        self.method = parts[2].lower()
+        schema = ROUTES.get(self.method, ())
+        assert len(parts) - 3 == len(schema), parts[3:]
+        self.args = {name: convert(unquote(part)) for (name, convert), part in zip(schema, parts[3:])}
+
+        if query:
+            self.parse_qsl(query)
+
+    def parse_qsl(self, qs):
+        res = {}
+        for key, value in parse_qsl(qs):
+            if '[' not in key:
+                res[key] = value
+                continue
+            m = MEMBER_LIST_KEY.match(key)
+            if m:
+                k1, k2, k3 = m.groups()
+                k2 = int(k2)
+                items = res.setdefault(k1, [])
+                while len(items) <= k2:
+                    items.append({})
+                items[k2][k3] = value
+                continue
+            m = MEMBER_KEY.match(key)
+            if m:
+                k1, k2 = m.groups()
+                if k2 == '':
+                    res.setdefault(k1, []).append(value)
+                else:
+                    res.setdefault(k1, {})[k2] = value
+            else:
+                res[key] = value
+        self.args.update(res)
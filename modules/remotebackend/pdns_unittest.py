@@ -1,6 +1,7 @@
 import pdns.remotebackend
 import sys
 import io
+import threading
 import time
 
 
@@ -63,6 +64,11 @@ MASTERS = {
     }
 }
 
+# Open transactions by trxid, shared by all Handlers as the calls of one transaction can
+# arrive on different connections
+TRANSACTIONS = {}
+TRANSACTIONS_LOCK = threading.Lock()
+
 class Handler(pdns.remotebackend.Handler):
     def get_domain(self, domain):
         if not domain.endswith("."):
@@ -255,30 +261,33 @@ class Handler(pdns.remotebackend.Handler):
         }
         self.result = True
 
-    def do_feedrecord(self, rr={}, **kwargs):
-        qname = rr['qname']
-        qtype = rr['qtype']
-        domain = self.get_domain(qname)
+    def do_feedrecord(self, rr={}, trxid=None, **kwargs):
+        trx = TRANSACTIONS.get(trxid)
+        if trx is not None:
+            # applied at commit
+            trx['records'].append(rr)
+            self.result = True
+            return
+        domain = self.get_domain(rr['qname'])
         if domain:
-            if not qname in domain['rr']:
-                domain['rr'][qname] = {qtype: []}
-            elif not qtype in domain['rr'][qname]:
-                 domain['rr'][qname][qtype] = []
-            domain['rr'][qname][qtype].append(self.record(
-                qname=qname,
-                qtype=qtype,
-                content=rr['content'],
-                ttl=rr.get('ttl', domain['ttl']))
-            )
+            self.add_records(domain['rr'], [rr])
             self.result = True
 
-    def do_replacerrset(self, qname='', qtype='', rrset=[], **kwargs):
+    def add_records(self, rrs, records):
+        for rr in records:
+            rrs.setdefault(rr['qname'], {}).setdefault(rr['qtype'], []).append(rr['content'])
+
+    def do_replacerrset(self, qname='', qtype='', rrset=[], trxid=None, **kwargs):
+        trx = TRANSACTIONS.get(trxid)
+        if trx is not None:
+            trx['rrsets'].append((qname, qtype, rrset))
+            self.result = True
+            return
         domain = self.get_domain(qname)
-        if domain and qname in domain['rr']:
-            if qtype in domain['rr'][qname]:
-                del domain['rr'][qname][qtype]
-        for row in rrset:
-            self.do_feedrecord(rr=row)
+        if domain:
+            domain['rr'].get(qname, {}).pop(qtype, None)
+            self.add_records(domain['rr'], rrset)
+            self.result = True
 
     def do_feedents(self, **kwargs):
         self.result = True
@@ -308,13 +317,42 @@ class Handler(pdns.remotebackend.Handler):
             del TSIG_KEYS[name]
             self.result = True
 
-    def do_starttransaction(self, **kwargs):
+    def do_starttransaction(self, domain='', domain_id=-1, trxid=None, **kwargs):
+        # the HTTP connector passes the domain_id in the path, which ends up as id
+        if domain_id == -1:
+            domain_id = kwargs.get('id', -1)
+        with TRANSACTIONS_LOCK:
+            # trxid is the time the transaction started, in seconds
+            if trxid in TRANSACTIONS:
+                self.log.append("transaction %s is already open" % trxid)
+                return
+            TRANSACTIONS[trxid] = {'domain': domain, 'domain_id': domain_id, 'records': [], 'rrsets': []}
         self.result = True
 
-    def do_committransaction(self, **kwargs):
+    def do_committransaction(self, trxid=None, **kwargs):
+        with TRANSACTIONS_LOCK:
+            trx = TRANSACTIONS.pop(trxid, None)
+        if trx is None:
+            return
+        domain = self.get_domain(trx['domain'])
+        if domain:
+            # build the new contents aside and swap them in, so lookups see either the old
+            # or the new zone
+            if trx['domain_id'] > -1:
+                rrs = {}
+            else:
+                rrs = {qname: {qtype: list(rr) for qtype, rr in rrset.items()}
+                       for qname, rrset in domain['rr'].items()}
+            self.add_records(rrs, trx['records'])
+            for qname, qtype, rrset in trx['rrsets']:
+                rrs.get(qname, {}).pop(qtype, None)
+                self.add_records(rrs, rrset)
+            domain['rr'] = rrs
         self.result = True
 
-    def do_aborttransaction(self, **kwargs):
+    def do_aborttransaction(self, trxid=None, **kwargs):
+        with TRANSACTIONS_LOCK:
+            TRANSACTIONS.pop(trxid, None)
         self.result = True
 
     def do_directbackendcmd(self, query='', **kwargs):
@@ -0,0 +1,89 @@
+"""Serving remotebackend requests on a zeromq socket, shared by unittest_zeromq.py and
+regression-tests/zeromq-backend.py.
+
+With a single REP socket (run) every request is handled in turn. Behind a ROUTER socket (broker)
+the requests are handed to a number of workers, each with a handler of its own."""
+
+import json
+import zlib
+import zmq
+
+
+def handle(handler, message):
+    """Handle one request, return the reply"""
+    try:
+        message = json.loads(message.decode().strip())
+        method = "do_%s" % message['method'].lower()
+        args = message['parameters']
+        handler.result = False
+        handler.log = []
+        if callable(getattr(handler, method, None)):
+            getattr(handler, method)(**args)
+        return json.dumps({'result': handler.result,'log': handler.log}).encode()
+    except BrokenPipeError as e2:
+        raise e2
+    except Exception as e:
+        print(e)
+        return json.dumps({'result':False}).encode()
+
+
+def run(socket, handler):
+    """Handle the requests on a REP socket, one at a time"""
+    while True:
+        message = socket.recv()
+        socket.send(handle(handler, message))
+
+
+def worker_identity(i):
+    return b'worker-%d' % i
+
+
+def worker(context, endpoint, identity, new_handler):
+    """Serve the requests the broker routes to identity, with a handler of our own.
+
+    new_handler is called (in the worker) to create the handler. context is None in a worker
+    process, contexts do not survive a fork."""
+    if context is None:
+        context = zmq.Context()
+    socket = context.socket(zmq.DEALER)
+    socket.setsockopt(zmq.IDENTITY, identity)
+    socket.connect(endpoint)
+    handler = new_handler()
+    socket.send_multipart([b'READY'])
+    try:
+        while True:
+            client, empty, message = socket.recv_multipart()
+            socket.send_multipart([client, empty, handle(handler, message)])
+    except (KeyboardInterrupt, zmq.ContextTerminated):
+        pass
+
+
+def broker(frontend, backend, workers):
+    """Pass requests from the ROUTER frontend to the workers and the replies back.
+
+    Every client (the REQ socket of one remotebackend instance in pdns_server) is always sent
+    to the same worker, so its requests are handled in order and the calls of a transaction
+    end up with the same handler."""
+    identities = [worker_identity(i) for i in range(workers)]
+    ready = set()
+    while len(ready) < workers:
+        ready.add(backend.recv_multipart()[0])
+
+    poller = zmq.Poller()
+    poller.register(frontend, zmq.POLLIN)
+    poller.register(backend, zmq.POLLIN)
+    while True:
+        events = dict(poller.poll())
+        # drain everything that is queued, one poll() per batch instead of per message
+        try:
+            while events.get(frontend):
+                client, empty, message = frontend.recv_multipart(zmq.NOBLOCK)
+                identity = identities[zlib.crc32(client) % workers]
+                backend.send_multipart([identity, client, empty, message])
+        except zmq.Again:
+            pass
+        try:
+            while events.get(backend):
+                frontend.send_multipart(backend.recv_multipart(zmq.NOBLOCK)[1:])
+        except zmq.Again:
+            pass
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+import collections
+import sys
+import threading
+
+import shareddb
+
+
+def _size(value):
+    """Approximate memory use of a result: lists and dicts of strings and numbers"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _size(k) + _size(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            size += _size(v)
+    return size
+
+
+class AnswerCache:
+    """LRU cache of backend answers.
+
+    Every entry is indexed by the names and domain ids it was derived from, so a write only
+    invalidates the entries for the names or domains it touched. Writes to the database by
+    anybody else (e.g. sqlite3 on the command line) are noticed through the SharedDatabase and
+    clear the whole cache.
+
+    A lookup that missed reads the database and then puts its answer. When a write is invalidated
+    in between, that answer may be from before the write; put() drops it when the generation read
+    at miss time is no longer current."""
+
+    def __init__(self, dbpath, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.by_name = {}
+        self.by_domain = {}
+        self.lock = threading.Lock()
+        self.database = shareddb.shared(shareddb.SharedDatabase, dbpath)
+        self.data_version = self.database.version()
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.flushes = 0
+        self.stale_puts = 0
+        # bumped by every invalidation and flush
+        self.generation = 0
+
+    def _check(self):
+        changed, self.data_version = self.database.changed_since(self.data_version)
+        if changed:
+            self._clear()
+            self.generation += 1
+            self.flushes += 1
+
+    def _clear(self):
+        self.entries.clear()
+        self.by_name.clear()
+        self.by_domain.clear()
+        self.memory = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        value, names, domains, size = entry
+        self.memory -= size
+        for name in names:
+            keys = self.by_name.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_name[name]
+        for domain_id in domains:
+            keys = self.by_domain.get(domain_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_domain[domain_id]
+
+    def get(self, key):
+        """Return (True, value) when key is cached, (False, None) otherwise"""
+        with self.lock:
+            self._check()
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, names=(), domains=(), generation=None):
+        """Cache value, to be invalidated when any of names or domains changes.
+
+        generation is the value of self.generation from before value was read from the database;
+        when there was an invalidation since, value may be stale and is not cached."""
+        names = frozenset(name.lower() for name in names)
+        domains = frozenset(domains)
+        size = _size(key) + _size(value)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                self.stale_puts += 1
+                return
+            self._remove(key)
+            self.entries[key] = (value, names, domains, size)
+            self.memory += size
+            for name in names:
+                self.by_name.setdefault(name, set()).add(key)
+            for domain_id in domains:
+                self.by_domain.setdefault(domain_id, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, names=(), domains=()):
+        """Drop the entries for names and domains, after the database was changed by us"""
+        with self.lock:
+            self.generation += 1
+            for name in names:
+                for key in list(self.by_name.get(name.lower(), ())):
+                    self._remove(key)
+                    self.invalidations += 1
+            for domain_id in domains:
+                for key in list(self.by_domain.get(domain_id, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'memory_bytes': self.memory,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'flushes': self.flushes,
+                'stale_puts': self.stale_puts,
+            }
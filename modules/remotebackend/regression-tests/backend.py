@@ -1,14 +1,105 @@
 #!/usr/bin/env python
 
-import sqlite3
+import json
+import threading
 from pdns.remotebackend import Handler
+import answercache
+import catalog
+import orderindex
+import shareddb
+import snapshot
+
+# Indexes for the queries below, created when missing from the database. records_lookup serves
+# lookups by name (and type and domain), records_order covers the NSEC(3) ordername queries
+# and the listing of a domain.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS records_lookup ON records(name, type, domain_id)",
+    "CREATE INDEX IF NOT EXISTS records_order ON records(domain_id, ordername)",
+]
+
+# rows fetched from the database at a time when listing a domain
+LIST_BATCH = 1000
+
+INSERT_RECORD = "INSERT INTO records (domain_id, name, type, content, ttl, prio, ordername, auth) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+# Open transactions by trxid. They are shared by all handlers, as the calls of one transaction
+# can arrive on different connections (and threads). pdns_server takes the trxid from the clock,
+# in seconds, so a second transaction started in the same second is refused rather than mixed
+# up with the first.
+transactions = {}
+transactions_lock = threading.Lock()
+
+
+class Transaction:
+    """The changes of a transaction, applied to the database at once on commit"""
+    def __init__(self, domain_id, domain, feed_domain_id):
+        # a domain_id means the transaction replaces the whole zone (e.g. an AXFR)
+        self.domain_id = domain_id
+        self.domain = domain
+        # the domain of the records fed, None when domain does not exist
+        self.feed_domain_id = feed_domain_id
+        self.records = []
+        self.rrsets = {}
+        self.names = set()
 
 
 class BackendHandler(Handler):
     def __init__(self, options={}):
         super().__init__(options=options)
         self.dbpath = options['dbpath']
-        self.db = sqlite3.connect(self.dbpath)
+        self.local = threading.local()
+        # all writes go through this one connection, see SharedDatabase
+        self.database = shareddb.shared(shareddb.SharedDatabase, self.dbpath)
+        with self.database.transaction() as db:
+            for sql in INDEXES:
+                db.execute(sql)
+        cache_size = int(options.get('cache_size', 10000))
+        self.cache = shareddb.shared(answercache.AnswerCache, self.dbpath, cache_size) if cache_size > 0 else None
+        self.order = shareddb.shared(orderindex.OrderIndex, self.dbpath)
+        self.catalog = shareddb.shared(catalog.DomainCatalog, self.dbpath)
+        # lookups are served from a shared snapshot of the records, see prefork-backend.py
+        self.snapshot = snapshot.shared_reader(options['snapshot']) if options.get('snapshot') else None
+
+    @property
+    def db(self):
+        """The connection of the current thread for reading, sqlite connections cannot be shared between threads"""
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = self.local.db = shareddb.connect(self.dbpath)
+        return db
+
+    def cached(self, key):
+        """Return (True, answer) when the answer for key is cached, (False, None) otherwise"""
+        if self.cache is None:
+            return False, None
+        found, value = self.cache.get(key)
+        if not found:
+            # read before the database is, see AnswerCache.put
+            self.local.miss = (key, self.cache.generation)
+        # the connectors may modify results (e.g. add scopeMask), give them a copy
+        if isinstance(value, list):
+            value = [dict(v) if isinstance(v, dict) else v for v in value]
+        elif isinstance(value, dict):
+            value = dict(value)
+        return found, value
+
+    def store(self, key, value, names=(), domains=()):
+        if self.cache is not None:
+            miss_key, generation = getattr(self.local, 'miss', (None, None))
+            if miss_key != key:
+                generation = None
+            self.local.miss = (None, None)
+            self.cache.put(key, value, names=names, domains=domains, generation=generation)
+
+    def invalidate(self, names=(), domains=()):
+        """Drop the cached answers for names and domains after changing them"""
+        if self.cache is not None:
+            self.cache.invalidate(names=names, domains=domains)
+
+    def records_changed(self):
+        """Stop using the snapshot after changing records, until a new one is taken"""
+        if self.snapshot is not None:
+            self.snapshot.changed()
 
     def get_domain_id(self, name):
         cur = self.db.execute("SELECT id FROM domains WHERE name = ?", (name,))
@@ -28,32 +119,11 @@ class BackendHandler(Handler):
                 'ttl': ttl, 'auth': auth, 'domain_id': domain_id}
 
     # ends up here as qname=qname, id=id
-    def getbeforename(self, **kwargs):
-        cur = self.db.execute("SELECT ordername FROM records WHERE ordername < :qname AND domain_id = :id ORDER BY ordername DESC LIMIT 1", kwargs)
-        row = cur.fetchone()
-        if not row:
-            cur = self.db.execute("SELECT ordername FROM records WHERE domain_id = :id ORDER by ordername DESC LIMIT 1", kwargs)
-            row = cur.fetchone()
-        result = row[0]
-        if row[0] is None:
-            result = ''
-        return result
-
-    def getaftername(self, **kwargs):
-        cur = self.db.execute("SELECT ordername FROM records WHERE ordername > :qname AND domain_id = :id ORDER BY ordername LIMIT 1", kwargs)
-        row = cur.fetchone()
-        if row is None:
-            cur = self.db.execute("SELECT ordername FROM records WHERE domain_id = :id ORDER by ordername LIMIT 1", kwargs)
-            row = cur.fetchone()
-        result = row[0]
-        if row[0] is None:
-            result = ''
-        return result
-
     def do_getbeforeandafternamesabsolute(self, **kwargs):
+        before, after = self.order.before_and_after(self.db, int(kwargs['id']), kwargs['qname'])
         self.result = {
-            'before':   self.getbeforename(**kwargs),
-            'after':    self.getaftername(**kwargs),
+            'before':   before,
+            'after':    after,
             'unhashed': kwargs['qname']
         }
 
@@ -61,6 +131,11 @@ class BackendHandler(Handler):
         self.do_getbeforeandafternamesabsolute(**kwargs)
 
     def do_getdomainkeys(self, name, **kwargs):
+        key = ('keys', name.lower())
+        found, self.result = self.cached(key)
+        if found:
+            self.log.append(self.dbpath)
+            return
         self.result = []
         cur = self.db.execute("SELECT cryptokeys.id, flags, active, published, content FROM domains JOIN cryptokeys ON domains.id = cryptokeys.domain_id WHERE domains.name = :name", {'name':name})
         for row in cur.fetchall():
@@ -73,12 +148,23 @@ class BackendHandler(Handler):
             })
         if len(self.result) == 0:
             self.result = False
+        self.store(key, self.result, names=(name,))
         self.log.append(self.dbpath)
 
     def do_lookup(self, qname='', qtype='', domain_id=-1, **kwargs):
         self.result = []
         if kwargs.get('zone-id', -1) > 0:
             domain_id = kwargs['zone-id']
+        if self.snapshot is not None:
+            current = self.snapshot.current()
+            if current is not None:
+                self.result = current.lookup(qname, qtype, domain_id)
+                return
+        key = ('lookup', qname.lower(), qtype, domain_id)
+        found, result = self.cached(key)
+        if found:
+            self.result = result
+            return
         if domain_id > -1:
             if qtype == "ANY":
                 sql = "SELECT domain_id,name,type,content,ttl,prio,auth FROM records WHERE name = :qname AND domain_id = :domain_id"
@@ -92,40 +178,52 @@ class BackendHandler(Handler):
         cur = self.db.execute(sql, {'qname': qname, 'qtype': qtype, 'domain_id': domain_id})
         for row in cur.fetchall():            
             self.result.append(self.record(qname=row[1],qtype=row[2],content=row[3],ttl=row[4],prio=row[5],auth=row[6],domain_id=row[0]))
+        domains = {r['domain_id'] for r in self.result}
+        if domain_id > -1:
+            domains.add(domain_id)
+        self.store(key, self.result, names=(qname,), domains=domains)
 
     def do_getdomaininfo(self, name='', **kwargs):
-        self.result = False
-        cur = self.db.execute("SELECT domain_id,name,content FROM records WHERE name = :name AND type = 'SOA'", {'name': name})
-        for row in cur.fetchall():
-            self.result = {
-                'zone': row[1],
-                'serial': int(row[2].split(' ')[2]),
-                'kind': 'native',
-                'id': row[0],
-            }
+        info = self.catalog.get(self.db, name)
+        self.result = info if info is not None else False
 
-    def do_getalldomains(self):
-        self.result = []
-        cur = self.db.execute("SELECT domain_id,name,content FROM records WHERE name = :name AND type = 'SOA'", {'name': name})
-        for row in cur.fetchall():
-            self.result.append({
-                'zone': row[1],
-                'serial': int(row[2].split(' ')[2]),
-                'kind': 'native',
-                'id': row[0],
-            })
+    def do_getalldomains(self, **kwargs):
+        self.result = self.catalog.all(self.db)
 
-    def do_list(self, zonename='', domain_id=-1, **kwargs):
+    def do_getupdatedmasters(self, **kwargs):
+        self.result = self.catalog.updated_masters(self.db)
+
+    def do_setnotified(self, id, serial, **kwargs):
+        with self.database.transaction() as db:
+            db.execute("UPDATE domains SET notified_serial = ? WHERE id = ?", (int(serial), int(id)))
+        self.catalog.refresh(self.db, (int(id),))
+        self.result = True
+
+    def iter_list(self, zonename='', domain_id=-1, **kwargs):
+        """Like do_list, but return an iterator that fetches the records from the database in batches
+        as they are consumed, or None when there is no such domain"""
         if domain_id == -1:
             try:
                 domain_id = self.get_domain_id(zonename)
             except KeyError:
-                return
+                return None
         if domain_id > -1:
-            self.result = []
             cur = self.db.execute("SELECT domain_id,name,type,content,ttl,prio,auth FROM records WHERE domain_id = ?", (domain_id,))
-            for row in cur.fetchall():
-                self.result.append(self.record(qname=row[1],qtype=row[2],content=row[3],ttl=row[4],prio=row[5],auth=row[6],domain_id=row[0]))
+            return self.iter_rows(cur)
+        return None
+
+    def iter_rows(self, cur):
+        while True:
+            rows = cur.fetchmany(LIST_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                yield self.record(qname=row[1],qtype=row[2],content=row[3],ttl=row[4],prio=row[5],auth=row[6],domain_id=row[0])
+
+    def do_list(self, zonename='', domain_id=-1, **kwargs):
+        records = self.iter_list(zonename=zonename, domain_id=domain_id)
+        if records is not None:
+            self.result = list(records)
 
     def do_adddomainkey(self, name, key, **kwargs):
         try:
@@ -134,8 +232,9 @@ class BackendHandler(Handler):
             return
         key['domain_id'] = domain_id
 
-        cur = self.db.execute("INSERT INTO cryptokeys (domain_id, flags, active, published, content) VALUES(:domain_id, :flags, :active, :published, :content)", key)
-        self.db.commit()
+        with self.database.transaction() as db:
+            cur = db.execute("INSERT INTO cryptokeys (domain_id, flags, active, published, content) VALUES(:domain_id, :flags, :active, :published, :content)", key)
+        self.invalidate(names=(name,))
 
         self.result = cur.lastrowid
         self.log.append(self.dbpath)
@@ -147,8 +246,9 @@ class BackendHandler(Handler):
             return
         kwargs['domain_id'] = domain_id
 
-        self.db.execute("UPDATE cryptokeys SET active = 0 WHERE domain_id = :domain_id AND id = :id", kwargs)
-        self.db.commit()
+        with self.database.transaction() as db:
+            db.execute("UPDATE cryptokeys SET active = 0 WHERE domain_id = :domain_id AND id = :id", kwargs)
+        self.invalidate(names=(kwargs['name'],))
 
         self.result = True
 
@@ -159,8 +259,9 @@ class BackendHandler(Handler):
             return
         kwargs['domain_id'] = domain_id
 
-        self.db.execute("UPDATE cryptokeys SET active = 1 WHERE domain_id = :domain_id AND id = :id", kwargs)
-        self.db.commit()
+        with self.database.transaction() as db:
+            db.execute("UPDATE cryptokeys SET active = 1 WHERE domain_id = :domain_id AND id = :id", kwargs)
+        self.invalidate(names=(kwargs['name'],))
 
         self.result = True
 
@@ -171,8 +272,9 @@ class BackendHandler(Handler):
             return
         kwargs['domain_id'] = domain_id
 
-        self.db.execute("UPDATE cryptokeys SET published = 0 WHERE domain_id = :domain_id AND id = :id", kwargs)
-        self.db.commit()
+        with self.database.transaction() as db:
+            db.execute("UPDATE cryptokeys SET published = 0 WHERE domain_id = :domain_id AND id = :id", kwargs)
+        self.invalidate(names=(kwargs['name'],))
 
         self.result = True
 
@@ -183,8 +285,22 @@ class BackendHandler(Handler):
             return
         kwargs['domain_id'] = domain_id
 
-        self.db.execute("UPDATE cryptokeys SET published = 1 WHERE domain_id = :domain_id AND id = :id", kwargs)
-        self.db.commit()
+        with self.database.transaction() as db:
+            db.execute("UPDATE cryptokeys SET published = 1 WHERE domain_id = :domain_id AND id = :id", kwargs)
+        self.invalidate(names=(kwargs['name'],))
+
+        self.result = True
+
+    def do_removedomainkey(self, **kwargs):
+        try:
+            domain_id = self.get_domain_id(kwargs['name'])
+        except KeyError:
+            return
+        kwargs['domain_id'] = domain_id
+
+        with self.database.transaction() as db:
+            db.execute("DELETE FROM cryptokeys WHERE domain_id = :domain_id AND id = :id", kwargs)
+        self.invalidate(names=(kwargs['name'],))
 
         self.result = True
 
@@ -206,23 +322,116 @@ class BackendHandler(Handler):
         except KeyError:
             return
 
-        self.db.execute("DELETE FROM domainmetadata WHERE domain_id = :domain_id AND kind = :kind", {
-                'domain_id': domain_id,
-                'kind': kind
-        })
-        if value:
-            self.db.execute("INSERT INTO domainmetadata (domain_id,kind,content) VALUES(:domain_id, :kind, :content)", {
-                'domain_id': domain_id,
-                'kind': kind,
-                'content': content
+        with self.database.transaction() as db:
+            db.execute("DELETE FROM domainmetadata WHERE domain_id = :domain_id AND kind = :kind", {
+                    'domain_id': domain_id,
+                    'kind': kind
             })
-        self.db.commit()
+            if value:
+                db.execute("INSERT INTO domainmetadata (domain_id,kind,content) VALUES(:domain_id, :kind, :content)", {
+                    'domain_id': domain_id,
+                    'kind': kind,
+                    'content': content
+                })
+
+    def record_row(self, rr, domain_id):
+        """Turn a record from feedRecord or replaceRRSet into a row of the records table"""
+        content = rr['content']
+        prio = 0
+        if rr['qtype'] in ('MX', 'SRV'):
+            prio, content = content.split(' ', 1)
+            prio = int(prio)
+        ordername = rr.get('ordername')
+        if ordername is not None:
+            ordername = ordername.rstrip('.')
+        return (domain_id, rr['qname'], rr['qtype'], content, rr.get('ttl', self.ttl), prio, ordername,
+                int(bool(rr.get('auth', 1))))
+
+    def replace_rrset(self, db, domain_id, qname, qtype, rows):
+        """Replace an RRSet, return the (domain_id, ordername) of the records it removed"""
+        removed = db.execute("SELECT domain_id, ordername FROM records WHERE domain_id = ? AND name = ? AND type = ?", (domain_id, qname, qtype)).fetchall()
+        db.execute("DELETE FROM records WHERE domain_id = ? AND name = ? AND type = ?", (domain_id, qname, qtype))
+        db.executemany(INSERT_RECORD, rows)
+        return removed
+
+    def do_starttransaction(self, trxid, domain_id=-1, domain='', **kwargs):
+        # the HTTP connector passes the domain_id in the path, which ends up as id
+        if domain_id == -1:
+            domain_id = kwargs.get('id', -1)
+        feed_domain_id = domain_id
+        if feed_domain_id == -1:
+            try:
+                feed_domain_id = self.get_domain_id(domain)
+            except KeyError:
+                feed_domain_id = None
+        with transactions_lock:
+            if trxid in transactions:
+                self.result = False
+                self.log.append("transaction %s is already open" % trxid)
+                return
+            transactions[trxid] = Transaction(domain_id, domain, feed_domain_id)
+        self.result = True
+
+    def do_feedrecord(self, rr, trxid, **kwargs):
+        trx = transactions.get(trxid)
+        if trx is None or trx.feed_domain_id is None:
+            return
+        trx.records.append(self.record_row(rr, trx.feed_domain_id))
+        trx.names.add(rr['qname'])
+        self.result = True
 
-    def do_starttransaction(self, trxid, **kwargs):
-        pass
+    def do_replacerrset(self, domain_id=-1, qname='', qtype='', rrset=(), trxid=-1, **kwargs):
+        if domain_id == -1:
+            domain_id = kwargs.get('id', -1)
+        rows = [self.record_row(rr, domain_id) for rr in rrset]
+        trx = transactions.get(trxid)
+        if trx is not None:
+            # a later replace of the same RRSet wins
+            trx.rrsets[(domain_id, qname, qtype)] = rows
+            trx.names.add(qname)
+        else:
+            with self.order.lock:
+                with self.database.transaction() as db:
+                    removed = self.replace_rrset(db, domain_id, qname, qtype, rows)
+                self.order.apply(added=[(row[0], row[6]) for row in rows], removed=removed)
+            self.invalidate(names=(qname,))
+            self.records_changed()
+            self.catalog.refresh(self.db, (domain_id,) if qtype == 'SOA' else ())
+        self.result = True
 
     def do_committransaction(self, trxid, **kwargs):
-        pass
+        with transactions_lock:
+            trx = transactions.pop(trxid, None)
+        if trx is None:
+            return
+        dropped = (trx.domain_id,) if trx.domain_id > -1 else ()
+        added = [(row[0], row[6]) for row in trx.records]
+        removed = []
+        with self.order.lock:
+            # one sqlite transaction, so readers keep seeing the old zone until it is committed
+            with self.database.transaction() as db:
+                if trx.domain_id > -1:
+                    db.execute("DELETE FROM records WHERE domain_id = ?", (trx.domain_id,))
+                db.executemany(INSERT_RECORD, trx.records)
+                for (domain_id, qname, qtype), rows in trx.rrsets.items():
+                    removed.extend(self.replace_rrset(db, domain_id, qname, qtype, rows))
+                    added.extend((row[0], row[6]) for row in rows)
+            self.order.apply(added=added, removed=removed, dropped=dropped)
+        self.invalidate(names=trx.names, domains=dropped)
+        self.records_changed()
+        soa_domains = set(dropped)
+        soa_domains.update(row[0] for row in trx.records if row[2] == 'SOA')
+        soa_domains.update(domain_id for domain_id, qname, qtype in trx.rrsets if qtype == 'SOA')
+        self.catalog.refresh(self.db, soa_domains)
+        self.result = True
+
+    def do_aborttransaction(self, trxid, **kwargs):
+        with transactions_lock:
+            transactions.pop(trxid, None)
+        self.result = True
 
     def do_directbackendcmd(self, query, **kwargs):
+        if query == 'cache-stats' and self.cache is not None:
+            self.result = json.dumps(self.cache.stats())
+            return
         self.result = query
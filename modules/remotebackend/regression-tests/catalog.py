@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import threading
+
+import shareddb
+
+# every domain with the SOA record at its apex, if it has one
+SELECT_DOMAINS = """SELECT domains.id, domains.name, domains.type, domains.master, domains.notified_serial, domains.last_check, records.content
+  FROM domains LEFT JOIN records ON records.domain_id = domains.id AND records.name = domains.name AND records.type = 'SOA'"""
+
+
+def domain_info(row):
+    """The getDomainInfo result for a row of SELECT_DOMAINS, with the serial taken from the SOA once"""
+    domain_id, name, kind, masters, notified_serial, last_check, soa = row
+    serial = 0
+    if soa:
+        parts = soa.split(' ')
+        if len(parts) > 2:
+            serial = int(parts[2])
+    return {
+        'id': domain_id,
+        'zone': name,
+        'kind': (kind or 'native').lower(),
+        'serial': serial,
+        'notified_serial': notified_serial or 0,
+        'masters': [master.strip() for master in masters.split(',')] if masters else [],
+        'last_check': last_check or 0,
+    }
+
+
+class DomainCatalog:
+    """The domains with their kind, serial and notified serial, for getDomainInfo, getAllDomains and
+    getUpdatedMasters.
+
+    Loaded from the database on first use. Handlers refresh the domains they change (a new SOA,
+    setNotified); writes by anybody else are noticed through the SharedDatabase and reload the
+    whole catalog."""
+
+    def __init__(self, dbpath):
+        self.by_name = None
+        self.by_id = None
+        self.lock = threading.Lock()
+        self.database = shareddb.shared(shareddb.SharedDatabase, dbpath)
+        self.data_version = None
+
+    def _add(self, info):
+        self.by_name[info['zone'].lower()] = info
+        self.by_id[info['id']] = info
+
+    def _domains(self, db):
+        """The catalog, loaded or reloaded when the database was changed behind our back"""
+        changed, self.data_version = self.database.changed_since(self.data_version)
+        if self.by_name is None or changed:
+            self.by_name = {}
+            self.by_id = {}
+            for row in db.execute(SELECT_DOMAINS):
+                self._add(domain_info(row))
+        return self.by_name
+
+    def get(self, db, name):
+        """The domain info for name, or None"""
+        with self.lock:
+            info = self._domains(db).get(name.lower())
+            return dict(info) if info is not None else None
+
+    def all(self, db):
+        with self.lock:
+            return [dict(info) for info in self._domains(db).values()]
+
+    def updated_masters(self, db):
+        """Master domains with a serial that has not been notified yet"""
+        with self.lock:
+            return [dict(info) for info in self._domains(db).values()
+                    if info['kind'] == 'master' and info['serial'] != info['notified_serial']]
+
+    def refresh(self, db, domain_ids):
+        """Read domain_ids again after we changed them in the database"""
+        with self.lock:
+            if self.by_name is not None:
+                for domain_id in domain_ids:
+                    old = self.by_id.pop(domain_id, None)
+                    if old is not None:
+                        self.by_name.pop(old['zone'].lower(), None)
+                    for row in db.execute(SELECT_DOMAINS + " WHERE domains.id = ?", (domain_id,)):
+                        self._add(domain_info(row))
@@ -1,106 +1,68 @@
 #!/usr/bin/env python
 
 import http.server
+import itertools
 import json
-import re
+import socketserver
+import threading
+import traceback
 
-from urllib.parse import parse_qsl, urlparse, unquote
+from pdns_http import RequestArgs
+from streaming import json_reply, stream_method
+
+
+class DNSBackendServer(http.server.HTTPServer):
+    """Serves one request at a time, closing the connection after each one"""
+    keep_alive = False
+
+    def __init__(self, server_address, RequestHandlerClass, handler_class, options={}):
+        self.handler_class = handler_class
+        self.options = options
+        self.local = threading.local()
+        super().__init__(server_address, RequestHandlerClass)
+
+    @property
+    def handler(self):
+        """The backend handler of the current thread, handlers keep per-request state"""
+        handler = getattr(self.local, 'handler', None)
+        if handler is None:
+            handler = self.local.handler = self.handler_class(options=self.options)
+        return handler
+
+    def finish_request(self, request, client_address):
+        """Finish one request by instantiating RequestHandlerClass."""
+        h = self.RequestHandlerClass(request, client_address, self, handler=self.handler)
+
+
+class ThreadingDNSBackendServer(socketserver.ThreadingMixIn, DNSBackendServer):
+    """Serves every connection in its own thread and keeps connections open between requests (HTTP/1.1), so each
+    remotebackend instance in pdns_server gets a persistent connection that does not wait for the others"""
+    daemon_threads = True
+    keep_alive = True
+
+
+class DNSBackendHandler(RequestArgs, http.server.BaseHTTPRequestHandler):
+    # headers and body are separate writes, which would otherwise wait for the delayed ACK on persistent connections
+    disable_nagle_algorithm = True
 
-class DNSBackendHandler(http.server.BaseHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         self.handler = kwargs['handler']
+        if args[2].keep_alive:
+            self.protocol_version = 'HTTP/1.1'
         super().__init__(*args)
 
-    def url_to_args(self):
-        url = urlparse(self.path)
-        parts = list(map(lambda part: unquote(part), url.path.split("/")))
-        parts.pop(0)
-        self.method = None
-
-        if parts.pop(0) != 'dns':
-            return
-
-        self.method = parts.pop(0).lower()
-        self.args = {}
-
-        if self.method == 'lookup':
-            self.args['qname'] = parts.pop(0)
-            self.args['qtype'] = parts.pop(0)
-        elif self.method == 'list':
-            self.args['id'] = int(parts.pop(0))
-            self.args['zonename'] = parts.pop(0)
-        elif self.method in ('getbeforeandafternamesabsolute', 'getbeforeandafternames'):
-            self.args['id'] = int(parts.pop(0))
-            self.args['qname'] = parts.pop(0)
-        elif self.method in ('getdomainmetadata', 'setdomainmetadata'):
-            self.args['name'] = parts.pop(0)
-            self.args['kind'] = parts.pop(0)
-        elif self.method == 'getdomainkeys':
-            self.args['name'] = parts.pop(0)
-        elif self.method in ('removedomainkey', 'activatedomainkey', 'deactivatedomainkey'):
-            self.args['id'] = int(parts.pop(0))
-            self.args['name'] = parts.pop(0)
-        elif self.method in ('adddomainkey', 'gettsigkey', 'getdomaininfo', 'settsigkey', 'deletetsigkey', 'getalldomainmetadata'):
-            self.args['name'] = parts.pop(0)
-        elif self.method == 'setnotified':
-            self.args['id'] = int(parts.pop(0))
-        elif self.method == 'feedents':
-            self.args['id'] = int(parts.pop(0))
-            self.args['trxid'] = int(parts.pop(0))
-        elif self.method == 'ismaster':
-            self.args['name'] = parts.pop(0)
-            self.args['ip'] = parts.pop(0)
-        elif self.method in ('supermasterbackend', 'createslavedomain'):
-            self.args['ip'] = parts.pop(0)
-            self.args['domain'] = parts.pop(0)
-        elif self.method in ('feedents3', 'starttransaction'):
-            self.args['id'] = int(parts.pop(0))
-            self.args['domain'] = parts.pop(0)
-            self.args['trxid'] = int(parts.pop(0))
-        elif self.method in ('feedrecord', 'committransaction', 'aborttransaction'):
-            self.args['trxid'] = int(parts.pop(0))
-        elif self.method == 'replacerrset':
-            self.args['id'] = int(parts.pop(0))
-            self.args['qname'] = parts.pop(0)
-            self.args['qtype'] = parts.pop(0)
-        assert len(parts) == 0, parts
-
-        self.parse_qsl(url.query)
-
-    def parse_qsl(self, qs):
-        res = {}
-        for key, value in parse_qsl(qs):
-            m = re.match(r"^(.*)\[(.*)\]\[(.*)\]", key)
-            if m:
-                k1 = m.group(1)
-                k2 = int(m.group(2))
-                k3 = m.group(3)
-                if k1 not in res:
-                    res[k1] = list({})
-                while len(res[k1]) <= k2:
-                    res[k1].append({})
-                res[k1][k2][k3] = value
-            else:
-                m = re.match(r"^(.*)\[(.*)\]", key)
-                if m:
-                    k1 = m.group(1)
-                    k2 = m.group(2)
-                    if k1 not in res:
-                        if k2 == '':
-                            res[k1] = list()
-                        else:
-                            res[k1] = {}
-                    if k2 == '':
-                        res[k1].append(value)
-                    else:                        
-                        res[k1][k2] = value
-                else:
-                    res[key] = value
-        self.args = self.args | res
+    def send_reply(self, reply):
+        result = json.dumps(reply).encode()
+        self.send_response(200)
+        self.send_header("content-type", "text/javascript");
+        self.send_header("content-length", len(result))
+        self.end_headers()
+        self.wfile.write(result)
 
     def do_GET(self):
         if self.path == '/ping':
             self.send_response(200)
+            self.send_header("content-length", 4)
             self.end_headers()
             self.wfile.write("pong".encode())
             return
@@ -150,14 +112,30 @@ class DNSBackendHandler(http.server.BaseHTTPRequestHandler):
             self.handler.result = False
             self.handler.log = []
 
-            if callable(getattr(self.handler, method, None)):
-                getattr(self.handler, method)(**self.args)
-                result = json.dumps({'result':self.handler.result,'log':self.handler.log}).encode()
+            # chunked transfer encoding needs HTTP/1.1 on both ends
+            stream = None
+            if self.protocol_version == 'HTTP/1.1' and self.request_version == 'HTTP/1.1':
+                stream = stream_method(self.handler, self.method)
+            records = stream(**self.args) if stream else None
+            if records is not None:
+                pieces = json_reply(records, self.handler.log)
+                try:
+                    # fetches the first batch of records, nothing has been sent yet when that fails
+                    piece = next(pieces)
+                except Exception:
+                    self.send_reply({'result': False, 'log': [traceback.format_exc()]})
+                    return
                 self.send_response(200)
                 self.send_header("content-type", "text/javascript");
-                self.send_header("content-length", len(result))
+                self.send_header("transfer-encoding", "chunked")
                 self.end_headers()
-                self.wfile.write(result)
+                for piece in itertools.chain((piece,), pieces):
+                    data = piece.encode()
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.write(b"0\r\n\r\n")
+            elif callable(getattr(self.handler, method, None)):
+                getattr(self.handler, method)(**self.args)
+                self.send_reply({'result':self.handler.result,'log':self.handler.log})
             else:
                 self.send_error(404, message=json.dumps({'error': 'No such method'}))
         except BrokenPipeError as e2:
@@ -1,22 +1,24 @@
 #!/usr/bin/env python
 
-import http.server
+import argparse
 from backend import BackendHandler
-from dnsbackend import DNSBackendHandler
+from dnsbackend import DNSBackendHandler, DNSBackendServer, ThreadingDNSBackendServer
 import os
 
-class DNSBackendServer(http.server.HTTPServer):
-    def __init__(self, *args, **kwargs):
-        path = os.path.dirname(os.path.realpath(__file__))
-        self.handler = BackendHandler(options={'dbpath': os.path.join(path, 'remote.sqlite3')})
-        super().__init__(*args, **kwargs)
-
-    def finish_request(self, request, client_address):
-        """Finish one request by instantiating RequestHandlerClass."""
-        h = self.RequestHandlerClass(request, client_address, self, handler=self.handler)
-
 def main():
-    server = DNSBackendServer(('', 62434), DNSBackendHandler)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--single-threaded', action='store_true',
+                        help='serve one request at a time, without persistent connections')
+    parser.add_argument('--port', type=int, default=62434)
+    parser.add_argument('--cache-size', type=int, default=10000,
+                        help='number of answers to cache, 0 to disable the cache')
+    args = parser.parse_args()
+
+    path = os.path.dirname(os.path.realpath(__file__))
+    server_class = DNSBackendServer if args.single_threaded else ThreadingDNSBackendServer
+    server = server_class(('', args.port), DNSBackendHandler, BackendHandler,
+                          options={'dbpath': os.path.join(path, 'remote.sqlite3'),
+                                   'cache_size': args.cache_size})
     try:
         server.serve_forever()
     except KeyboardInterrupt:
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import bisect
+import collections
+import threading
+
+import shareddb
+
+
+class OrderNames:
+    """The distinct ordernames of one domain, sorted, with the number of records using each"""
+
+    def __init__(self, rows=()):
+        self.names = []
+        self.counts = {}
+        for name, count in rows:
+            self.names.append(name)
+            self.counts[name] = count
+
+    def change(self, name, delta):
+        """Add (or, when negative, remove) delta records with name"""
+        count = self.counts.get(name, 0)
+        if count + delta > 0:
+            if count == 0:
+                bisect.insort(self.names, name)
+            self.counts[name] = count + delta
+        elif count > 0:
+            del self.counts[name]
+            del self.names[bisect.bisect_left(self.names, name)]
+
+    def before(self, qname):
+        """The last name before qname, wrapping around to the last name of the domain"""
+        if not self.names:
+            return ''
+        i = bisect.bisect_left(self.names, qname)
+        return self.names[i - 1]
+
+    def after(self, qname):
+        """The first name after qname, wrapping around to the first name of the domain"""
+        if not self.names:
+            return ''
+        i = bisect.bisect_right(self.names, qname)
+        return self.names[i if i < len(self.names) else 0]
+
+
+class OrderIndex:
+    """Sorted ordernames per domain, for the NSEC(3) before/after queries.
+
+    A domain is loaded from the database on its first query and then kept up to date with the
+    changes our handlers make. Writes to the database by anybody else are noticed through the
+    SharedDatabase and drop all domains, to be loaded again when queried."""
+
+    def __init__(self, dbpath):
+        self.domains = {}
+        # held by writers from before their commit until apply(), so a domain is never loaded
+        # in between and then changed a second time
+        self.lock = threading.RLock()
+        self.database = shareddb.shared(shareddb.SharedDatabase, dbpath)
+        self.data_version = self.database.version()
+
+    def _check(self):
+        changed, self.data_version = self.database.changed_since(self.data_version)
+        if changed:
+            self.domains.clear()
+
+    def _load(self, db, domain_id):
+        cur = db.execute("SELECT ordername, COUNT(*) FROM records WHERE domain_id = ? AND ordername IS NOT NULL GROUP BY ordername ORDER BY ordername", (domain_id,))
+        names = self.domains[domain_id] = OrderNames(cur)
+        return names
+
+    def before_and_after(self, db, domain_id, qname):
+        """Return the names before and after qname in domain_id, using db to load the domain"""
+        with self.lock:
+            self._check()
+            names = self.domains.get(domain_id)
+            if names is None:
+                names = self._load(db, domain_id)
+            return names.before(qname), names.after(qname)
+
+    def apply(self, added=(), removed=(), dropped=()):
+        """Update the index after the database was changed by us. added and removed are
+        (domain_id, ordername) pairs of the records written and deleted, in any order,
+        dropped are domains that were replaced as a whole"""
+        delta = collections.Counter(pair for pair in added if pair[1] is not None)
+        delta.subtract(pair for pair in removed if pair[1] is not None)
+        with self.lock:
+            for domain_id in dropped:
+                self.domains.pop(domain_id, None)
+            for (domain_id, name), count in delta.items():
+                names = self.domains.get(domain_id)
+                if names is not None and count != 0:
+                    names.change(name, count)
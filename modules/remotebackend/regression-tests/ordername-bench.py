@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+"""Measures getBeforeAndAfterNamesAbsolute of the sqlite backend on one large zone, against the
+SQL queries it used to run, and the cost of keeping the ordername index up to date.
+
+    ./ordername-bench.py --names 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from backend import BackendHandler, INSERT_RECORD
+
+# test-schema.sql comes with a few domains of its own
+DOMAIN_ID = 1000
+
+
+def ordername(i):
+    # canonical order of host<i>.bench.example, as pdns_server sends it
+    return "bench example host%07d" % i
+
+
+def create(dbpath, names):
+    path = os.path.dirname(os.path.realpath(__file__))
+    db = sqlite3.connect(dbpath)
+    with open(os.path.join(path, 'test-schema.sql')) as schema:
+        db.executescript(schema.read())
+    db.execute("INSERT INTO domains (id, name, type) VALUES (?, 'bench.example', 'NATIVE')", (DOMAIN_ID,))
+    # every other number, so there are missing names to query in between
+    db.executemany(INSERT_RECORD, (
+        (DOMAIN_ID, "host%07d.bench.example" % i, 'A', '192.0.2.1', 300, 0, ordername(i), 1)
+        for i in range(0, names * 2, 2)))
+    db.commit()
+    db.close()
+
+
+def sql_before_and_after(db, qname):
+    """The queries backend.py ran before it had an ordername index"""
+    args = {'qname': qname, 'id': DOMAIN_ID}
+    row = db.execute("SELECT ordername FROM records WHERE ordername < :qname AND domain_id = :id ORDER BY ordername DESC LIMIT 1", args).fetchone()
+    if not row:
+        row = db.execute("SELECT ordername FROM records WHERE domain_id = :id ORDER by ordername DESC LIMIT 1", args).fetchone()
+    before = row[0]
+    row = db.execute("SELECT ordername FROM records WHERE ordername > :qname AND domain_id = :id ORDER BY ordername LIMIT 1", args).fetchone()
+    if row is None:
+        row = db.execute("SELECT ordername FROM records WHERE domain_id = :id ORDER by ordername LIMIT 1", args).fetchone()
+    return before, row[0]
+
+
+def timed(label, count, func):
+    start = time.monotonic()
+    func()
+    elapsed = time.monotonic() - start
+    print("%-30s %8d in %7.3fs: %9.0f/s" % (label, count, elapsed, count / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--names', type=int, default=1000000, help='number of names in the zone')
+    parser.add_argument('--queries', type=int, default=100000, help='number of queries to time')
+    parser.add_argument('--updates', type=int, default=10000, help='number of replaceRRSet calls to time')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        dbpath = os.path.join(tmpdir, 'bench.sqlite3')
+        timed("create zone", args.names, lambda: create(dbpath, args.names))
+
+        handler = BackendHandler(options={'dbpath': dbpath, 'cache_size': 0})
+        qnames = [ordername(random.randrange(-2, args.names * 2 + 2)) for _ in range(args.queries)]
+
+        def query_sql():
+            for qname in qnames:
+                sql_before_and_after(handler.db, qname)
+
+        def query_index():
+            for qname in qnames:
+                handler.do_getbeforeandafternamesabsolute(id=DOMAIN_ID, qname=qname)
+
+        def update():
+            for i in range(args.updates):
+                n = random.randrange(args.names * 2)
+                handler.do_replacerrset(DOMAIN_ID, "host%07d.bench.example" % n, 'A', [] if n % 2 == 0 else [
+                    {'qname': "host%07d.bench.example" % n, 'qtype': 'A', 'content': '192.0.2.2',
+                     'ttl': 300, 'auth': 1, 'ordername': ordername(n)}])
+
+        timed("sql queries", args.queries, query_sql)
+        timed("index load", args.names, lambda: handler.do_getbeforeandafternamesabsolute(id=DOMAIN_ID, qname=''))
+        timed("index queries", args.queries, query_index)
+        timed("replaceRRSet with index", args.updates, update)
+
+        for qname in qnames[:1000]:
+            handler.do_getbeforeandafternamesabsolute(id=DOMAIN_ID, qname=qname)
+            expected = sql_before_and_after(handler.db, qname)
+            if (handler.result['before'], handler.result['after']) != expected:
+                raise AssertionError("%s: index says %r, database %r" % (qname, handler.result, expected))
+
+main()
@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 
-from pdns.remotebackend import PipeConnector
+from streaming import StreamingPipeConnector
 from backend import BackendHandler
 import os
+import sys
 
 def main():
     path = os.path.dirname(os.path.realpath(__file__))
-    connector = PipeConnector(BackendHandler, options={'dbpath': os.path.join(path, 'remote.sqlite3'), 'rawlog':'/tmp/raw.json'})
+    options = {'dbpath': os.path.join(path, 'remote.sqlite3'), 'rawlog':'/tmp/raw.json'}
+    if '--snapshot' in sys.argv[1:]:
+        # kept up to date by prefork-backend.py
+        options['snapshot'] = os.path.join(path, 'remote.snapshot')
+    connector = StreamingPipeConnector(BackendHandler, options=options)
     connector.run()
 
 main()
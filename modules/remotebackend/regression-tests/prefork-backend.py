@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Pre-forking unix socket backend. The parent takes a snapshot of the records (see snapshot.py) and
+forks workers that accept connections on the same socket and serve lookups from the snapshot, which
+they all map read-only. When the database changes, the parent takes a new snapshot; the workers map
+it as soon as the control file shows its generation, and use the database until then.
+
+    ./prefork-backend.py --workers 4
+    ./pipe-backend.py --snapshot    # serves lookups from the snapshot as well
+"""
+
+import argparse
+import os
+import signal
+import socketserver
+import sqlite3
+import sys
+import time
+from pdns.remotebackend.unix import UnixRequestHandler
+from backend import BackendHandler
+from streaming import StreamingPipeConnector
+import snapshot
+
+
+class StreamingUnixRequestHandler(UnixRequestHandler, StreamingPipeConnector):
+    # Connector.__init__ is not called for request handlers
+    tracer = None
+
+
+class PreforkUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(server):
+    """Serve connections in a worker, until killed by the parent"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    os._exit(0)
+
+
+def spawn(server):
+    pid = os.fork()
+    if pid == 0:
+        serve(server)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    path = os.path.dirname(os.path.realpath(__file__))
+    parser.add_argument('--path', default=os.path.join(path, 'remote.socket'), help='unix socket to listen on')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of worker processes, 0 to only keep the snapshot up to date')
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help='seconds between checks for database changes')
+    args = parser.parse_args()
+
+    dbpath = os.path.join(path, 'remote.sqlite3')
+    snappath = os.path.join(path, 'remote.snapshot')
+    options = {'dbpath': dbpath, 'snapshot': snappath, 'abi': 'remote'}
+
+    db = sqlite3.connect(dbpath)
+    data_version = db.execute("PRAGMA data_version").fetchone()[0]
+    snapshot.build(dbpath, snappath)
+
+    server = None
+    children = set()
+    if args.workers > 0:
+        if os.path.exists(args.path):
+            os.remove(args.path)
+        server = PreforkUnixServer(args.path, StreamingUnixRequestHandler)
+        server.rpc_handler = BackendHandler
+        server.rpc_options = options
+        for _ in range(args.workers):
+            children.add(spawn(server))
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            time.sleep(args.interval)
+            for pid in list(children):
+                if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                    children.remove(pid)
+                    children.add(spawn(server))
+            # any commit on another connection, by the workers or anybody else
+            version = db.execute("PRAGMA data_version").fetchone()[0]
+            if version != data_version:
+                data_version = version
+                snapshot.build(dbpath, snappath)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    if server is not None:
+        server.server_close()
+        os.remove(args.path)
+    snapshot.remove(snappath)
+
+main()
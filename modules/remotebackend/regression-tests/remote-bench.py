@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+"""Load generator for remotebackend implementations. Connects to the backend the way pdns_server
+does, with a connection string as in remote-connection-string, sends the same methods with the same
+parameters and reports qps and latency percentiles per method. Every client has its own connection
+and one request in flight, like every remotebackend instance of pdns_server.
+
+    ./http-backend.py &
+    ./remote-bench.py http:url=http://127.0.0.1:62434/dns --mix lookup --clients 8
+    ./remote-bench.py http:url=http://127.0.0.1:62434/dns,post --mix nsec
+    ./remote-bench.py pipe:command=./pipe-backend.py --mix axfr
+    ./remote-bench.py unix:path=./remote.socket --mix keys
+    ./remote-bench.py zeromq:endpoint=ipc:///tmp/pdns.0 --duration 30
+
+The zones come from getAllDomains (or --zone) and the names to query from listing them.
+"""
+
+import argparse
+import http.client
+import json
+import random
+import shlex
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import quote, urlencode, urlparse
+
+# the methods of each mix with their weights; lookup-nxdomain is a lookup of a name that does not exist
+MIXES = {
+    'lookup': (('lookup', 85), ('lookup-nxdomain', 5), ('getBeforeAndAfterNamesAbsolute', 5),
+               ('getDomainInfo', 3), ('getDomainMetadata', 2)),
+    'nsec': (('lookup', 40), ('lookup-nxdomain', 10), ('getBeforeAndAfterNamesAbsolute', 50)),
+    'axfr': (('list', 60), ('lookup', 20), ('getDomainInfo', 10), ('getAllDomains', 10)),
+    'keys': (('getDomainKeys', 40), ('getAllDomainMetadata', 15), ('getDomainMetadata', 15),
+             ('addDomainKey', 10), ('activateDomainKey', 5), ('deactivateDomainKey', 5), ('removeDomainKey', 10)),
+}
+
+# the order of the parameters in the URL of the http connector, /<method>/<parameter>/...
+URL_PARAMETERS = ('id', 'domain_id', 'zonename', 'qname', 'name', 'kind', 'qtype')
+
+# parameters the http connector sends as x-remotebackend-<name> headers
+HEADER_PARAMETERS = ('trxid', 'local', 'remote', 'real-remote', 'zone-id')
+
+# methods the http connector sends with a verb other than GET
+HTTP_VERBS = {
+    'addDomainKey': 'PUT',
+    'removeDomainKey': 'DELETE',
+    'activateDomainKey': 'POST',
+    'deactivateDomainKey': 'POST',
+    'publishDomainKey': 'POST',
+    'unpublishDomainKey': 'POST',
+}
+
+KEY_CONTENT = ("Private-key-format: v1.2\nAlgorithm: 13 (ECDSAP256SHA256)\n"
+               "PrivateKey: GU6SnQ/Ou+xC5RumuIUIuJZteXT2z0O/ok1s38Et6mQ=\n")
+
+
+class BackendError(Exception):
+    pass
+
+
+def parse_connection_string(connstr):
+    """Split type:key=value,key=value like remotebackend does, a key without a value is yes"""
+    kind, _, opts = connstr.partition(':')
+    options = {}
+    for opt in opts.split(','):
+        if opt.strip():
+            key, sep, value = opt.partition('=')
+            options[key.strip()] = value.strip() if sep else 'yes'
+    return kind, options
+
+
+def is_yes(value):
+    return value in ('yes', 'true', 'on', '1')
+
+
+def as_string(value):
+    """A parameter as the http connector writes it in a URL or form"""
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
+
+
+class LineClient:
+    """One JSON request or reply per line, for the pipe and unix connectors"""
+
+    def call(self, method, parameters):
+        self.writer.write(json.dumps({'method': method, 'parameters': parameters}) + "\n")
+        self.writer.flush()
+        line = self.reader.readline()
+        if not line:
+            raise BackendError("connection closed")
+        return json.loads(line)
+
+
+class PipeClient(LineClient):
+    def __init__(self, options):
+        self.process = subprocess.Popen(shlex.split(options['command']), stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, universal_newlines=True, bufsize=1)
+        self.reader = self.process.stdout
+        self.writer = self.process.stdin
+        self.call('initialize', options)
+
+    def close(self):
+        self.writer.close()
+        self.process.wait()
+
+
+class UnixClient(LineClient):
+    def __init__(self, options):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(options['path'])
+        self.reader = self.sock.makefile('r', encoding='utf-8', newline='\n')
+        self.writer = self.sock.makefile('w', encoding='utf-8', newline='\n')
+        self.call('initialize', options)
+
+    def close(self):
+        self.sock.close()
+
+
+class ZeroMQClient:
+    def __init__(self, options):
+        import zmq
+        self.socket = zmq.Context.instance().socket(zmq.REQ)
+        self.socket.connect(options['endpoint'])
+        self.call('initialize', options)
+
+    def call(self, method, parameters):
+        self.socket.send(json.dumps({'method': method, 'parameters': parameters}).encode())
+        return json.loads(self.socket.recv())
+
+    def close(self):
+        self.socket.close()
+
+
+class HTTPClient:
+    """The REST style requests of the http connector, or a POST per request with post (form encoded
+    parameters) or post_json (the whole request as JSON)"""
+
+    def __init__(self, options):
+        url = urlparse(options['url'])
+        self.path = url.path
+        self.suffix = options.get('url-suffix', '')
+        self.post = is_yes(options.get('post', 'no'))
+        # post_json only counts with post
+        self.post_json = self.post and is_yes(options.get('post_json', 'no'))
+        self.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+
+    def request(self, method, parameters):
+        """Return the verb, path, body and headers of a request"""
+        headers = {'Accept': 'application/json'}
+        if self.post_json:
+            headers['Content-Type'] = 'text/javascript; charset=utf-8'
+            return 'POST', self.path, json.dumps({'method': method, 'parameters': parameters}), headers
+        if self.post:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded; charset=utf-8'
+            body = urlencode({'parameters': json.dumps(parameters)})
+            return 'POST', "%s/%s%s" % (self.path, method, self.suffix), body, headers
+
+        path = "%s/%s" % (self.path, method)
+        for name in URL_PARAMETERS:
+            if name in parameters:
+                path += "/" + quote(as_string(parameters[name]), safe='')
+        path += self.suffix
+        if method == 'getAllDomains':
+            path += "?includeDisabled=%s" % ('true' if parameters['include_disabled'] else 'false')
+        for name in HEADER_PARAMETERS:
+            if name in parameters:
+                headers['X-RemoteBackend-' + name] = as_string(parameters[name])
+        body = None
+        if method == 'addDomainKey':
+            key = parameters['key']
+            headers['Content-Type'] = 'application/x-www-form-urlencoded; charset=utf-8'
+            body = urlencode({'flags': as_string(key['flags']), 'active': as_string(key['active']),
+                              'published': as_string(key['published']), 'content': key['content']})
+        return HTTP_VERBS.get(method, 'GET'), path, body, headers
+
+    def call(self, method, parameters):
+        verb, path, body, headers = self.request(method, parameters)
+        self.conn.request(verb, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        if response.status != 200:
+            raise BackendError("HTTP %d" % response.status)
+        return json.loads(data)
+
+    def close(self):
+        self.conn.close()
+
+
+CONNECTORS = {
+    'pipe': PipeClient,
+    'unix': UnixClient,
+    'http': HTTPClient,
+    'zeromq': ZeroMQClient,
+}
+
+
+def ordername(qname, zone):
+    """The ordername of qname in zone: the labels below the apex in reverse, separated by spaces"""
+    relative = qname.lower()[:-len(zone)] if qname.lower().endswith(zone.lower()) else qname.lower()
+    return ' '.join(reversed(relative.rstrip('.').split('.'))) if relative.rstrip('.') else ''
+
+
+class Workload:
+    """The zones and names to send requests for"""
+
+    def __init__(self, client, zones, max_names):
+        if zones:
+            self.zones = [{'zone': zone if zone.endswith('.') else zone + '.', 'id': -1} for zone in zones]
+        else:
+            reply = client.call('getAllDomains', {'include_disabled': False})
+            self.zones = [{'zone': domain['zone'], 'id': domain['id']} for domain in reply['result'] or ()]
+        self.names = []
+        for zone in self.zones:
+            reply = client.call('list', {'zonename': zone['zone'], 'domain_id': zone['id'], 'include_disabled': False})
+            for record in (reply['result'] or ())[:max_names]:
+                self.names.append((zone, record['qname'], record['qtype']))
+            if zone['id'] == -1 and reply['result']:
+                zone['id'] = reply['result'][0].get('domain_id', -1)
+
+    def request(self, method, rng, keys):
+        """Return the method and parameters for one request. keys holds the ids of the keys this client
+        added, per zone; the other key methods work on those only."""
+        zone, qname, qtype = rng.choice(self.names)
+        name = zone['zone']
+        if method == 'lookup-nxdomain':
+            method, qname, qtype = 'lookup', "nx%d.%s" % (rng.randrange(1000000), name), 'A'
+        if method == 'lookup':
+            return method, {'qtype': qtype, 'qname': qname, 'remote': '127.0.0.1', 'local': '127.0.0.1',
+                            'real-remote': '127.0.0.1/32', 'zone-id': -1}
+        if method == 'getBeforeAndAfterNamesAbsolute':
+            return method, {'id': zone['id'], 'qname': ordername(qname, name)}
+        if method == 'list':
+            return method, {'zonename': name, 'domain_id': zone['id'], 'include_disabled': False}
+        if method == 'getAllDomains':
+            return method, {'include_disabled': False}
+        if method == 'getDomainMetadata':
+            return method, {'name': name, 'kind': 'NSEC3PARAM'}
+        if method in ('getDomainInfo', 'getDomainKeys', 'getAllDomainMetadata'):
+            return method, {'name': name}
+        ids = keys.get(name)
+        if method == 'addDomainKey' or not ids:
+            return 'addDomainKey', {'name': name, 'key': {'flags': 256, 'active': False, 'published': True,
+                                                          'content': KEY_CONTENT}}
+        if method == 'removeDomainKey':
+            return method, {'name': name, 'id': ids.pop()}
+        return method, {'name': name, 'id': rng.choice(ids)}
+
+
+def percentile(values, p):
+    """The nearest rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def client(connect, workload, mix, count, deadline, seed, results):
+    rng = random.Random(seed)
+    methods = [method for method, weight in mix]
+    weights = [weight for method, weight in mix]
+    latencies = {}
+    errors = {}
+    keys = {}
+    conn = connect()
+    try:
+        for _ in range(count):
+            if deadline and time.monotonic() > deadline:
+                break
+            method, parameters = workload.request(rng.choices(methods, weights)[0], rng, keys)
+            start = time.perf_counter()
+            try:
+                reply = conn.call(method, parameters)
+            except (BackendError, OSError, ValueError):
+                errors[method] = errors.get(method, 0) + 1
+                continue
+            latencies.setdefault(method, []).append(time.perf_counter() - start)
+            if method == 'addDomainKey' and reply['result'] is not False:
+                keys.setdefault(parameters['name'], []).append(reply['result'])
+        # leave no keys behind
+        for name, ids in keys.items():
+            for key_id in ids:
+                conn.call('removeDomainKey', {'name': name, 'id': key_id})
+    finally:
+        conn.close()
+    results.append((latencies, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('connection', help='connection string, as remote-connection-string of pdns_server')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='lookup', help='the requests to send')
+    parser.add_argument('--clients', type=int, default=8, help='number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per client')
+    parser.add_argument('--duration', type=float, default=0, help='stop after this many seconds')
+    parser.add_argument('--zone', action='append', help='zone to send requests for, instead of all zones')
+    parser.add_argument('--max-names', type=int, default=1000, help='names per zone to send requests for')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the order of the requests')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    kind, options = parse_connection_string(args.connection)
+    if kind not in CONNECTORS:
+        parser.error("unknown connector %s, use one of %s" % (kind, ', '.join(sorted(CONNECTORS))))
+
+    def connect():
+        return CONNECTORS[kind](options)
+
+    conn = connect()
+    try:
+        workload = Workload(conn, args.zone, args.max_names)
+    finally:
+        conn.close()
+    if not workload.names:
+        parser.error("no records to send requests for, check --zone")
+
+    results = []
+    start = time.monotonic()
+    deadline = start + args.duration if args.duration else None
+    threads = [threading.Thread(target=client, args=(connect, workload, MIXES[args.mix], args.requests,
+                                                     deadline, args.seed + i, results))
+               for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    latencies = {}
+    errors = {}
+    for client_latencies, client_errors in results:
+        for method, values in client_latencies.items():
+            latencies.setdefault(method, []).extend(values)
+        for method, count in client_errors.items():
+            errors[method] = errors.get(method, 0) + count
+    latencies['total'] = [value for values in latencies.values() for value in values]
+    errors['total'] = sum(errors.values())
+
+    report = []
+    for method in sorted(set(latencies) - {'total'} | set(errors) - {'total'}) + ['total']:
+        values = sorted(latencies.get(method, ()))
+        report.append({'method': method, 'requests': len(values), 'errors': errors.get(method, 0),
+                       'qps': len(values) / elapsed, 'p50': percentile(values, 50) * 1000,
+                       'p99': percentile(values, 99) * 1000, 'p999': percentile(values, 99.9) * 1000})
+
+    if args.json:
+        print(json.dumps({'connector': kind, 'mix': args.mix, 'clients': args.clients, 'seconds': elapsed,
+                          'methods': report}, indent=2))
+        return
+    print("%s connector, %s mix, %d clients, %.2fs" % (kind, args.mix, args.clients, elapsed))
+    print("%-32s %9s %7s %9s %9s %9s %9s" % ('method', 'requests', 'errors', 'qps', 'p50 ms', 'p99 ms', 'p999 ms'))
+    for row in report:
+        print("%-32s %9d %7d %9.0f %9.3f %9.3f %9.3f" % (row['method'], row['requests'], row['errors'], row['qps'],
+                                                        row['p50'], row['p99'], row['p999']))
+
+main()
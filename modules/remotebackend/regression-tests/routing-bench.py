@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""Measures how many requests per second DNSBackendHandler decodes (URL routing and query string or
+body arguments), without the HTTP server and the backend around it.
+
+    PYTHONPATH=.. ./routing-bench.py --requests 200000
+"""
+
+import argparse
+import time
+from dnsbackend import DNSBackendHandler
+
+# path and form encoded body of the requests pdns_server sends
+REQUESTS = [
+    ('lookup', '/dns/lookup/www.example.com./A', None),
+    ('getbeforeandafternamesabsolute', '/dns/getbeforeandafternamesabsolute/1/www%20example', None),
+    ('replacerrset', '/dns/replacerrset/1/www.example.com./A',
+     'rrset[0][qname]=www.example.com.&rrset[0][qtype]=A&rrset[0][content]=192.0.2.1&rrset[0][ttl]=300'
+     '&rrset[0][auth]=1&rrset[1][qname]=www.example.com.&rrset[1][qtype]=A&rrset[1][content]=192.0.2.2'
+     '&rrset[1][ttl]=300&rrset[1][auth]=1&trxid=1'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200000, help='requests to decode per method')
+    args = parser.parse_args()
+
+    # only the decoding methods are used, no connection needed
+    request = DNSBackendHandler.__new__(DNSBackendHandler)
+    for method, path, body in REQUESTS:
+        request.path = path
+        start = time.monotonic()
+        for _ in range(args.requests):
+            request.url_to_args()
+            if body:
+                request.parse_qsl(body)
+        elapsed = time.monotonic() - start
+        assert request.method == method, request.method
+        print("%-32s %8.2fus %10.0f requests/s" % (method, elapsed / args.requests * 1e6, args.requests / elapsed))
+
+main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import contextlib
+import sqlite3
+import threading
+
+_shared = {}
+# reentrant, as creating one of them takes the SharedDatabase
+_shared_lock = threading.RLock()
+
+
+def shared(cls, dbpath, *args):
+    """Return the cls for dbpath, shared by all handlers (and threads) of this process"""
+    with _shared_lock:
+        obj = _shared.get((cls, dbpath))
+        if obj is None:
+            obj = _shared[(cls, dbpath)] = cls(dbpath, *args)
+        return obj
+
+
+def connect(dbpath, check_same_thread=True):
+    """Open a connection to the database, in WAL mode so readers do not block on writers"""
+    db = sqlite3.connect(dbpath, timeout=10, cached_statements=256, check_same_thread=check_same_thread)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class SharedDatabase:
+    """The connection all handlers of this process write through, which tells the writes of
+    anybody else (e.g. sqlite3 on the command line) apart from ours.
+
+    PRAGMA data_version of a connection changes when another connection commits, never for its
+    own commits. As all our writes go through this connection, its data_version only changes for
+    the writes of others, also when they land right after one of ours."""
+
+    def __init__(self, dbpath):
+        self.db = connect(dbpath, check_same_thread=False)
+        # held for the whole of a write
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """A transaction for writing, committed at the end of the with block (rolled back on an exception)"""
+        with self.lock:
+            with self.db:
+                yield self.db
+
+    def version(self):
+        """The current data_version"""
+        with self.lock:
+            return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed_since(self, version):
+        """Return (changed, version): whether anybody else wrote to the database since version,
+        and the version to pass next time.
+
+        During a write of ours the connection is busy and this returns (False, version); a write
+        of somebody else is then noticed on the next call."""
+        if not self.lock.acquire(blocking=False):
+            return False, version
+        try:
+            current = self.db.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self.lock.release()
+        return current != version, current
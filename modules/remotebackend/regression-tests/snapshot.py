@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+
+import fcntl
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from array import array
+
+# A snapshot of the records table, to be mapped read-only by many processes:
+#
+#   header | records, one line per record sorted by name | offsets of the first record of every name | names
+#
+# Records are "name\ttype\tttl\tauth\tdomain_id\tcontent\n" in UTF-8 (an empty number is NULL), the
+# offsets are uint64 with one extra at the end. names is an open addressing hash table on the crc32 of
+# the name, with a power of two uint64 slots holding the number of the name plus one (0 is empty).
+# Snapshots live in <path>.<generation>, <path> itself is the control file with the current
+# generation and a change counter (see Control).
+MAGIC = b'PDNSSNP2'
+HEADER = struct.Struct('<8sQQQQ')
+CONTROL = struct.Struct('<QQ')
+
+
+def _field(value):
+    return '' if value is None else str(value)
+
+
+def _int(field):
+    return int(field) if field else None
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def shared_reader(path):
+    """Return the reader for the snapshot at path, shared by all handlers (and threads) of this process"""
+    with _readers_lock:
+        reader = _readers.get(path)
+        if reader is None:
+            reader = _readers[path] = SnapshotReader(path)
+        return reader
+
+
+class Control:
+    """The control file of a snapshot: the generation of the current snapshot, and the number of
+    changes made to the database by handlers, which make every snapshot taken before them stale"""
+
+    def __init__(self, path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < CONTROL.size:
+                os.ftruncate(fd, CONTROL.size)
+            self.mm = mmap.mmap(fd, CONTROL.size)
+        finally:
+            os.close(fd)
+        self.lockpath = path + '.lock'
+
+    def read(self):
+        """Return (generation, changes)"""
+        return CONTROL.unpack_from(self.mm)
+
+    def update(self, generation=None, changes=0):
+        """Set the generation and/or add to the change counter, under a lock shared with the other processes"""
+        with open(self.lockpath, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current_generation, current_changes = self.read()
+            if generation is None:
+                generation = current_generation
+            CONTROL.pack_into(self.mm, 0, generation, current_changes + changes)
+
+
+class Snapshot:
+    """One mapped snapshot"""
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.changes, self.count, offsets, slots = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError("%s is not a snapshot" % filename)
+        view = memoryview(self.mm)
+        self.offsets = view[offsets:offsets + 8 * (self.count + 1)].cast('Q')
+        names = offsets + 8 * (self.count + 1)
+        self.names = view[names:names + 8 * slots].cast('Q')
+        self.mask = slots - 1
+
+    def find(self, qname):
+        """Return the number of qname, or -1"""
+        slot = zlib.crc32(qname) & self.mask
+        length = len(qname)
+        while True:
+            i = self.names[slot]
+            if i == 0:
+                return -1
+            start = self.offsets[i - 1]
+            if self.mm[start:start + length + 1] == qname + b'\t':
+                return i - 1
+            slot = (slot + 1) & self.mask
+
+    def lookup(self, qname, qtype, domain_id=-1):
+        """The records for qname, like the lookup query on the records table"""
+        result = []
+        i = self.find(qname.encode())
+        if i == -1:
+            return result
+        # the last record ends with a newline as well
+        for line in self.mm[self.offsets[i]:self.offsets[i + 1] - 1].decode().split('\n'):
+            name, rtype, ttl, auth, rdomain_id, content = line.split('\t', 5)
+            if qtype != 'ANY' and rtype != qtype:
+                continue
+            rdomain_id = _int(rdomain_id)
+            if domain_id > -1 and rdomain_id != domain_id:
+                continue
+            result.append({'qtype': rtype, 'qname': name, 'content': content, 'ttl': _int(ttl),
+                           'auth': _int(auth), 'domain_id': rdomain_id})
+        return result
+
+
+class SnapshotReader:
+    """Follows the control file of a snapshot, mapping a new snapshot when the generation changes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.control = Control(path)
+        self.snapshot = None
+        self.generation = None
+        self.lock = threading.Lock()
+
+    def current(self):
+        """Return the current snapshot, or None when the database has been changed since it was taken"""
+        with self.lock:
+            generation, changes = self.control.read()
+            if generation == 0:
+                return None
+            if generation != self.generation:
+                try:
+                    self.snapshot = Snapshot("%s.%d" % (self.path, generation))
+                except FileNotFoundError:
+                    # already replaced by a newer one, it will show up in the control file
+                    return None
+                self.generation = generation
+            if self.snapshot.changes != changes:
+                return None
+            return self.snapshot
+
+    def changed(self):
+        """Mark the current snapshot stale, after writing to the database"""
+        self.control.update(changes=1)
+
+
+def build(dbpath, path):
+    """Take a new snapshot of the records in dbpath and make it current, return its generation"""
+    control = Control(path)
+    with open(path + '.build', 'a') as lock:
+        # one builder at a time
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        generation, changes = control.read()
+        generation += 1
+        filename = "%s.%d" % (path, generation)
+        db = sqlite3.connect(dbpath)
+        try:
+            with open(filename + '.tmp', 'wb') as f:
+                f.write(b'\0' * HEADER.size)
+                offsets = array('Q')
+                hashes = array('I')
+                pos = HEADER.size
+                last = None
+                # sorted, so the records of a name are next to each other
+                cur = db.execute("SELECT name, type, ttl, auth, domain_id, prio, content FROM records WHERE name IS NOT NULL ORDER BY name")
+                while True:
+                    rows = cur.fetchmany(1000)
+                    if not rows:
+                        break
+                    for name, rtype, ttl, auth, domain_id, prio, content in rows:
+                        if rtype in ('MX', 'SRV'):
+                            content = "%d %s" % (prio, content)
+                        if name != last:
+                            offsets.append(pos)
+                            hashes.append(zlib.crc32(name.encode()))
+                            last = name
+                        line = "\t".join((name, _field(rtype), _field(ttl), _field(auth), _field(domain_id), _field(content))) + "\n"
+                        line = line.encode()
+                        f.write(line)
+                        pos += len(line)
+                count = len(offsets)
+                offsets.append(pos)
+                f.write(offsets.tobytes())
+                slots = 1
+                while slots < count * 2:
+                    slots *= 2
+                names = array('Q', bytes(8 * slots))
+                mask = slots - 1
+                for i, h in enumerate(hashes):
+                    slot = h & mask
+                    while names[slot]:
+                        slot = (slot + 1) & mask
+                    names[slot] = i + 1
+                f.write(names.tobytes())
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, changes, count, pos, slots))
+        finally:
+            db.close()
+        os.rename(filename + '.tmp', filename)
+        control.update(generation=generation)
+    # processes that still have the previous one mapped keep it until they move on
+    try:
+        os.unlink("%s.%d" % (path, generation - 1))
+    except FileNotFoundError:
+        pass
+    return generation
+
+
+def remove(path):
+    """Remove the snapshot files at path"""
+    generation, changes = Control(path).read()
+    for filename in (path, path + '.lock', path + '.build', "%s.%d" % (path, generation)):
+        try:
+            os.unlink(filename)
+        except FileNotFoundError:
+            pass
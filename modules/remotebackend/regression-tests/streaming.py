@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import itertools
+import json
+import traceback
+from pdns.remotebackend import PipeConnector
+
+# records serialized per piece of a streamed reply
+STREAM_BATCH = 1000
+
+
+def stream_method(handler, method):
+    """Return the streaming variant of method (e.g. iter_list for list) if handler has one"""
+    func = getattr(handler, "iter_%s" % method, None)
+    return func if callable(func) else None
+
+
+def json_reply(records, log):
+    """Yield the reply {"result": [records], "log": log} in pieces of STREAM_BATCH records, so only one
+    piece is in memory at a time. log is read at the end, after records has been consumed.
+
+    The first piece is only yielded once the first batch of records was fetched, so when fetching
+    fails right away, the exception is raised before anything was written and the caller can send
+    an ordinary error reply. When it fails later, the reply is finished with "result": false and the
+    traceback in the log. Both json11 (in pdns_server) and Python keep the last of two equal keys, so
+    the partial list of records is discarded and the request fails, instead of the reply being cut
+    off (or followed by a second reply) in the middle of the stream."""
+    records = iter(records)
+    batch = [json.dumps(record) for record in itertools.islice(records, STREAM_BATCH)]
+    yield '{"result": [' + ', '.join(batch)
+    separator = ', ' if batch else ''
+    try:
+        while True:
+            batch = [json.dumps(record) for record in itertools.islice(records, STREAM_BATCH)]
+            if not batch:
+                break
+            yield separator + ', '.join(batch)
+            separator = ', '
+    except Exception:
+        yield '], "result": false, "log": %s}' % json.dumps(log + [traceback.format_exc()])
+        return
+    yield '], "log": %s}' % json.dumps(log)
+
+
+class StreamingPipeConnector(PipeConnector):
+    """PipeConnector that writes the reply of methods with a streaming variant in the handler (iter_list)
+    while the records are fetched, instead of building it in memory first"""
+
+    def mainloop4(self, reader, writer, h):
+        while(True):
+            line = reader.readline()
+            if self.tracer:
+                self.tracer.write(line)
+            if line == "":
+                break
+            try:
+                data_in = json.loads(line)
+                args = data_in.get('parameters', {})
+                h.result = False
+                h.log = []
+                stream = stream_method(h, data_in['method'].lower())
+                records = stream(**args) if stream else None
+                if records is not None:
+                    for piece in json_reply(records, h.log):
+                        writer.write(piece)
+                else:
+                    method = "do_{0}".format(data_in['method'].lower())
+                    if (callable(getattr(h, method, None))):
+                        getattr(h, method)(**args)
+                    writer.write(json.dumps({'result': h.result, 'log': h.log}))
+            except ValueError:
+                writer.write(json.dumps({'result': False,
+                                         'log': ["Cannot parse input"]}))
+            except BaseException:
+                writer.write(json.dumps({'result': False,
+                                         'log': [traceback.format_exc()]}))
+
+            writer.write("\n")
+            writer.flush()
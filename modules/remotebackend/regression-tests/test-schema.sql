@@ -24,10 +24,8 @@ CREATE TABLE records (
   auth            BOOL DEFAULT 0
 );
               
-CREATE INDEX rec_name_index ON records(name);
-CREATE INDEX nametype_index ON records(name,type);
-CREATE INDEX domain_id ON records(domain_id);
-create index orderindex on records(ordername);
+CREATE INDEX records_lookup ON records(name,type,domain_id);
+CREATE INDEX records_order ON records(domain_id,ordername);
 
 create table supermasters (
   ip          VARCHAR(25) NOT NULL, 
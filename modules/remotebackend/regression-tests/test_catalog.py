@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""The kind getDomainInfo and getAllDomains report (domains.type), and which zones getUpdatedMasters
+returns to pdns_server for notifying. Run with: python -m unittest test_catalog"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from backend import BackendHandler
+
+SCHEMA = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test-schema.sql')
+
+SOA = 'ns1.example.com. hostmaster.example.com. %d 28800 7200 1209600 120'
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dbpath = os.path.join(self.dir, 'remote.sqlite3')
+        db = sqlite3.connect(self.dbpath)
+        with open(SCHEMA) as f:
+            db.executescript(f.read())
+        # on top of test-schema.sql: example.com. is a master, and a slave zone
+        with db:
+            db.execute("UPDATE domains SET type = 'MASTER' WHERE name = 'example.com.'")
+            db.execute("INSERT INTO domains (name, type, master) VALUES ('slave.example.', 'SLAVE', '192.0.2.53, 192.0.2.54')")
+            db.execute("INSERT INTO records (domain_id, name, type, ttl, content, auth) "
+                       "SELECT id, name, 'SOA', 120, ?, 1 FROM domains WHERE name = 'slave.example.'", (SOA % 5,))
+        db.close()
+        self.handler = BackendHandler(options={'dbpath': self.dbpath})
+        self.domain_id = self.handler.get_domain_id('example.com.')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def domaininfo(self, name):
+        self.handler.do_getdomaininfo(name=name)
+        return self.handler.result
+
+    def updated_masters(self):
+        self.handler.do_getupdatedmasters()
+        return [(info['zone'], info['serial'], info['notified_serial']) for info in self.handler.result]
+
+    def testKind(self):
+        self.assertEqual(self.domaininfo('example.com.')['kind'], 'master')
+        self.assertEqual(self.domaininfo('up.example.com.')['kind'], 'native')
+        slave = self.domaininfo('slave.example.')
+        self.assertEqual((slave['kind'], slave['serial'], slave['masters']), ('slave', 5, ['192.0.2.53', '192.0.2.54']))
+        self.handler.do_getalldomains()
+        self.assertEqual(sorted((info['zone'], info['kind']) for info in self.handler.result),
+                         [('example.com.', 'master'), ('slave.example.', 'slave'), ('up.example.com.', 'native')])
+
+    def testUpdatedMasters(self):
+        # only masters, and only until the serial is notified
+        self.assertEqual(self.updated_masters(), [('example.com.', 2000010101, 0)])
+        self.handler.do_setnotified(id=self.domain_id, serial=2000010101)
+        self.assertEqual(self.updated_masters(), [])
+
+        # a new serial from one of our writes
+        rr = {'qname': 'example.com.', 'qtype': 'SOA', 'content': SOA % 2000010102, 'ttl': 120, 'auth': 1}
+        self.handler.do_replacerrset(domain_id=self.domain_id, qname='example.com.', qtype='SOA', rrset=[rr])
+        self.assertEqual(self.updated_masters(), [('example.com.', 2000010102, 2000010101)])
+        self.handler.do_setnotified(id=self.domain_id, serial=2000010102)
+        self.assertEqual(self.updated_masters(), [])
+
+        # and from somebody else's
+        db = sqlite3.connect(self.dbpath)
+        with db:
+            db.execute("UPDATE records SET content = ? WHERE name = 'example.com.' AND type = 'SOA'", (SOA % 2000010103,))
+        db.close()
+        self.assertEqual(self.updated_masters(), [('example.com.', 2000010103, 2000010102)])
+
+
+if __name__ == '__main__':
+    unittest.main()
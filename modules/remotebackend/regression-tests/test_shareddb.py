@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Writes by other processes are noticed by the answer cache, the ordername index and the domain
+catalog, also when they land right after one of ours. Run with: python -m unittest test_shareddb"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from backend import BackendHandler
+
+SCHEMA = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test-schema.sql')
+
+
+class TestSharedDatabase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dbpath = os.path.join(self.dir, 'remote.sqlite3')
+        db = sqlite3.connect(self.dbpath)
+        with open(SCHEMA) as f:
+            db.executescript(f.read())
+        db.close()
+        self.handler = BackendHandler(options={'dbpath': self.dbpath})
+        self.domain_id = self.handler.get_domain_id('example.com.')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def foreign(self, sql, *args):
+        """Write like sqlite3 on the command line would"""
+        db = sqlite3.connect(self.dbpath)
+        with db:
+            db.execute(sql, args)
+        db.close()
+
+    def lookup(self, qname, qtype='A'):
+        self.handler.do_lookup(qname=qname, qtype=qtype)
+        return sorted(r['content'] for r in self.handler.result)
+
+    def replace(self, qname, content, ordername):
+        rr = {'qname': qname, 'qtype': 'A', 'content': content, 'ttl': 120, 'auth': 1, 'ordername': ordername}
+        self.handler.do_replacerrset(domain_id=self.domain_id, qname=qname, qtype='A', rrset=[rr])
+
+    def testOwnWritesKeepTheCache(self):
+        self.assertEqual(self.lookup('www.example.com.'), ['192.168.2.255'])
+        self.lookup('outpost.example.com.')
+        self.replace('www.example.com.', '192.0.2.1', 'www')
+        self.assertEqual(self.lookup('www.example.com.'), ['192.0.2.1'])
+        self.lookup('outpost.example.com.')
+        self.assertEqual(self.handler.cache.stats()['flushes'], 0)
+        self.assertEqual(self.handler.cache.stats()['hits'], 1)
+
+    def testForeignWrite(self):
+        self.assertEqual(self.lookup('www.example.com.'), ['192.168.2.255'])
+        self.foreign("UPDATE records SET content = '192.0.2.2' WHERE name = 'www.example.com.'")
+        self.assertEqual(self.lookup('www.example.com.'), ['192.0.2.2'])
+
+    def testForeignWriteAfterOurs(self):
+        # all three are loaded
+        self.assertEqual(self.lookup('www.example.com.'), ['192.168.2.255'])
+        self.handler.do_getbeforeandafternamesabsolute(id=self.domain_id, qname='outpost')
+        self.assertEqual(self.handler.result['after'], 'up')
+        self.handler.do_getdomaininfo(name='example.com.')
+        self.assertEqual(self.handler.result['serial'], 2000010101)
+
+        # somebody else writes between our commit and the invalidation that follows it
+        invalidate = self.handler.invalidate
+
+        def invalidate_after_foreign_write(*args, **kwargs):
+            self.foreign("UPDATE records SET content = '192.0.2.3' WHERE name = 'www.example.com.'")
+            self.foreign("UPDATE records SET ordername = 'a' WHERE name = 'ns1.example.com.'")
+            self.foreign("UPDATE records SET content = 'ns1.example.com. hostmaster.example.com. 2000010102 28800 7200 1209600 120' "
+                         "WHERE name = 'example.com.' AND type = 'SOA'")
+            invalidate(*args, **kwargs)
+        self.handler.invalidate = invalidate_after_foreign_write
+        self.replace('other.example.com.', '192.0.2.4', 'other')
+        self.handler.invalidate = invalidate
+
+        self.assertEqual(self.lookup('www.example.com.'), ['192.0.2.3'])
+        self.handler.do_getbeforeandafternamesabsolute(id=self.domain_id, qname='a')
+        self.assertEqual(self.handler.result['after'], 'ns2')
+        self.handler.do_getdomaininfo(name='example.com.')
+        self.assertEqual(self.handler.result['serial'], 2000010102)
+
+
+if __name__ == '__main__':
+    unittest.main()
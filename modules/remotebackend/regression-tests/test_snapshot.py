@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""Lookups served from a snapshot (see snapshot.py) against the same lookups on the records table,
+and when a snapshot stops being used. Run with: python -m unittest test_snapshot"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import snapshot
+from backend import BackendHandler
+
+SCHEMA = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test-schema.sql')
+
+# on top of test-schema.sql: prio (MX), NULL ttl and auth, a name that only differs in case
+EXTRA = [
+    (1, 'example.com.', 'MX', 'mail.example.com.', 120, 10, 1),
+    (1, 'example.com.', 'MX', 'mail2.example.com.', 120, 20, 1),
+    (1, 'null.example.com.', 'TXT', '"no ttl"', None, None, None),
+    (1, 'WWW.example.com.', 'A', '192.168.2.254', 120, None, 1),
+]
+
+NAMES = ['example.com.', 'up.example.com.', 'www.example.com.', 'WWW.example.com.', 'outpost.example.com.',
+         'jump.up.example.com.', 'null.example.com.', 'missing.example.com.', 'com.']
+TYPES = ['ANY', 'SOA', 'NS', 'A', 'AAAA', 'MX', 'TXT', 'SRV']
+
+
+def ordered(records):
+    return sorted(records, key=lambda r: (r['domain_id'], r['qtype'], r['content']))
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dbpath = os.path.join(self.dir, 'remote.sqlite3')
+        self.snappath = os.path.join(self.dir, 'remote.snapshot')
+        db = sqlite3.connect(self.dbpath)
+        with open(SCHEMA) as f:
+            db.executescript(f.read())
+        with db:
+            db.executemany("INSERT INTO records (domain_id, name, type, content, ttl, prio, auth) VALUES (?, ?, ?, ?, ?, ?, ?)", EXTRA)
+        db.close()
+        self.domain_ids = [-1] + [row[0] for row in sqlite3.connect(self.dbpath).execute("SELECT id FROM domains")]
+        # the answers straight from the records table
+        self.sql = BackendHandler(options={'dbpath': self.dbpath, 'cache_size': 0})
+
+    def tearDown(self):
+        snapshot.remove(self.snappath)
+        shutil.rmtree(self.dir)
+
+    def sql_lookup(self, qname, qtype, domain_id=-1):
+        self.sql.do_lookup(qname=qname, qtype=qtype, domain_id=domain_id)
+        return self.sql.result
+
+    def insert(self, *record):
+        db = sqlite3.connect(self.dbpath)
+        with db:
+            db.execute("INSERT INTO records (domain_id, name, type, content, ttl, prio, auth) VALUES (?, ?, ?, ?, ?, ?, ?)", record)
+        db.close()
+
+    def testLookup(self):
+        self.assertEqual(snapshot.build(self.dbpath, self.snappath), 1)
+        current = snapshot.SnapshotReader(self.snappath).current()
+        self.assertIsNotNone(current)
+        found = 0
+        for qname in NAMES:
+            for qtype in TYPES:
+                for domain_id in self.domain_ids:
+                    expected = self.sql_lookup(qname, qtype, domain_id)
+                    self.assertEqual(ordered(current.lookup(qname, qtype, domain_id)), ordered(expected),
+                                     (qname, qtype, domain_id))
+                    found += len(expected)
+        # not vacuous
+        self.assertGreater(found, 0)
+        self.assertEqual(current.lookup('missing.example.com.', 'ANY'), [])
+
+    def testNoSnapshot(self):
+        reader = snapshot.SnapshotReader(self.snappath)
+        self.assertIsNone(reader.current())
+
+    def testStale(self):
+        snapshot.build(self.dbpath, self.snappath)
+        handler = BackendHandler(options={'dbpath': self.dbpath, 'cache_size': 0, 'snapshot': self.snappath})
+        reader = handler.snapshot
+        self.assertIsNotNone(reader.current())
+
+        # a handler writes to the database: nobody uses the snapshot until a new one is taken
+        self.insert(1, 'new.example.com.', 'A', '192.168.2.100', 120, None, 1)
+        handler.records_changed()
+        self.assertIsNone(reader.current())
+        self.assertIsNone(snapshot.SnapshotReader(self.snappath).current())
+        handler.do_lookup(qname='new.example.com.', qtype='A')
+        self.assertEqual(handler.result, self.sql_lookup('new.example.com.', 'A'))
+        self.assertEqual(len(handler.result), 1)
+
+        self.assertEqual(snapshot.build(self.dbpath, self.snappath), 2)
+        current = reader.current()
+        self.assertIsNotNone(current)
+        self.assertEqual(current.lookup('new.example.com.', 'A'), self.sql_lookup('new.example.com.', 'A'))
+        # the previous generation is gone
+        self.assertFalse(os.path.exists(self.snappath + '.1'))
+
+    def testServedFromSnapshot(self):
+        snapshot.build(self.dbpath, self.snappath)
+        handler = BackendHandler(options={'dbpath': self.dbpath, 'cache_size': 0, 'snapshot': self.snappath})
+        # written behind the back of the handlers, only a new snapshot (prefork-backend.py watches
+        # the data_version of the database) brings it in
+        self.insert(1, 'later.example.com.', 'A', '192.168.2.101', 120, None, 1)
+        handler.do_lookup(qname='later.example.com.', qtype='A')
+        self.assertEqual(handler.result, [])
+        snapshot.build(self.dbpath, self.snappath)
+        handler.do_lookup(qname='later.example.com.', qtype='A')
+        self.assertEqual(handler.result, self.sql_lookup('later.example.com.', 'A'))
+
+    def testGenerationRemoved(self):
+        snapshot.build(self.dbpath, self.snappath)
+        os.unlink(self.snappath + '.1')
+        self.assertIsNone(snapshot.SnapshotReader(self.snappath).current())
+
+
+if __name__ == '__main__':
+    unittest.main()
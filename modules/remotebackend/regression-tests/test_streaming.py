@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""Replies of the streaming connectors when fetching the records fails, before and after the reply
+has started. Run with: PYTHONPATH=.. python -m unittest test_streaming"""
+
+import http.client
+import io
+import json
+import threading
+import unittest
+
+import streaming
+from dnsbackend import DNSBackendHandler, ThreadingDNSBackendServer
+
+RECORDS = streaming.STREAM_BATCH * 2 + 10
+
+
+class FailingHandler:
+    """Lists RECORDS records, failing after fail_after of them (never when None)"""
+    fail_after = None
+
+    def __init__(self, options={}):
+        self.result = False
+        self.log = []
+
+    def iter_list(self, **kwargs):
+        for i in range(RECORDS):
+            if i == self.fail_after:
+                raise RuntimeError("database went away")
+            yield {'qname': 'host%d.example.com' % i, 'qtype': 'A', 'content': '192.0.2.1', 'ttl': 60}
+
+    def do_lookup(self, **kwargs):
+        self.result = []
+
+
+class QuietDNSBackendHandler(DNSBackendHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def decode_all(text):
+    """All JSON documents in text, one after the other"""
+    decoder = json.JSONDecoder()
+    docs = []
+    pos = 0
+    while pos < len(text):
+        doc, pos = decoder.raw_decode(text, pos)
+        docs.append(doc)
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return docs
+
+
+class TestPipe(unittest.TestCase):
+
+    def run_requests(self, fail_after):
+        requests = [{'method': 'list', 'parameters': {'zonename': 'example.com', 'domain_id': 1}},
+                    {'method': 'lookup', 'parameters': {'qname': 'example.com', 'qtype': 'A'}}]
+        reader = io.StringIO(''.join(json.dumps(r) + '\n' for r in requests))
+        writer = io.StringIO()
+        handler = FailingHandler()
+        handler.fail_after = fail_after
+        connector = streaming.StreamingPipeConnector.__new__(streaming.StreamingPipeConnector)
+        connector.tracer = None
+        connector.mainloop4(reader, writer, handler)
+        lines = writer.getvalue().split('\n')
+        self.assertEqual(lines[-1], '')
+        # one reply per request, each on a line of its own
+        self.assertEqual(len(lines), 3)
+        for line in lines[:2]:
+            self.assertEqual(len(decode_all(line)), 1, line[:80])
+        return [json.loads(line) for line in lines[:2]]
+
+    def testComplete(self):
+        listed, looked_up = self.run_requests(None)
+        self.assertEqual(len(listed['result']), RECORDS)
+        self.assertEqual(looked_up['result'], [])
+
+    def testFailureMidStream(self):
+        listed, looked_up = self.run_requests(streaming.STREAM_BATCH + 5)
+        self.assertIs(listed['result'], False)
+        self.assertIn('database went away', listed['log'][-1])
+        self.assertEqual(looked_up['result'], [])
+
+    def testFailureInFirstBatch(self):
+        listed, looked_up = self.run_requests(5)
+        self.assertIs(listed['result'], False)
+        self.assertEqual(looked_up['result'], [])
+
+
+class TestHTTP(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingDNSBackendServer(('127.0.0.1', 0), QuietDNSBackendHandler, FailingHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def request(self, fail_after):
+        """Lists and then looks up on the same (persistent) connection"""
+        FailingHandler.fail_after = fail_after
+        try:
+            conn = http.client.HTTPConnection(*self.server.server_address, timeout=10)
+            replies = []
+            for path in ('/dns/list/1/example.com', '/dns/lookup/example.com/A'):
+                conn.request('GET', path)
+                res = conn.getresponse()
+                self.assertEqual(res.status, 200)
+                replies.append(decode_all(res.read().decode()))
+            conn.close()
+        finally:
+            FailingHandler.fail_after = None
+        for docs in replies:
+            self.assertEqual(len(docs), 1)
+        return [docs[0] for docs in replies]
+
+    def testComplete(self):
+        listed, looked_up = self.request(None)
+        self.assertEqual(len(listed['result']), RECORDS)
+        self.assertEqual(looked_up['result'], [])
+
+    def testFailureMidStream(self):
+        listed, looked_up = self.request(streaming.STREAM_BATCH + 5)
+        self.assertIs(listed['result'], False)
+        self.assertIn('database went away', listed['log'][-1])
+        self.assertEqual(looked_up['result'], [])
+
+    def testFailureInFirstBatch(self):
+        listed, looked_up = self.request(5)
+        self.assertIs(listed['result'], False)
+        self.assertEqual(looked_up['result'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
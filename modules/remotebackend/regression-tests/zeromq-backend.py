@@ -1,45 +1,59 @@
 #!/usr/bin/env python
 
+import argparse
+import functools
 import zmq
-import json
+import multiprocessing
 import os
-from urllib.parse import parse_qs, urlparse
+import threading
 from backend import BackendHandler
-
-def run(socket, handler):
-    while True:
-        message = socket.recv()
-        try:
-            message = json.loads(message.decode().strip())
-            method = "do_%s" % message['method'].lower()
-            args = message['parameters']
-            handler.result = False
-            handler.log = []
-            if callable(getattr(handler, method, None)):
-                getattr(handler, method)(**args)
-                result = json.dumps({'result': handler.result,'log': handler.log})
-                socket.send(result.encode())
-        except KeyboardInterrupt as e3:
-            return
-        except BrokenPipeError as e2:
-            raise e2
-        except Exception as e:
-            print(e)
-            socket.send(json.dumps({'result':False}).encode())
-
+from pdns_zeromq import broker, run, worker, worker_identity
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoint', default='ipc:///tmp/pdns.0')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='number of workers behind a ROUTER socket, 0 to handle requests on a single REP socket')
+    parser.add_argument('--processes', action='store_true',
+                        help='run the workers as processes instead of threads')
+    parser.add_argument('--cache-size', type=int, default=10000,
+                        help='number of answers to cache, 0 to disable the cache')
+    args = parser.parse_args()
+
     path = os.path.dirname(os.path.realpath(__file__))
-    context = zmq.Context()
-    socket = context.socket(zmq.REP)
-    socket.bind("ipc:///tmp/pdns.0")
-    handler = BackendHandler(options={'dbpath': os.path.join(path, 'remote.sqlite3')})
+    options = {'dbpath': os.path.join(path, 'remote.sqlite3'), 'cache_size': args.cache_size}
+    new_handler = functools.partial(BackendHandler, options=options)
 
+    workers_endpoint = "inproc://workers"
+    if args.workers and args.processes:
+        # started before the zmq context is created, contexts do not survive a fork
+        workers_endpoint = "ipc:///tmp/pdns-workers.%d" % os.getpid()
+        for i in range(args.workers):
+            multiprocessing.Process(target=worker, args=(None, workers_endpoint, worker_identity(i), new_handler),
+                                    daemon=True).start()
+
+    context = zmq.Context()
     try:
-        run(socket, handler)
+        if args.workers == 0:
+            socket = context.socket(zmq.REP)
+            socket.bind(args.endpoint)
+            run(socket, new_handler())
+        else:
+            frontend = context.socket(zmq.ROUTER)
+            frontend.bind(args.endpoint)
+            backend = context.socket(zmq.ROUTER)
+            backend.bind(workers_endpoint)
+            if not args.processes:
+                for i in range(args.workers):
+                    threading.Thread(target=worker, args=(context, workers_endpoint, worker_identity(i), new_handler),
+                                     daemon=True).start()
+            broker(frontend, backend, args.workers)
     except KeyboardInterrupt as e:
         pass
 
-    os.unlink("/tmp/remotebackend.0")
- 
+    if args.workers and args.processes:
+        os.unlink(workers_endpoint[len('ipc://'):])
+    if args.endpoint.startswith('ipc://'):
+        os.unlink(args.endpoint[len('ipc://'):])
+
 main()
@@ -327,6 +327,30 @@ BOOST_AUTO_TEST_CASE(test_method_feedRecord)
   backendUnderTest->commitTransaction();
 }
 
+BOOST_AUTO_TEST_CASE(test_method_feedRecord_replaceZone)
+{
+  DNSResourceRecord resourceRecord;
+  BOOST_TEST_MESSAGE("Testing feedRecord method replacing a zone");
+  // with a domain_id, the transaction replaces the contents of the zone
+  BOOST_CHECK(backendUnderTest->startTransaction(ZoneName("master.test."), 2));
+  resourceRecord.qname = DNSName("master.test.");
+  resourceRecord.qtype = QType::SOA;
+  resourceRecord.qclass = QClass::IN;
+  resourceRecord.ttl = 300;
+  resourceRecord.content = "ns1.master.test. hostmaster.master.test. 1 2 3 4 5";
+  BOOST_CHECK(backendUnderTest->feedRecord(resourceRecord, DNSName()));
+  BOOST_CHECK(backendUnderTest->commitTransaction());
+
+  int record_count = 0;
+  backendUnderTest->lookup(QType(QType::SOA), DNSName("master.test."));
+  while (backendUnderTest->get(resourceRecord)) {
+    record_count++;
+    BOOST_CHECK_EQUAL(resourceRecord.content, "ns1.master.test. hostmaster.master.test. 1 2 3 4 5");
+  }
+  // the old SOA is gone
+  BOOST_CHECK_EQUAL(record_count, 1);
+}
+
 BOOST_AUTO_TEST_CASE(test_method_replaceRRSet)
 {
   backendUnderTest->startTransaction(ZoneName("example.com."), 3);
@@ -2,116 +2,44 @@
 
 import http.server
 import json
-import re
+import threading
 
+from pdns_http import RequestArgs
 from pdns_unittest import Handler
-from urllib.parse import parse_qsl, urlparse, unquote
 
-class DNSBackendServer(http.server.HTTPServer):
+
+class DNSBackendServer(http.server.ThreadingHTTPServer):
+    """Serves every connection in its own thread, with persistent (HTTP/1.1) connections"""
     def __init__(self, *args, **kwargs):
-        self.handler = Handler()
+        self.local = threading.local()
         super().__init__(*args, **kwargs)
 
+    @property
+    def handler(self):
+        """The Handler of the current thread, handlers keep per-request state"""
+        handler = getattr(self.local, 'handler', None)
+        if handler is None:
+            handler = self.local.handler = Handler()
+        return handler
+
     def finish_request(self, request, client_address):
         """Finish one request by instantiating RequestHandlerClass."""
         h = self.RequestHandlerClass(request, client_address, self, handler=self.handler)
 
 
-class DNSBackendHandler(http.server.BaseHTTPRequestHandler):
+class DNSBackendHandler(RequestArgs, http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are separate writes, which would otherwise wait for the delayed ACK on persistent connections
+    disable_nagle_algorithm = True
+
     def __init__(self, *args, **kwargs):
         self.handler = kwargs['handler']
         super().__init__(*args)
 
-    def url_to_args(self):
-        url = urlparse(self.path)
-        parts = list(map(lambda part: unquote(part), url.path.split("/")))
-        parts.pop(0)
-        self.method = None
-
-        if parts.pop(0) != 'dns':
-            return
-
-        self.method = parts.pop(0).lower()
-        self.args = {}
-
-        if self.method == 'lookup':
-            self.args['qname'] = parts.pop(0)
-            self.args['qtype'] = parts.pop(0)
-        elif self.method == 'list':
-            self.args['id'] = int(parts.pop(0))
-            self.args['zonename'] = parts.pop(0)
-        elif self.method in ('getbeforeandafternamesabsolute', 'getbeforeandafternames'):
-            self.args['id'] = int(parts.pop(0))
-            self.args['qname'] = parts.pop(0)
-        elif self.method in ('getdomainmetadata', 'setdomainmetadata'):
-            self.args['name'] = parts.pop(0)
-            self.args['kind'] = parts.pop(0)
-        elif self.method == 'getdomainkeys':
-            self.args['name'] = parts.pop(0)
-        elif self.method in ('removedomainkey', 'activatedomainkey', 'deactivatedomainkey'):
-            self.args['id'] = int(parts.pop(0))
-            self.args['name'] = parts.pop(0)
-        elif self.method in ('adddomainkey', 'gettsigkey', 'getdomaininfo', 'settsigkey', 'deletetsigkey', 'getalldomainmetadata'):
-            self.args['name'] = parts.pop(0)
-        elif self.method == 'setnotified':
-            self.args['id'] = int(parts.pop(0))
-        elif self.method == 'feedents':
-            self.args['id'] = int(parts.pop(0))
-            self.args['trxid'] = int(parts.pop(0))
-        elif self.method == 'ismaster':
-            self.args['name'] = parts.pop(0)
-            self.args['ip'] = parts.pop(0)
-        elif self.method in ('supermasterbackend', 'createslavedomain'):
-            self.args['ip'] = parts.pop(0)
-            self.args['domain'] = parts.pop(0)
-        elif self.method in ('feedents3', 'starttransaction'):
-            self.args['id'] = int(parts.pop(0))
-            self.args['domain'] = parts.pop(0)
-            self.args['trxid'] = int(parts.pop(0))
-        elif self.method in ('feedrecord', 'committransaction', 'aborttransaction'):
-            self.args['trxid'] = int(parts.pop(0))
-        elif self.method == 'replacerrset':
-            self.args['id'] = int(parts.pop(0))
-            self.args['qname'] = parts.pop(0)
-            self.args['qtype'] = parts.pop(0)
-        assert len(parts) == 0, parts
-
-        self.parse_qsl(url.query)
-
-    def parse_qsl(self, qs):
-        res = {}
-        for key, value in parse_qsl(qs):
-            m = re.match(r"^(.*)\[(.*)\]\[(.*)\]", key)
-            if m:
-                k1 = m.group(1)
-                k2 = int(m.group(2))
-                k3 = m.group(3)
-                if k1 not in res:
-                    res[k1] = list({})
-                while len(res[k1]) <= k2:
-                    res[k1].append({})
-                res[k1][k2][k3] = value
-            else:
-                m = re.match(r"^(.*)\[(.*)\]", key)
-                if m:
-                    k1 = m.group(1)
-                    k2 = m.group(2)
-                    if k1 not in res:
-                        if k2 == '':
-                            res[k1] = list()
-                        else:
-                            res[k1] = {}
-                    if k2 == '':
-                        res[k1].append(value)
-                    else:                        
-                        res[k1][k2] = value
-                else:
-                    res[key] = value
-        self.args = self.args | res
-
     def do_GET(self):
         if self.path == '/ping':
             self.send_response(200)
+            self.send_header("content-length", 4)
             self.end_headers()
             self.wfile.write("pong".encode())
             return
@@ -1,42 +1,35 @@
 #!/usr/bin/env python
 
+import argparse
 import zmq
-import json
 import os
-from urllib.parse import parse_qs, urlparse
+import threading
 from pdns_unittest import Handler
-
-def run(socket, handler):
-    while True:
-        message = socket.recv()
-        try:
-            message = json.loads(message.decode().strip())
-            method = "do_%s" % message['method'].lower()
-            args = message['parameters']
-            handler.result = False
-            handler.log = []
-            if callable(getattr(handler, method, None)):
-                getattr(handler, method)(**args)
-                result = json.dumps({'result': handler.result,'log': handler.log})
-                socket.send(result.encode())
-        except KeyboardInterrupt as e3:
-            return
-        except BrokenPipeError as e2:
-            raise e2
-        except Exception as e:
-            print(e)
-            socket.send(json.dumps({'result':False}).encode())
-
+from pdns_zeromq import broker, run, worker, worker_identity
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=0,
+                        help='number of worker threads behind a ROUTER socket, 0 to handle requests on a single REP socket')
+    args = parser.parse_args()
+
     context = zmq.Context()
-    socket = context.socket(zmq.REP)
-    socket.bind("ipc:///tmp/remotebackend.0")
-    handler = Handler()
     print("Listening on ipc:///tmp/remotebackend.0")
 
     try:
-        run(socket, handler)
+        if args.workers == 0:
+            socket = context.socket(zmq.REP)
+            socket.bind("ipc:///tmp/remotebackend.0")
+            run(socket, Handler())
+        else:
+            frontend = context.socket(zmq.ROUTER)
+            frontend.bind("ipc:///tmp/remotebackend.0")
+            backend = context.socket(zmq.ROUTER)
+            backend.bind("inproc://workers")
+            for i in range(args.workers):
+                threading.Thread(target=worker, args=(context, "inproc://workers", worker_identity(i), Handler),
+                                 daemon=True).start()
+            broker(frontend, backend, args.workers)
     except KeyboardInterrupt as e:
         pass
 
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Measures how the keyroller behaves with many zones, against the in-memory API of ``mockapi.py``. For every scenario,
+the number of API calls (in total and per zone), the wall time and the peak RSS are reported.
+
+The scenarios are:
+
+* ``startup``: loading all zones when the daemon starts
+* ``startup-mirror-cold`` and ``startup-mirror-warm``: the same, with a state mirror that is empty, and one that was
+  filled by the previous run
+* ``tick``: one :meth:`pdnskeyroller.daemon.Daemon.run`, with ``--due`` zones needing a ZSK roll
+* ``zsk-roll``: a complete pre-publish ZSK roll (initiate, step 1 and step 2) of ``--roll-zones`` zones
+
+The mock API and every scenario run in their own process, so the reported peak RSS is that of the keyroller code only.
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..'))
+
+from pdnsapi.api import PDNSApi  # noqa: E402
+from pdnskeyroller import PDNSKEYROLLER_CONFIG_metadata_kind, PDNSKEYROLLER_STATE_metadata_kind  # noqa: E402
+import pdnskeyroller.daemon  # noqa: E402
+import pdnskeyroller.domainstate  # noqa: E402
+import pdnskeyroller.keyrollerdomain  # noqa: E402
+from pdnskeyroller.domainconfig import DomainConfig  # noqa: E402
+from pdnskeyroller.domainstate import DomainState  # noqa: E402
+from pdnskeyroller.prepublishkeyroll import PrePublishKeyRoll  # noqa: E402
+
+APIKEY = 'benchmark'
+
+
+def zone_name(i):
+    # Keep in sync with mockapi.zone_name()
+    return 'zone{}.example.'.format(i)
+
+
+def mock_stats(baseurl, reset=False):
+    req = urllib.request.Request(baseurl + '/mock/stats', method='DELETE' if reset else 'GET')
+    with urllib.request.urlopen(req) as res:
+        if reset:
+            return None
+        return json.loads(res.read())
+
+
+def write_config(path, baseurl, state_mirror=None):
+    with open(path, 'w') as f:
+        f.write('keyroller:\n')
+        f.write('  loglevel: warning\n')
+        if state_mirror:
+            f.write('  state_mirror: {}\n'.format(state_mirror))
+        f.write('API:\n')
+        f.write('  baseurl: {}\n'.format(baseurl))
+        f.write('  apikey: {}\n'.format(APIKEY))
+        f.write('  timeout: 10\n')
+
+
+def scenario_startup(configfile, baseurl, arguments):
+    pdnskeyroller.daemon.Daemon(configfile)
+
+
+def scenario_tick(configfile, baseurl, arguments):
+    d = pdnskeyroller.daemon.Daemon(configfile)
+    # Only the tick itself is measured
+    mock_stats(baseurl, reset=True)
+    start = time.monotonic()
+    stats = d.run()
+    return time.monotonic() - start, stats['processed']
+
+
+def scenario_zsk_roll(configfile, baseurl, arguments):
+    api = PDNSApi(APIKEY, baseurl=baseurl, timeout=10)
+    for i in range(arguments.zones - arguments.roll_zones, arguments.zones):
+        kd = pdnskeyroller.keyrollerdomain.KeyrollerDomain(zone_name(i), api)
+        roll = PrePublishKeyRoll()
+        roll.initiate(kd.zone, api, 'zsk', kd.config.zsk_algo)
+        kd.state.current_roll = roll
+        pdnskeyroller.domainstate.to_api(kd.zone, api, kd.state)
+        while kd.state.is_rolling:
+            # Pretend the TTLs have passed
+            kd.state.current_roll.current_step_datetime = datetime.datetime.now()
+            kd.step()
+        if kd.state.last_roll_date('zsk') == datetime.datetime.min:
+            raise Exception('ZSK roll of {} did not complete'.format(kd.zone))
+
+
+SCENARIOS = {
+    'startup': scenario_startup,
+    'startup-mirror-cold': scenario_startup,
+    'startup-mirror-warm': scenario_startup,
+    'tick': scenario_tick,
+    'zsk-roll': scenario_zsk_roll,
+}
+
+
+def child(scenario, configfile, baseurl, arguments):
+    start = time.monotonic()
+    ret = SCENARIOS[scenario](configfile, baseurl, arguments)
+    elapsed = time.monotonic() - start
+    processed = None
+    if ret is not None:
+        elapsed, processed = ret
+    print(json.dumps({
+        'seconds': elapsed,
+        'processed': processed,
+        'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }))
+
+
+def start_mock(arguments):
+    metadata = {
+        PDNSKEYROLLER_CONFIG_metadata_kind: [str(DomainConfig(zsk_frequency='6w'))],
+        # Rolled recently, so nothing is due unless the benchmark says so
+        PDNSKEYROLLER_STATE_metadata_kind: [str(DomainState(last_zsk_roll_datetime=datetime.datetime.now()))],
+    }
+    proc = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, 'mockapi.py'), '--port', '0',
+                             '--apikey', APIKEY, '--zones', str(arguments.zones), '--records', str(arguments.records),
+                             '--latency', str(arguments.latency), '--configured', str(arguments.configured),
+                             '--metadata', json.dumps(metadata)],
+                            stdout=subprocess.PIPE, text=True)
+    baseurl = proc.stdout.readline().split()[-1]
+    return proc, baseurl
+
+
+def main():
+    argp = argparse.ArgumentParser(description='Benchmark the keyroller against a mock API with many zones')
+    argp.add_argument('--zones', '-n', type=int, default=10000, help='Number of zones on the server')
+    argp.add_argument('--records', type=int, default=10, help='Number of A records per zone')
+    argp.add_argument('--configured', type=float, default=1.0,
+                      help='Fraction of the zones that have a keyroller configuration')
+    argp.add_argument('--latency', type=float, default=0.0, help='Seconds the API waits before each answer')
+    argp.add_argument('--due', type=int, default=10, help='Number of zones due for a ZSK roll in the tick scenario')
+    argp.add_argument('--roll-zones', type=int, default=10, help='Number of zones to roll in the zsk-roll scenario')
+    argp.add_argument('--scenario', '-s', action='append', choices=SCENARIOS.keys(),
+                      help='Run only this scenario, can be given more than once')
+    argp.add_argument('--child', choices=SCENARIOS.keys(), help=argparse.SUPPRESS)
+    argp.add_argument('--config', help=argparse.SUPPRESS)
+    argp.add_argument('--baseurl', help=argparse.SUPPRESS)
+    arguments = argp.parse_args()
+
+    if arguments.child:
+        child(arguments.child, arguments.config, arguments.baseurl, arguments)
+        return
+
+    if arguments.due + arguments.roll_zones > arguments.configured * arguments.zones:
+        argp.error('--due and --roll-zones need more configured zones than there are')
+
+    scenarios = arguments.scenario or list(SCENARIOS)
+    proc, baseurl = start_mock(arguments)
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            print('{} zones ({:.0%} configured), {} records each, {:.1f}ms API latency'.format(
+                arguments.zones, arguments.configured, arguments.records, arguments.latency * 1000))
+            for scenario in scenarios:
+                configfile = os.path.join(tmpdir, '{}.conf'.format(scenario))
+                write_config(configfile, baseurl,
+                             os.path.join(tmpdir, 'mirror.sqlite') if scenario.startswith('startup-mirror') else None)
+                if scenario == 'tick':
+                    api = PDNSApi(APIKEY, baseurl=baseurl, timeout=10)
+                    for i in range(arguments.due):
+                        api.delete_zone_metadata(zone_name(i), PDNSKEYROLLER_STATE_metadata_kind)
+
+                mock_stats(baseurl, reset=True)
+                out = subprocess.run([sys.executable, __file__, '--child', scenario, '--config', configfile,
+                                      '--baseurl', baseurl, '--zones', str(arguments.zones),
+                                      '--roll-zones', str(arguments.roll_zones)],
+                                     check=True, stdout=subprocess.PIPE, text=True).stdout
+                res = json.loads(out)
+                calls = sum(mock_stats(baseurl).values())
+                zones = {
+                    'tick': arguments.due,
+                    'zsk-roll': arguments.roll_zones,
+                }.get(scenario, arguments.zones)
+                print('{:20} {:8} API calls {:8.2f} per zone {:8.2f}s {:10.1f} MiB peak RSS'.format(
+                    scenario, calls, calls / zones if zones else 0, res['seconds'], res['peak_rss_kib'] / 1024))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    main()
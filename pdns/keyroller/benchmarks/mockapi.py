@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+An in-memory stand-in for the parts of the PowerDNS Authoritative HTTP API that :class:`pdnsapi.api.PDNSApi` uses:
+zones (list, get, create, PATCH, PUT, DELETE), cryptokeys and metadata. Every request can be delayed by a fixed
+latency, to mimic a busy server.
+
+Zones are generated on demand from their number, so servers with hundreds of thousands of zones only use memory for
+the zones that were changed. The number of requests per endpoint is available from ``GET /mock/stats`` and reset with
+``DELETE /mock/stats``.
+
+It can be run on its own::
+
+    $ python3 benchmarks/mockapi.py --zones 10000 --records 20 --latency 0.01 --port 8081
+"""
+import argparse
+import collections
+import http.server
+import json
+import re
+import socketserver
+import threading
+import time
+from urllib.parse import unquote, urlparse, parse_qs
+
+API_PREFIX = '/api/v1/servers/localhost'
+
+_key_template = {
+    'type': 'Cryptokey',
+    'algorithm': 'ECDSAP256SHA256',
+    'bits': 256,
+}
+
+
+def zone_name(i):
+    return 'zone{}.example.'.format(i)
+
+
+def _routes():
+    """
+    The endpoints of the API, as (method, compiled path pattern, endpoint name, handler method name)
+    """
+    routes = [
+        ('GET', r'', 'server', 'server'),
+        ('GET', r'/zones', 'zones', 'zones_get'),
+        ('POST', r'/zones', 'zones', 'zones_post'),
+        ('GET', r'/zones/(?P<zone>[^/]+)', 'zone', 'zone_get'),
+        ('PATCH', r'/zones/(?P<zone>[^/]+)', 'zone', 'zone_patch'),
+        ('PUT', r'/zones/(?P<zone>[^/]+)', 'zone', 'zone_put'),
+        ('DELETE', r'/zones/(?P<zone>[^/]+)', 'zone', 'zone_delete'),
+        ('GET', r'/zones/(?P<zone>[^/]+)/cryptokeys', 'cryptokeys', 'cryptokeys_get'),
+        ('POST', r'/zones/(?P<zone>[^/]+)/cryptokeys', 'cryptokeys', 'cryptokeys_post'),
+        ('GET', r'/zones/(?P<zone>[^/]+)/cryptokeys/(?P<keyid>\d+)', 'cryptokey', 'cryptokey_get'),
+        ('PUT', r'/zones/(?P<zone>[^/]+)/cryptokeys/(?P<keyid>\d+)', 'cryptokey', 'cryptokey_put'),
+        ('DELETE', r'/zones/(?P<zone>[^/]+)/cryptokeys/(?P<keyid>\d+)', 'cryptokey', 'cryptokey_delete'),
+        ('GET', r'/zones/(?P<zone>[^/]+)/metadata', 'metadata', 'metadata_get'),
+        ('GET', r'/zones/(?P<zone>[^/]+)/metadata/(?P<kind>[^/]+)', 'metadata_kind', 'metadata_kind_get'),
+        ('PUT', r'/zones/(?P<zone>[^/]+)/metadata/(?P<kind>[^/]+)', 'metadata_kind', 'metadata_kind_put'),
+        ('DELETE', r'/zones/(?P<zone>[^/]+)/metadata/(?P<kind>[^/]+)', 'metadata_kind', 'metadata_kind_delete'),
+    ]
+    return [(method, re.compile('^' + API_PREFIX + path + '$'), endpoint, handler)
+            for method, path, endpoint, handler in routes]
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MockBackend:
+    """
+    The state of the mock server. All methods take the path parameters and the decoded request body, and return a
+    tuple of the status code and the object to send as JSON (or None).
+    """
+
+    def __init__(self, zones=100, records=10, metadata=None, configured=1.0, ttl=3600):
+        """
+        :param int zones: The number of zones the server starts with
+        :param int records: The number of A records in each of those zones
+        :param dict metadata: Metadata that the generated zones start with, kind to list of values
+        :param float configured: The fraction of the generated zones that get ``metadata``
+        :param int ttl: The TTL of the generated records
+        """
+        self._lock = threading.Lock()
+        self._records = records
+        self._ttl = ttl
+        self._metadata = metadata or {}
+        self._generated = zones
+        self._configured = int(zones * configured)
+        # Zones that were created or modified, by id
+        self._zones = {}
+        self._deleted = set()
+
+    def _generated_zone(self, name):
+        index = int(name[4:name.index('.')])
+        return {
+            'id': name,
+            'name': name,
+            'url': API_PREFIX + '/zones/' + name,
+            'kind': 'Native',
+            'serial': 1,
+            'notified_serial': 0,
+            'masters': [],
+            'dnssec': True,
+            'account': '',
+            'rrsets': None,
+            'keys': {
+                1: dict(_key_template, id=1, keytype='ksk', active=True, published=True, flags=257,
+                        dnskey='257 3 13 {}'.format('K' * 86)),
+                2: dict(_key_template, id=2, keytype='zsk', active=True, published=True, flags=256,
+                        dnskey='256 3 13 {}'.format('Z' * 86)),
+            },
+            'metadata': {k: list(v) for k, v in self._metadata.items()} if index < self._configured else {},
+        }
+
+    def _generated_rrsets(self, name):
+        rrsets = [
+            {'name': name, 'type': 'SOA', 'ttl': self._ttl, 'comments': [], 'records': [
+                {'content': 'ns1.{} hostmaster.{} 1 10800 3600 604800 3600'.format(name, name), 'disabled': False}]},
+            {'name': name, 'type': 'NS', 'ttl': self._ttl, 'comments': [], 'records': [
+                {'content': 'ns1.{}'.format(name), 'disabled': False},
+                {'content': 'ns2.{}'.format(name), 'disabled': False}]},
+        ]
+        for i in range(self._records):
+            rrsets.append({'name': 'host{}.{}'.format(i, name), 'type': 'A', 'ttl': self._ttl, 'comments': [],
+                           'records': [{'content': '192.0.2.{}'.format(i % 256), 'disabled': False}]})
+        return rrsets
+
+    def _zone_names(self):
+        for i in range(self._generated):
+            name = zone_name(i)
+            if name not in self._deleted and name not in self._zones:
+                yield name
+        yield from self._zones.keys()
+
+    def _zone(self, zone, materialize=True):
+        """
+        Returns the zone with id ``zone``, storing it so it can be modified when ``materialize`` is True
+        """
+        z = self._zones.get(zone)
+        if z is not None:
+            return z
+        m = re.match(r'^zone(\d+)\.example\.$', zone)
+        if not m or int(m.group(1)) >= self._generated or zone in self._deleted:
+            raise ApiError(404, 'Could not find domain \'{}\''.format(zone))
+        z = self._generated_zone(zone)
+        if materialize:
+            self._zones[zone] = z
+        return z
+
+    @staticmethod
+    def _info(z):
+        return {k: v for k, v in z.items() if k not in ('rrsets', 'keys', 'metadata')}
+
+    def _rrsets(self, z):
+        if z['rrsets'] is None:
+            return self._generated_rrsets(z['name'])
+        return z['rrsets']
+
+    def server(self, body):
+        return 200, {'type': 'Server', 'id': 'localhost', 'daemon_type': 'authoritative', 'version': 'mock'}
+
+    def zones_get(self, body):
+        return 200, [self._info(self._zones[n]) if n in self._zones else self._info(self._generated_zone(n))
+                     for n in self._zone_names()]
+
+    def zones_post(self, body):
+        name = body['name']
+        if not name.endswith('.'):
+            name += '.'
+        if name in self._zones or (re.match(r'^zone(\d+)\.example\.$', name) and name not in self._deleted and
+                                   int(name[4:name.index('.')]) < self._generated):
+            raise ApiError(409, 'Domain \'{}\' already exists'.format(name))
+        z = {
+            'id': name, 'name': name, 'url': API_PREFIX + '/zones/' + name, 'kind': body.get('kind', 'Native'),
+            'serial': 1, 'notified_serial': 0, 'masters': body.get('masters', []), 'dnssec': False, 'account': '',
+            'rrsets': [dict(rrset, comments=rrset.get('comments', [])) for rrset in body.get('rrsets', [])],
+            'keys': {}, 'metadata': {},
+        }
+        for rrset in z['rrsets']:
+            rrset.pop('changetype', None)
+        if not any(r['type'] == 'SOA' for r in z['rrsets']):
+            # The real server creates a default SOA as well
+            z['rrsets'].insert(0, {'name': name, 'type': 'SOA', 'ttl': self._ttl, 'comments': [], 'records': [
+                {'content': 'a.misconfigured.dns.server.invalid. hostmaster.{} 1 10800 3600 604800 3600'.format(name),
+                 'disabled': False}]})
+        self._deleted.discard(name)
+        self._zones[name] = z
+        return 201, dict(self._info(z), rrsets=z['rrsets'])
+
+    def zone_get(self, zone, body, rrsets=True):
+        z = self._zone(zone, materialize=False)
+        if not rrsets:
+            return 200, self._info(z)
+        return 200, dict(self._info(z), rrsets=self._rrsets(z))
+
+    def zone_patch(self, zone, body):
+        z = self._zone(zone)
+        rrsets = self._rrsets(z)
+        index = {(r['name'], r['type']): i for i, r in enumerate(rrsets)}
+        for change in body.get('rrsets', []):
+            key = (change['name'], change['type'])
+            changetype = change.get('changetype', '').upper()
+            if changetype == 'DELETE':
+                if key in index:
+                    rrsets[index[key]] = None
+            elif changetype == 'REPLACE':
+                rrset = {'name': change['name'], 'type': change['type'], 'ttl': change.get('ttl', self._ttl),
+                         'records': change.get('records', []), 'comments': change.get('comments', [])}
+                if key in index and rrsets[index[key]] is not None:
+                    rrsets[index[key]] = rrset
+                else:
+                    index[key] = len(rrsets)
+                    rrsets.append(rrset)
+            else:
+                raise ApiError(422, 'Changetype not understood')
+        rrsets = [r for r in rrsets if r is not None]
+        if not any(r['type'] == 'SOA' and r['name'] == z['name'] for r in rrsets):
+            # Like the real server, which refuses a zone without SOA
+            raise ApiError(422, 'Zone {} has no SOA record at the apex'.format(z['name']))
+        z['rrsets'] = rrsets
+        for r in z['rrsets']:
+            if r['type'] == 'SOA' and r['records']:
+                z['serial'] = int(r['records'][0]['content'].split(' ')[2])
+        return 204, None
+
+    def zone_put(self, zone, body):
+        z = self._zone(zone)
+        for k, v in body.items():
+            if k in ('kind', 'masters', 'account', 'dnssec'):
+                z[k] = v
+        return 204, None
+
+    def zone_delete(self, zone, body):
+        self._zone(zone)
+        del self._zones[zone]
+        self._deleted.add(zone)
+        return 204, None
+
+    def cryptokeys_get(self, zone, body):
+        z = self._zone(zone, materialize=False)
+        return 200, list(z['keys'].values())
+
+    def cryptokeys_post(self, zone, body):
+        z = self._zone(zone)
+        keyid = max(z['keys'], default=0) + 1
+        keytype = body.get('keytype', 'zsk')
+        flags = 257 if keytype in ('ksk', 'csk') else 256
+        key = dict(_key_template, id=keyid, keytype=keytype, active=body.get('active', False),
+                   published=body.get('published', True), flags=flags,
+                   dnskey='{} 3 13 {}'.format(flags, str(keyid) * 86))
+        z['keys'][keyid] = key
+        return 201, key
+
+    def cryptokey_get(self, zone, keyid, body):
+        z = self._zone(zone, materialize=False)
+        if int(keyid) not in z['keys']:
+            raise ApiError(404, 'Could not find key {}'.format(keyid))
+        return 200, z['keys'][int(keyid)]
+
+    def cryptokey_put(self, zone, keyid, body):
+        z = self._zone(zone)
+        if int(keyid) not in z['keys']:
+            raise ApiError(422, 'Could not find key {}'.format(keyid))
+        for k in ('active', 'published'):
+            if k in body:
+                z['keys'][int(keyid)][k] = body[k]
+        return 204, None
+
+    def cryptokey_delete(self, zone, keyid, body):
+        z = self._zone(zone)
+        if z['keys'].pop(int(keyid), None) is None:
+            raise ApiError(422, 'Could not find key {}'.format(keyid))
+        return 204, None
+
+    def metadata_get(self, zone, body):
+        z = self._zone(zone, materialize=False)
+        return 200, [{'type': 'Metadata', 'kind': k, 'metadata': v} for k, v in z['metadata'].items()]
+
+    def metadata_kind_get(self, zone, kind, body):
+        z = self._zone(zone, materialize=False)
+        return 200, {'type': 'Metadata', 'kind': kind, 'metadata': z['metadata'].get(kind, [])}
+
+    def metadata_kind_put(self, zone, kind, body):
+        z = self._zone(zone)
+        z['metadata'][kind] = body['metadata']
+        return 200, {'type': 'Metadata', 'kind': kind, 'metadata': body['metadata']}
+
+    def metadata_kind_delete(self, zone, kind, body):
+        z = self._zone(zone)
+        z['metadata'].pop(kind, None)
+        return 204, None
+
+    def handle(self, handler, params, body, query):
+        with self._lock:
+            if handler == 'zone_get':
+                return self.zone_get(body=body, rrsets=query.get('rrsets', ['true'])[0] != 'false', **params)
+            return getattr(self, handler)(body=body, **params)
+
+
+class MockRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, do not let them wait for the ACK of the client
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, obj):
+        payload = json.dumps(obj).encode() if obj is not None else b''
+        self.send_response(status)
+        if obj is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+
+        if url.path == '/mock/stats':
+            if self.command == 'DELETE':
+                self.server.reset_stats()
+                return self._send(204, None)
+            return self._send(200, self.server.get_stats())
+
+        if self.headers.get('X-API-Key') != self.server.apikey:
+            return self._send(401, {'error': 'Unauthorized'})
+
+        path = unquote(url.path)
+        for method, pattern, endpoint, handler in self.server.routes:
+            m = pattern.match(path)
+            if m and method == self.command:
+                break
+        else:
+            return self._send(404, {'error': 'Not Found'})
+
+        self.server.count('{} {}'.format(method, endpoint))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        try:
+            body = json.loads(raw) if raw else {}
+            status, obj = self.server.backend.handle(handler, m.groupdict(), body, parse_qs(url.query))
+        except ApiError as e:
+            status, obj = e.status, {'error': str(e)}
+        except (ValueError, KeyError) as e:
+            status, obj = 422, {'error': 'Invalid request: {}'.format(e)}
+        self._send(status, obj)
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+    do_PUT = _dispatch
+    do_PATCH = _dispatch
+    do_DELETE = _dispatch
+
+
+class MockServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, backend, apikey='secret', latency=0.0):
+        """
+        :param tuple address: (host, port) to listen on, port 0 picks a free port
+        :param MockBackend backend: The state of the server
+        :param string apikey: The API key clients have to send
+        :param float latency: The number of seconds to wait before answering each API request
+        """
+        self.backend = backend
+        self.apikey = apikey
+        self.latency = latency
+        self.routes = _routes()
+        self._stats_lock = threading.Lock()
+        self._stats = collections.Counter()
+        super().__init__(address, MockRequestHandler)
+
+    @property
+    def baseurl(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def count(self, endpoint):
+        with self._stats_lock:
+            self._stats[endpoint] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+    def start(self):
+        """
+        Serves requests in a background thread
+        """
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    argp = argparse.ArgumentParser(description='In-memory stand-in for the PowerDNS Authoritative HTTP API')
+    argp.add_argument('--address', default='127.0.0.1')
+    argp.add_argument('--port', type=int, default=8081)
+    argp.add_argument('--apikey', default='secret')
+    argp.add_argument('--zones', type=int, default=100, help='Number of zones to start with')
+    argp.add_argument('--records', type=int, default=10, help='Number of A records per zone')
+    argp.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each request')
+    argp.add_argument('--metadata', default='{}', help='JSON object with the metadata zones start with')
+    argp.add_argument('--configured', type=float, default=1.0, help='Fraction of the zones that get the metadata')
+    arguments = argp.parse_args()
+
+    server = MockServer((arguments.address, arguments.port),
+                        MockBackend(arguments.zones, arguments.records, json.loads(arguments.metadata),
+                                    arguments.configured),
+                        apikey=arguments.apikey, latency=arguments.latency)
+    print('Serving {} zones on {}'.format(arguments.zones, server.baseurl), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Measures the API calls and the time per zone of every step of a pre-publish key roll, against the in-memory API of
+``mockapi.py`` with a fixed latency per request. Each phase is run for ``--zones`` zones, one after the other:
+
+* ``zsk initiate``: starting a ZSK roll and storing the state
+* ``zsk step 1``: activating the new ZSK, deactivating the old one
+* ``zsk step 2``: removing the old ZSK, which completes the roll
+* ``ksk initiate``: starting a KSK roll
+* ``ksk wait-ds``: a step of a KSK roll that is waiting for the DS, which changes nothing
+
+The keyroller code is imported from ``--tree`` (by default this checkout), so the numbers of two versions can be
+compared::
+
+    $ git worktree add /tmp/before <commit>
+    $ python3 benchmarks/roll-steps.py --tree /tmp/before/pdns/keyroller
+    $ python3 benchmarks/roll-steps.py
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+BENCHMARKS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+APIKEY = 'benchmark'
+
+PHASES = ['zsk initiate', 'zsk step 1', 'zsk step 2', 'ksk initiate', 'ksk wait-ds']
+
+
+def zone_name(i):
+    # Keep in sync with mockapi.zone_name()
+    return 'zone{}.example.'.format(i)
+
+
+def mock_stats(baseurl, reset=False):
+    req = urllib.request.Request(baseurl + '/mock/stats', method='DELETE' if reset else 'GET')
+    with urllib.request.urlopen(req) as res:
+        if reset:
+            return None
+        return json.loads(res.read())
+
+
+def start_mock(arguments):
+    proc = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, 'mockapi.py'), '--port', '0',
+                             '--apikey', APIKEY, '--zones', str(arguments.zones), '--records', str(arguments.records),
+                             '--latency', str(arguments.latency), '--metadata', json.dumps(arguments.metadata)],
+                            stdout=subprocess.PIPE, text=True)
+    baseurl = proc.stdout.readline().split()[-1]
+    return proc, baseurl
+
+
+def run_phases(baseurl, arguments):
+    """
+    :return: For every phase, the number of API calls and the seconds it took for all zones
+    :rtype: dict
+    """
+    from pdnsapi.api import PDNSApi
+    import pdnskeyroller.domainstate
+    import pdnskeyroller.keyrollerdomain
+    from pdnskeyroller.prepublishkeyroll import PrePublishKeyRoll
+
+    api = PDNSApi(APIKEY, baseurl=baseurl, timeout=10)
+    domains = [pdnskeyroller.keyrollerdomain.KeyrollerDomain(zone_name(i), api) for i in range(arguments.zones)]
+
+    def initiate(kd, keytype):
+        roll = PrePublishKeyRoll()
+        roll.initiate(kd.zone, api, keytype, kd.config.zsk_algo)
+        kd.state.current_roll = roll
+        pdnskeyroller.domainstate.to_api(kd.zone, api, kd.state)
+
+    def pretend_ttls_passed(kd):
+        kd.state.current_roll.current_step_datetime = datetime.datetime.now()
+
+    def pretend_ttls_passed_stored(kd):
+        # Like a zone the daemon finds due, the stored state already has the passed step datetime
+        pretend_ttls_passed(kd)
+        pdnskeyroller.domainstate.to_api(kd.zone, api, kd.state)
+
+    # (preparation, not measured, and action) per phase
+    actions = {
+        'zsk initiate': (None, lambda kd: initiate(kd, 'zsk')),
+        'zsk step 1': (pretend_ttls_passed, lambda kd: kd.step()),
+        'zsk step 2': (pretend_ttls_passed, lambda kd: kd.step()),
+        'ksk initiate': (None, lambda kd: initiate(kd, 'ksk')),
+        'ksk wait-ds': (pretend_ttls_passed_stored, lambda kd: kd.step()),
+    }
+
+    ret = {}
+    for phase in PHASES:
+        prepare, action = actions[phase]
+        if prepare is not None:
+            for kd in domains:
+                prepare(kd)
+        mock_stats(baseurl, reset=True)
+        start = time.monotonic()
+        for kd in domains:
+            action(kd)
+        ret[phase] = (sum(mock_stats(baseurl).values()), time.monotonic() - start)
+    for kd in domains:
+        if kd.state.last_roll_date('zsk') == datetime.datetime.min:
+            raise Exception('ZSK roll of {} did not complete'.format(kd.zone))
+    return ret
+
+
+def main():
+    argp = argparse.ArgumentParser(description='Benchmark the API calls and time of every step of a key roll')
+    argp.add_argument('--tree', default=os.path.join(BENCHMARKS_DIR, '..'),
+                      help='Directory with the pdnsapi and pdnskeyroller packages to benchmark')
+    argp.add_argument('--zones', '-n', type=int, default=50, help='Number of zones to roll')
+    argp.add_argument('--records', type=int, default=10, help='Number of A records per zone')
+    argp.add_argument('--latency', type=float, default=0.02, help='Seconds the API waits before each answer')
+    arguments = argp.parse_args()
+
+    sys.path.insert(0, os.path.realpath(arguments.tree))
+    from pdnskeyroller import PDNSKEYROLLER_CONFIG_metadata_kind
+    from pdnskeyroller.domainconfig import DomainConfig
+    arguments.metadata = {PDNSKEYROLLER_CONFIG_metadata_kind: [str(DomainConfig(zsk_frequency='6w'))]}
+
+    proc, baseurl = start_mock(arguments)
+    try:
+        print('{} zones, {} records each, {:.1f}ms API latency, code from {}'.format(
+            arguments.zones, arguments.records, arguments.latency * 1000, os.path.realpath(arguments.tree)))
+        for phase, (calls, seconds) in run_phases(baseurl, arguments).items():
+            print('{:14} {:6.2f} API calls per zone {:8.1f}ms per zone'.format(
+                phase, calls / arguments.zones, seconds / arguments.zones * 1000))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    main()
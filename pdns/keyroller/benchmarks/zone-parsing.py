@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compares the time and peak memory needed to go over all RRSets of a large zone, using either
+``Zone(**json)`` (what :meth:`pdnsapi.api.PDNSApi.get_zone` does) or the streaming
+:func:`pdnsapi.zone.iter_rrsets` (what :meth:`pdnsapi.api.PDNSApi.iter_zone` does).
+
+Every method runs in its own process, so the reported peak RSS is not influenced by the other runs.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from pdnsapi.zone import Zone, iter_rrsets  # noqa: E402
+
+CHUNK_SIZE = 65536
+
+
+def write_zone(path, records):
+    """
+    Writes a zone with ``records`` A records (one RRSet per record), shaped like an API response
+    """
+    with open(path, 'w') as f:
+        f.write('{"id": "example.com.", "kind": "Native", "name": "example.com.", "rrsets": [')
+        f.write(json.dumps({'name': 'example.com.', 'type': 'SOA', 'ttl': 3600, 'comments': [], 'records': [
+            {'content': 'ns1.example.com. hostmaster.example.com. 1 10800 3600 604800 3600', 'disabled': False}]}))
+        for i in range(records):
+            f.write(',')
+            f.write(json.dumps({'name': 'host{}.example.com.'.format(i), 'type': 'A', 'ttl': 3600, 'comments': [],
+                                'records': [{'content': '192.0.2.{}'.format(i % 256), 'disabled': False}]}))
+        f.write('], "serial": 1, "url": "/api/v1/servers/localhost/zones/example.com."}')
+
+
+def read_chunks(path):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def run_eager(path):
+    with open(path, 'rb') as f:
+        zone = Zone(**json.loads(f.read()))
+    return len(zone.rrsets), max(rrset.ttl for rrset in zone.rrsets)
+
+
+def run_streaming(path):
+    count = 0
+    httl = 0
+    for rrset in iter_rrsets(read_chunks(path)):
+        count += 1
+        httl = max(rrset.ttl, httl)
+    return count, httl
+
+
+METHODS = {
+    'eager': run_eager,
+    'streaming': run_streaming,
+}
+
+
+def child(method, path):
+    start = time.monotonic()
+    count, httl = METHODS[method](path)
+    elapsed = time.monotonic() - start
+    print(json.dumps({
+        'method': method,
+        'rrsets': count,
+        'seconds': elapsed,
+        'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }))
+
+
+def main():
+    argp = argparse.ArgumentParser(description='Benchmark eager versus streaming zone parsing')
+    argp.add_argument('--records', '-n', type=int, default=1000000, help='Number of records in the zone')
+    argp.add_argument('--child', choices=METHODS.keys(), help=argparse.SUPPRESS)
+    argp.add_argument('--file', help=argparse.SUPPRESS)
+    arguments = argp.parse_args()
+
+    if arguments.child:
+        child(arguments.child, arguments.file)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'zone.json')
+        write_zone(path, arguments.records)
+        print('Zone with {} records, {:.1f} MiB of JSON'.format(arguments.records, os.path.getsize(path) / 2**20))
+        for method in METHODS:
+            out = subprocess.run([sys.executable, __file__, '--child', method, '--file', path],
+                                 check=True, capture_output=True, text=True).stdout
+            res = json.loads(out)
+            print('{:10} {:>9} rrsets {:8.2f}s {:10.1f} MiB peak RSS'.format(
+                res['method'], res['rrsets'], res['seconds'], res['peak_rss_kib'] / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,23 @@
 #!/usr/bin/env python3
 import argparse
+import json
 import logging
 import sys
 from pdnskeyroller import domainstate, domainconfig, keyrollerdomain
 from pdnskeyroller.config import KeyrollerConfig
 from pdnskeyroller.prepublishkeyroll import PrePublishKeyRoll
+from pdnskeyroller.statemirror import StateMirror
 from pdnsapi.api import PDNSApi
+from pdnsapi.concurrency import iter_concurrently
 from datetime import datetime, timedelta
+from pytimeparse.timeparse import timeparse
 import random
 
 logger = logging.getLogger('pdns-keyroller')
 
-def display_keyrollerdomain_infos(zone, api):
-    zoneconf = keyrollerdomain.KeyrollerDomain(zone, api)
+def display_keyrollerdomain_infos(zone, api, zoneconf=None):
+    if zoneconf is None:
+        zoneconf = keyrollerdomain.KeyrollerDomain(zone, api)
     if zoneconf.state :
         if zoneconf.state.is_rolling:
             timeleft = zoneconf.state.current_roll.current_step_datetime - datetime.now()
@@ -30,6 +35,107 @@ def display_keyrollerdomain_infos(zone, api):
     else :
         logger.info('{} is not rolling'.format(zone))
 
+
+def keyrollerdomain_infos(zone, zoneconf):
+    """
+    Returns the status of ``zone`` as a dict, for the JSON output
+    """
+    infos = {
+        'zone': zone,
+        'rolling': zoneconf.state.is_rolling,
+        'last_ksk_roll': zoneconf.state.last_ksk_roll_str,
+        'last_zsk_roll': zoneconf.state.last_zsk_roll_str,
+        'ksk_frequency': zoneconf.config.ksk_frequency,
+        'zsk_frequency': zoneconf.config.zsk_frequency,
+        'next_action': str(zoneconf.next_action_datetime) if zoneconf.next_action_datetime else None,
+    }
+    if zoneconf.state.is_rolling:
+        roll = zoneconf.state.current_roll
+        infos.update({
+            'keytype': roll.keytype,
+            'rolltype': roll.rolltype,
+            'step': roll.current_step_name,
+            'step_made': str(roll.step_datetimes[-1]),
+            'waiting_ds': roll.is_waiting_ds(),
+        })
+    return infos
+
+
+def parse_due_before(value):
+    """
+    Parses the --due-before argument, either a time expression relative to now (e.g. "2h") or an ISO 8601 datetime
+    """
+    seconds = timeparse(value)
+    if seconds is not None:
+        return datetime.now() + timedelta(seconds=seconds)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError('Can not parse "{}" as a time expression or a datetime'.format(value))
+
+
+def fetch_keyrollerdomain(zone, api, rolling_only=False, waiting_only=False, due_before=None):
+    """
+    Retrieves the config and state of ``zone`` with a single API call
+
+    :return: The :class:`KeyrollerDomain <pdnskeyroller.keyrollerdomain.KeyrollerDomain>`, or None when the zone is
+             not configured or does not match the filters
+    """
+    config, state = keyrollerdomain.fetch_metadata(zone, api)
+    zoneconf = keyrollerdomain.from_json(zone, api, config, state)
+    if zoneconf is None:
+        return None
+    if (rolling_only or waiting_only) and not zoneconf.state.is_rolling:
+        return None
+    if waiting_only and not zoneconf.state.current_roll.is_waiting_ds():
+        return None
+    if due_before is not None:
+        next_action = zoneconf.next_action_datetime
+        if next_action is None or next_action > due_before:
+            return None
+    return zoneconf
+
+
+def iter_keyrollerdomains(api, zones, jobs, **filters):
+    """
+    Fetches the keyroller config and state of ``zones`` with ``jobs`` concurrent requests
+
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param zones: An iterable of zone names
+    :param int jobs: The maximum number of concurrent requests
+    :param filters: Passed to :func:`fetch_keyrollerdomain`
+    :return: A generator of (zone, KeyrollerDomain or None, Exception or None) tuples, in the order the requests
+             complete
+    """
+    return iter_concurrently(lambda zone: fetch_keyrollerdomain(zone, api, **filters), zones, jobs)
+
+
+def list_keyrollerdomains(api, arguments, waiting_only=False, show=display_keyrollerdomain_infos):
+    filters = {
+        'rolling_only': getattr(arguments, 'rolling_only', False),
+        'waiting_only': waiting_only,
+        'due_before': getattr(arguments, 'due_before', None),
+    }
+    for zone, zoneconf, error in iter_keyrollerdomains(api, (z.id for z in api.get_zones()), arguments.jobs,
+                                                        **filters):
+        if error is not None:
+            logger.error("Unable to get config for domain {}: {}".format(zone, error))
+            continue
+        if zoneconf is None:
+            logger.debug("No config found or filtered out for domain {}".format(zone))
+            continue
+        if arguments.json:
+            print(json.dumps(keyrollerdomain_infos(zone, zoneconf)), flush=True)
+        else:
+            show(zone, api, zoneconf)
+
+
+def add_filter_arguments(parser):
+    parser.add_argument('--rolling-only', action='store_true', help='Only show zones that are currently rolling')
+    parser.add_argument('--due-before', metavar='WHEN', type=parse_due_before,
+                        help='Only show zones with an action due before WHEN, either a time expression relative to '
+                             'now (e.g. "2h") or an ISO 8601 datetime')
+
 if __name__ == '__main__':
     argp = argparse.ArgumentParser(
         prog='pdns-keyroller-ctl', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
@@ -40,6 +146,9 @@ if __name__ == '__main__':
                       'Overrides the one set in the config-file')
     argp.add_argument('--apikey', '-k', required=False, metavar='API-KEY', help='The key needed to access the API')
     argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
+    argp.add_argument('--json', action='store_true', help='Output zone listings as JSON, one object per line')
+    argp.add_argument('--jobs', '-j', metavar='N', type=int, default=16,
+                      help='Number of concurrent API requests when listing zones')
     argp.set_defaults(command='none')
 
     sub_parsers = argp.add_subparsers()
@@ -65,6 +174,12 @@ if __name__ == '__main__':
 
     configs_list_parser = configs_subparsers.add_parser('list', help='List all configured domains')
     configs_list_parser.set_defaults(action='list')
+    add_filter_arguments(configs_list_parser)
+
+    # status
+    status_parser = sub_parsers.add_parser('status', help='Show the roll status and next action of configured domains')
+    status_parser.set_defaults(command='status', action='status')
+    add_filter_arguments(status_parser)
 
 
 
@@ -76,6 +191,7 @@ if __name__ == '__main__':
 
     roll_waiting_parser = roll_subparsers.add_parser('waiting', help='List waiting zones (KSK rolls waiting for DS change)')
     roll_waiting_parser.set_defaults(action='waiting')
+    add_filter_arguments(roll_waiting_parser)
 
     roll_step_parser = roll_subparsers.add_parser('step', help='Step waiting roll')
     roll_step_parser.set_defaults(action='step')
@@ -109,14 +225,7 @@ if __name__ == '__main__':
 
     if arguments.command == 'configs':
         if arguments.action == 'list':
-            for zone in api.get_zones():
-                try:
-                    display_keyrollerdomain_infos(zone.id, api)
-                except FileNotFoundError:
-                    logger.debug("No config found for domain {}".format(zone.id))
-                    continue
-                except Exception as e:
-                    logger.error("Unable to get config for domain {}: {}".format(zone.id, e))
+            list_keyrollerdomains(api, arguments)
         if arguments.action == 'show':
             try:
                 domaincfg = domainconfig.from_api(arguments.domain, api)
@@ -173,6 +282,8 @@ if __name__ == '__main__':
                     if arguments.zsk_algo:
                         domaincfg.zsk_algo = arguments.zsk_algo
                     domainconfig.to_api(arguments.domain, api, domaincfg)
+                    if config.state_mirror():
+                        StateMirror(config.state_mirror()).invalidate(arguments.domain)
                     logger.info(
                         'Successfully created configuration for {}: KSK {}, ZSK {}'.format(
                             arguments.domain,
@@ -186,20 +297,24 @@ if __name__ == '__main__':
                             arguments.domain, e
                         )
                     )
+    if arguments.command == 'status':
+        def show_status(zone, api, zoneconf):
+            display_keyrollerdomain_infos(zone, api, zoneconf)
+            logger.info('Next action for {} is {}'.format(zone, zoneconf.next_action_datetime or 'never'))
+        list_keyrollerdomains(api, arguments, show=show_status)
+
     if arguments.command == 'roll':
         if arguments.action == 'waiting':
-            for zone in api.get_zones():
-                try:
-                    zoneconf = keyrollerdomain.KeyrollerDomain(zone.id, api)
-                    if zoneconf.state and zoneconf.state.is_rolling and zoneconf.state.current_roll.is_waiting_ds():
-                        logger.info('{} is waiting for DS replacement'.format(zone.id))
-                except FileNotFoundError:
-                    continue
+            list_keyrollerdomains(api, arguments, waiting_only=True,
+                                  show=lambda zone, api, zoneconf: logger.info(
+                                      '{} is waiting for DS replacement'.format(zone)))
         elif arguments.action == 'step':
             try:
                 zoneconf = keyrollerdomain.KeyrollerDomain(arguments.domain, api)
                 if zoneconf.state and zoneconf.state.current_roll.is_waiting_ds():
                     zoneconf.step(force=True, customttl=int(arguments.ttl))
+                    if config.state_mirror():
+                        StateMirror(config.state_mirror()).update(zoneconf)
                     logger.info(
                         'Successfuly steped {}, now waiting {} before deleting the keys'.format(
                             arguments.domain,
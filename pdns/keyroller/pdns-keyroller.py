@@ -1,7 +1,10 @@
 #!/usr/bin/env python3
 import argparse
 import logging
+import pdnskeyroller.coordinator
 import pdnskeyroller.daemon
+from pdnskeyroller.config import KeyrollerConfig
+import signal
 import sys
 import traceback
 
@@ -14,6 +17,13 @@ if __name__ == '__main__':
     argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
     argp.add_argument('--config', '-c', metavar='PATH', type=str, default='/etc/powerdns/pdns-keyroller.conf',
                       help='Load this configuration file')
+    argp.add_argument('--reconcile', action='store_true',
+                      help='Check the state mirror against the API before running')
+    argp.add_argument('--workers', '-w', metavar='N', type=int, default=None,
+                      help='Split the zones over N worker processes. Overrides the one set in the config-file')
+    argp.add_argument('--interval', '-i', metavar='SECONDS', type=int, default=None,
+                      help='Keep running, every SECONDS. Without this (and keyroller.interval in the config-file), '
+                           'run once and exit')
 
     arguments = argp.parse_args()
 
@@ -23,6 +33,29 @@ if __name__ == '__main__':
         else:
             logging.basicConfig(level=logging.DEBUG)
 
+    config = KeyrollerConfig(arguments.config)
+    workers = arguments.workers
+    if workers is None:
+        workers = config.workers()
+    interval = arguments.interval
+    if interval is None:
+        interval = config.interval()
+
+    if workers > 1:
+        if config.metrics_listen():
+            logger.warning('Serving metrics over HTTP is not supported with several workers, use metrics_textfile')
+        if arguments.reconcile:
+            logger.warning('Reconciling the state mirror is not supported with several workers, skipping')
+        if interval <= 0:
+            totals = pdnskeyroller.coordinator.run_sharded(arguments.config, workers)
+            sys.exit(1 if totals['errors'] == workers else 0)
+        # Every worker runs on its own and keeps its zones between runs, see pdnskeyroller.coordinator.Supervisor
+        supervisor = pdnskeyroller.coordinator.Supervisor(arguments.config, workers, interval)
+        signal.signal(signal.SIGHUP, lambda signum, frame: supervisor.request_reload())
+        signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stop())
+        supervisor.serve()
+        sys.exit(0)
+
     d = None
     try:
         d = pdnskeyroller.daemon.Daemon(arguments.config)
@@ -30,6 +63,23 @@ if __name__ == '__main__':
         logger.fatal('Unable to start: {}'.format(e))
         sys.exit(1)
 
+    if arguments.reconcile:
+        try:
+            drifted = d.reconcile()
+            logger.info('{} zone(s) in the state mirror were out of date'.format(len(drifted)))
+        except ConnectionError as e:
+            logger.error('Unable to reconcile the state mirror: {}'.format(e))
+
+    if interval > 0:
+        # Reload the configuration on SIGHUP, stop after the current run on SIGTERM
+        signal.signal(signal.SIGHUP, lambda signum, frame: d.request_reload())
+        signal.signal(signal.SIGTERM, lambda signum, frame: d.stop())
+        try:
+            d.serve(interval)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
     try:
         d.run()
     except Exception as e:
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+from pdnskeyroller.config import KeyrollerConfig
+from pdnsapi.api import PDNSApi
+from pdnsapi import bulk, zonesync
+
+logger = logging.getLogger('pdns-zone-bulk')
+
+
+if __name__ == '__main__':
+    argp = argparse.ArgumentParser(
+        prog='pdns-zone-bulk', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Export all zones of a PowerDNS server to a directory, or import them from one')
+    argp.add_argument('--config', '-c', metavar='PATH', type=str, default='/etc/powerdns/pdns-keyroller.conf',
+                      help='Load the API settings from this configuration file')
+    argp.add_argument('--baseurl', '-b', required=False, metavar='BASEURL',
+                      help='The base-URL for the authoritative webserver. Overrides the one set in the config-file')
+    argp.add_argument('--apikey', '-k', required=False, metavar='API-KEY', help='The key needed to access the API')
+    argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
+    argp.add_argument('--json', action='store_true', help='Output the statistics as JSON')
+    argp.add_argument('--jobs', '-j', metavar='N', type=int, default=8,
+                      help='Number of zones to export or import at the same time')
+    argp.add_argument('--format', '-f', choices=bulk.FORMATS, default='zone',
+                      help='Write zone files or JSON Lines. When importing, only used when the directory has no '
+                           'manifest')
+    argp.add_argument('--restart', action='store_true',
+                      help='Ignore the manifest of an earlier run and process all zones again')
+    argp.add_argument('--zone', '-z', metavar='ZONE', action='append', default=None,
+                      help='Only process this zone, can be given more than once')
+
+    sub_parsers = argp.add_subparsers(dest='command')
+    export_parser = sub_parsers.add_parser('export', help='Write every zone to a file in DIRECTORY')
+    export_parser.add_argument('directory', metavar='DIRECTORY')
+    import_parser = sub_parsers.add_parser('import', help='Create the zones in DIRECTORY')
+    import_parser.add_argument('directory', metavar='DIRECTORY')
+    import_parser.add_argument('--max-rrsets', metavar='N', type=int, default=zonesync.DEFAULT_MAX_RRSETS,
+                               help='Maximum number of RRSets in a single request')
+    import_parser.add_argument('--max-bytes', metavar='N', type=int, default=zonesync.DEFAULT_MAX_BYTES,
+                               help='Approximate maximum size of a single request')
+
+    arguments = argp.parse_args()
+
+    if not arguments.command:
+        argp.print_help()
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO if not arguments.verbose or arguments.verbose == 1 else logging.DEBUG,
+                        format='%(message)s')
+    # Every request is logged at debug level by pdnsapi, which drowns out the progress
+    if not arguments.verbose or arguments.verbose < 3:
+        logging.getLogger('pdnsapi.api').setLevel(logging.INFO)
+
+    api_config = KeyrollerConfig(arguments.config).api()
+    try:
+        if arguments.baseurl:
+            api_config['baseurl'] = arguments.baseurl
+        if arguments.apikey:
+            api_config['apikey'] = arguments.apikey
+        api = PDNSApi(**api_config)
+    except ConnectionError as e:
+        logger.error("Unable to connect to PowerDNS: {}".format(e))
+        sys.exit(1)
+
+    try:
+        if arguments.command == 'export':
+            stats = bulk.export_zones(api, arguments.directory, fmt=arguments.format, zones=arguments.zone,
+                                      jobs=arguments.jobs, restart=arguments.restart)
+        else:
+            stats = bulk.import_zones(api, arguments.directory, fmt=arguments.format, zones=arguments.zone,
+                                      jobs=arguments.jobs, restart=arguments.restart,
+                                      max_rrsets=arguments.max_rrsets, max_bytes=arguments.max_bytes)
+    except Exception as e:
+        logger.error('Unable to {} zones: {}'.format(arguments.command, e))
+        sys.exit(1)
+
+    if arguments.json:
+        print(json.dumps(dict(stats, command=arguments.command)))
+    else:
+        logger.info('{}: {} zones, {} done, {} skipped, {} failed; {} RRSets, {} records in {:.1f}s '
+                    '({:.0f} records/s)'.format(arguments.command, stats['zones'], stats['done'], stats['skipped'],
+                                                stats['failed'], stats['rrsets'], stats['records'], stats['seconds'],
+                                                stats['records_per_second']))
+    sys.exit(1 if stats['failed'] else 0)
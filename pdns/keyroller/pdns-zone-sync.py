@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import logging
+import sys
+from pdnskeyroller.config import KeyrollerConfig
+from pdnsapi.api import PDNSApi
+from pdnsapi.zone import Zone
+from pdnsapi import zonefile, zonesync
+
+logger = logging.getLogger('pdns-zone-sync')
+
+
+def read_desired(path, zone):
+    """
+    Reads the desired contents of ``zone`` from ``path``, either a zone file or (when it ends in `.json`) a zone as
+    returned by the API
+    """
+    f = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        if path.endswith('.json'):
+            return Zone(**json.load(f)).rrsets
+        return zonefile.read_rrsets(f, zone)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+if __name__ == '__main__':
+    argp = argparse.ArgumentParser(
+        prog='pdns-zone-sync', formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description='Make a zone in the PowerDNS API equal to a zone file, sending only the RRSets that differ')
+    argp.add_argument('--config', '-c', metavar='PATH', type=str, default='/etc/powerdns/pdns-keyroller.conf',
+                      help='Load the API settings from this configuration file')
+    argp.add_argument('--baseurl', '-b', required=False, metavar='BASEURL',
+                      help='The base-URL for the authoritative webserver. Overrides the one set in the config-file')
+    argp.add_argument('--apikey', '-k', required=False, metavar='API-KEY', help='The key needed to access the API')
+    argp.add_argument('--verbose', '-v', action='count', help='Be more verbose')
+    argp.add_argument('--json', action='store_true', help='Output the statistics as JSON')
+    argp.add_argument('--dry-run', '-n', action='store_true', help='Only show what would change')
+    argp.add_argument('--max-rrsets', metavar='N', type=int, default=zonesync.DEFAULT_MAX_RRSETS,
+                      help='Maximum number of RRSets in a PATCH request')
+    argp.add_argument('--max-bytes', metavar='N', type=int, default=zonesync.DEFAULT_MAX_BYTES,
+                      help='Approximate maximum size of a PATCH request')
+    argp.add_argument('--ignore-type', metavar='TYPE', action='append', default=None,
+                      help='Never change RRSets of this type, can be given more than once. Defaults to {}'.format(
+                          ', '.join(zonesync.DEFAULT_IGNORED_TYPES)))
+    argp.add_argument('--sync-soa-serial', action='store_true',
+                      help='Also replace the SOA when only its serial differs')
+    argp.add_argument('zone', metavar='ZONE')
+    argp.add_argument('file', metavar='FILE', help='A zone file, a zone in the JSON format of the API (.json) or - '
+                                                   'to read a zone file from stdin')
+
+    arguments = argp.parse_args()
+
+    logging.basicConfig(level=logging.INFO if not arguments.verbose or arguments.verbose == 1 else logging.DEBUG,
+                        format='%(message)s')
+
+    try:
+        desired = read_desired(arguments.file, arguments.zone)
+    except (OSError, ValueError) as e:
+        logger.error('Unable to read {}: {}'.format(arguments.file, e))
+        sys.exit(1)
+
+    api_config = KeyrollerConfig(arguments.config).api()
+    try:
+        if arguments.baseurl:
+            api_config['baseurl'] = arguments.baseurl
+        if arguments.apikey:
+            api_config['apikey'] = arguments.apikey
+        api = PDNSApi(**api_config)
+    except ConnectionError as e:
+        logger.error("Unable to connect to PowerDNS: {}".format(e))
+        sys.exit(1)
+
+    try:
+        stats = zonesync.sync_zone(
+            api, arguments.zone, desired, dry_run=arguments.dry_run, max_rrsets=arguments.max_rrsets,
+            max_bytes=arguments.max_bytes,
+            ignored_types=arguments.ignore_type if arguments.ignore_type is not None else
+            zonesync.DEFAULT_IGNORED_TYPES,
+            ignore_soa_serial=not arguments.sync_soa_serial)
+    except Exception as e:
+        logger.error('Unable to synchronize {}: {}'.format(arguments.zone, e))
+        sys.exit(1)
+
+    if arguments.json:
+        print(json.dumps(dict(stats, zone=arguments.zone, dry_run=arguments.dry_run)))
+    else:
+        logger.info('{}{}: {} added, {} changed, {} deleted, {} unchanged RRSets in {} PATCH request(s), {:.3f}s '
+                    '({:.3f}s comparing)'.format(
+                        arguments.zone, ' (dry run)' if arguments.dry_run else '', stats['added'], stats['changed'],
+                        stats['deleted'], stats['unchanged'], stats['patches'], stats['seconds'],
+                        stats['diff_seconds']))
@@ -1,11 +1,14 @@
+import functools
+import json
 import re
 import logging
+import time
 import urllib.parse
 import requests
 
 import pdnsapi.cryptokey
 from pdnsapi.cryptokey import CryptoKey
-from pdnsapi.zone import Zone
+from pdnsapi.zone import Zone, iter_rrsets
 from pdnsapi.metadata import ZoneMetadata
 
 logger = logging.getLogger(__name__)
@@ -28,23 +31,71 @@ def _sanitize_dnsname(name):
     return name
 
 
-class PDNSApi:
+def _endpoint_of(uri):
     """
-    A wrapper-class that connects to the PowerDNS REST API to perform data manipulations
+    Returns the endpoint ``uri`` belongs to, with the zone name and key id replaced by placeholders, for use in
+    statistics
 
-    TODO: We should probably try to do some caching
+    :param uri: Sub-path of a request, e.g. '/zones/example.com./cryptokeys/3'
+    :return: The endpoint, e.g. '/zones/{zone}/cryptokeys/{id}'
+    :rtype: str
     """
+    endpoint = re.sub(r'^/zones/[^/?]+', '/zones/{zone}', uri.split('?')[0])
+    endpoint = re.sub(r'/cryptokeys/[^/]+$', '/cryptokeys/{id}', endpoint)
+    return endpoint or '/'
 
-    def __init__(self, apikey, version=1, baseurl='http://localhost:8081', server='localhost', timeout=2):
-        """
-        :param apikey: The API Key needed to access the API (`api-key` setting)
-        :param version: The version of the API used, only 1 is supported at the moment
-        :param baseurl: The URL where the lives, without the `/api....`
-        :param server: The name of the server, 'localhost' by default. Use this when connecting to the API through e.g.
-                       pdnscontrol or zone-control
-        :param timeout: The timeout in seconds for a request
-        :raises: ConnectionError when the API is not reachable
-        """
+
+def _keyid(cryptokey):
+    """
+    :param cryptokey: A :class:`pdnsapi.cryptokey.CryptoKey`, or its id as str or int
+    :return: The id of the key
+    :rtype: int
+    """
+    if isinstance(cryptokey, CryptoKey):
+        return cryptokey.id
+    if isinstance(cryptokey, str) or isinstance(cryptokey, int):
+        return int(cryptokey)
+    raise Exception("cryptokey is not a CryptoKey, nor a str or int")
+
+
+def _operation(func):
+    """
+    Turns a generator method of :class:`PDNSApiBase` into an API method. The generator yields the requests to do as
+    ``(uri, method, data)`` tuples, is sent the ``(status, response)`` of each, and returns the result of the method.
+    How the requests are done is up to the ``_run`` method of the client: :class:`PDNSApi` returns the result,
+    :class:`pdnsapi.asyncapi.AsyncPDNSApi` returns a coroutine.
+
+    Operations can use each other with ``yield from self.other_method.__wrapped__(self, ...)``.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return self._run(func(self, *args, **kwargs))
+    return wrapper
+
+
+def _iter_body(res, chunk_size):
+    """
+    Iterates over the body of a streamed response. The response (and with it the connection) is closed when the body
+    was read completely, or when the generator is closed or garbage collected before that.
+
+    :param res: A :class:`requests.Response` that was requested with ``stream=True``
+    :param chunk_size: The maximum size of each chunk in bytes
+    :return: A generator of :class:`bytes`
+    """
+    try:
+        yield from res.iter_content(chunk_size=chunk_size)
+    finally:
+        res.close()
+
+
+class PDNSApiBase:
+    """
+    The methods of the PowerDNS REST API, independent of how the requests are done. Subclasses implement ``_run``, see
+    :func:`_operation`, on top of their own transport.
+    """
+
+    def __init__(self, apikey, version=1, baseurl='http://localhost:8081', server='localhost', timeout=2,
+                 request_observer=None):
         api_suffix = {
             0: '',
             1: '/api/v1',
@@ -56,18 +107,17 @@ class PDNSApi:
             raise Exception('apikey may not be None!')
         self.apikey = apikey
         self.timeout = timeout
+        self.request_observer = request_observer
 
         # needed for __repr__
         self._version = version
         self._baseurl = baseurl
         self._server = server
 
-        # Test the API, raises in _do_request
-        self._do_request('', 'GET')
-
     def __repr__(self):
-        return '{}.PDNSApi(apikey="{}", version={}, baseurl="{}", server="{}", timeout={})'.format(
-            __name__,
+        return '{}.{}(apikey="{}", version={}, baseurl="{}", server="{}", timeout={})'.format(
+            type(self).__module__,
+            type(self).__name__,
             self.apikey,
             self._version,
             self._baseurl,
@@ -75,54 +125,62 @@ class PDNSApi:
             self.timeout
         )
 
-    def _do_request(self, uri, method, data=None):
-        """
-        Does the actual API call.
+    def _run(self, operation):
+        raise NotImplementedError()
 
-        :param uri: Sub-path for the request, e.g. '/zones'
+    def _observe(self, method, uri, status, start):
+        if self.request_observer is None:
+            return
+        try:
+            self.request_observer(method.upper(), _endpoint_of(uri), status, time.monotonic() - start)
+        except Exception as e:
+            logger.warning('Request observer failed: {}'.format(e))
+
+    def _request_headers(self, method, data):
+        """
         :param method: HTTP method to use
-        :param data: dict or list of data to send along with the request
-        :return: a tuple containing the HTTP status code and the JSON response in Python format (i.e. list/dict)
-        :rtype: tuple(int, str)
+        :param data: dict or list of data to send along with the request, or None
+        :return: The headers for a request
+        :rtype: dict
+        :raises: ValueError when ``data`` can not be sent
         """
         headers = {
             'Accept': 'application/json',
             'X-API-Key': self.apikey,
         }
-
-        full_url = self.url + uri
-
         if data is not None:
             if not (isinstance(data, dict) or isinstance(data, list)):
                 raise ValueError('data was passed as a {}, needs to be dict or list!'.format(type(data)))
             if method.upper() != 'GET':
                 headers.update({'Content-Type': 'application/json'})
+        return headers
 
-        logger.debug('Attempting {} request to {} with data: {}'.format(method, full_url, data))
-
+    @staticmethod
+    def _parse_response(full_url, status, body):
+        """
+        :param full_url: The URL the request was sent to
+        :param status: The HTTP status code of the response
+        :param bytes body: The body of the response
+        :return: a tuple containing the HTTP status code and the JSON response in Python format (i.e. list/dict)
+        :raises: ConnectionError for HTTP errors
+        """
         ret = None
-        try:
-            res = requests.request(method, full_url, headers=headers, json=data)
+        if body:
             try:
-                ret = res.json()
+                ret = json.loads(body)
             except ValueError:
                 # We don't care that the response was empty
                 pass
-            res.raise_for_status()
-            logger.debug("Success! Got a {} response with data: {}".format(res.status_code, ret))
-            return res.status_code, ret
-        except requests.ConnectionError as e:
-            logger.debug("Got a Connection error: {}".format(str(e)))
-            raise ConnectionError("Unable to connect to {}: {}".format(full_url, e))
-        except requests.HTTPError as e:
-            logger.debug("Got an HTTP {} Error: {}".format(e.response.status_code, ret))
+
+        if status >= 400:
+            logger.debug("Got an HTTP {} Error: {}".format(status, ret))
             raise ConnectionError("HTTP error code {} received for {}: {}".format(
-                e.response.status_code, e.request.url, ret.get('error', ret)))
-        except Exception as e:
-            msg = "Error doing {} request to {}: {}".format(method, full_url, e)
-            logger.debug(msg)
-            raise ConnectionError(msg)
+                status, full_url, ret.get('error', ret) if isinstance(ret, dict) else ret))
+
+        logger.debug("Success! Got a {} response with data: {}".format(status, ret))
+        return status, ret
 
+    @_operation
     def get_cryptokeys(self, zone):
         """
         Get all CryptoKeys for `zone`
@@ -131,8 +189,8 @@ class PDNSApi:
         :return: All the cryptokeys for the zone
         :rtype: list(CryptoKey)
         """
-        code, resp = self._do_request('/zones/{}/cryptokeys'.format(_sanitize_dnsname(zone)),
-                                      'GET')
+        code, resp = yield ('/zones/{}/cryptokeys'.format(_sanitize_dnsname(zone)),
+                            'GET', None)
 
         if code == 200:
             cryptokeys = []
@@ -143,6 +201,7 @@ class PDNSApi:
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def get_cryptokey(self, zone, cryptokey):
         """
         Gets a single CryptoKey
@@ -152,16 +211,9 @@ class PDNSApi:
                            is read
         :return: a :class:`pdnsapi.cryptokey.CryptoKey`
         """
-        keyid = -1
-        if isinstance(cryptokey, CryptoKey):
-            keyid = cryptokey.id
-        if isinstance(cryptokey, str) or isinstance(cryptokey, int):
-            keyid = cryptokey
-        if keyid == -1:
-            raise Exception("cryptokey is not a CryptoKey, nor a str or int")
-
-        code, resp = self._do_request('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
-                                      'GET')
+        keyid = _keyid(cryptokey)
+        code, resp = yield ('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
+                            'GET', None)
 
         if code == 200:
             resp.pop('type')
@@ -169,7 +221,8 @@ class PDNSApi:
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
-    def set_cryptokey_active(self, zone, cryptokey, active=True):
+    @_operation
+    def set_cryptokey_active(self, zone, cryptokey, active=True, refetch=True):
         """
         Sets the `active` field of a CryptoKey
 
@@ -177,28 +230,25 @@ class PDNSApi:
         :param cryptokey: The :class:`pdnsapi.cryptokey.CryptoKey` or a string of the `id` field
                           Note: the `active`-field of this object is ignored!
         :param active: A boolean for the `active` field
+        :param refetch: When False, do not retrieve the updated key from the API and return None
         :return: the new :class:`pdnsapi.cryptokey.Cryptokey`
         :raises: Exception on failure
         """
-        keyid = -1
-        if isinstance(cryptokey, CryptoKey):
-            keyid = cryptokey.id
-        if isinstance(cryptokey, str) or isinstance(cryptokey, int):
-            keyid = int(cryptokey)
-        if keyid == -1:
-            raise Exception("cryptokey is not a CryptoKey, nor a str or int")
-
-        code, resp = self._do_request('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
-                                      'PUT',
-                                      {'active': active})
+        keyid = _keyid(cryptokey)
+        code, resp = yield ('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
+                            'PUT',
+                            {'active': active})
         if code == 422:
             raise Exception('Failed to set cryptokey {} in zone {} to {}: {}'.format(
                 keyid, zone, 'active' if active else 'inactive', resp))
         if code == 204:
-            return self.get_cryptokey(zone, cryptokey)
+            if not refetch:
+                return
+            return (yield from self.get_cryptokey.__wrapped__(self, zone, keyid))
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def set_cryptokey_published(self, zone, cryptokey, published=True):
         """
         Sets the `published` field of a CryptoKey
@@ -209,23 +259,16 @@ class PDNSApi:
         :return: the new :class:`pdnsapi.cryptokey.Cryptokey`
         :raises: Exception on failure
         """
-        keyid = -1
-        if isinstance(cryptokey, CryptoKey):
-            keyid = cryptokey.id
-        if isinstance(cryptokey, str) or isinstance(cryptokey, int):
-            keyid = int(cryptokey)
-        if keyid == -1:
-            raise Exception("cryptokey is not a CryptoKey, nor a str or int")
-
-        code, resp = self._do_request('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
-                                      'PUT',
-                                      {'published': published,
-                                       'active': True})
+        keyid = _keyid(cryptokey)
+        code, resp = yield ('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
+                            'PUT',
+                            {'published': published,
+                             'active': True})
         if code == 422:
             raise Exception('Failed to set cryptokey {} in zone {} to {}: {}'.format(
                 keyid, zone, 'published' if published else 'unpublished', resp))
         if code == 204:
-            return self.get_cryptokey(zone, cryptokey)
+            return (yield from self.get_cryptokey.__wrapped__(self, zone, keyid))
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
@@ -237,6 +280,7 @@ class PDNSApi:
 
         return  self.set_cryptokey_published(zone, cryptokey, published=False)
 
+    @_operation
     def delete_cryptokey(self, zone, cryptokey):
         """
         Removes a cryptokey
@@ -247,15 +291,9 @@ class PDNSApi:
         :return: On success
         :raises: Exception on failure
         """
-        keyid = -1
-        if isinstance(cryptokey, CryptoKey):
-            keyid = cryptokey.id
-        if isinstance(cryptokey, str) or isinstance(cryptokey, int):
-            keyid = cryptokey
-        if keyid == -1:
-            raise Exception("cryptokey is not a CryptoKey, nor a str or int")
-        code, resp = self._do_request('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
-                                      'DELETE')
+        keyid = _keyid(cryptokey)
+        code, resp = yield ('/zones/{}/cryptokeys/{}'.format(_sanitize_dnsname(zone), keyid),
+                            'DELETE', None)
         if code == 422:
             raise Exception('Failed to remove cryptokey {} in zone {}: {}'.format(
                 keyid, zone, resp))
@@ -264,6 +302,7 @@ class PDNSApi:
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def add_cryptokey(self, zone, keytype='zsk', active=False, content=None, algo=None, bits=None, published=True):
         """
         Adds a CryptoKey to zone. If content is None, a new key is generated by the server, using algorithm from `algo`
@@ -294,9 +333,9 @@ class PDNSApi:
         if bits is not None:
             data.update({'bits': bits})
 
-        code, resp = self._do_request('/zones/{}/cryptokeys'.format(_sanitize_dnsname(zone)),
-                                      'POST',
-                                      data)
+        code, resp = yield ('/zones/{}/cryptokeys'.format(_sanitize_dnsname(zone)),
+                            'POST',
+                            data)
 
         if code == 422:
             raise Exception('Unable to create CryptoKey in zone {}: {}'.format(zone, resp))
@@ -306,6 +345,7 @@ class PDNSApi:
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def get_zones(self):
         """
         Get all zones
@@ -313,13 +353,14 @@ class PDNSApi:
         :return: All zones ons the server
         :rtype: list(:class:`pdnsapi.zone.Zone`)
         """
-        code, resp = self._do_request('/zones',
-                                      'GET')
+        code, resp = yield ('/zones',
+                            'GET', None)
         if code == 200:
             return [Zone(**zone) for zone in resp]
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def get_zone(self, zone):
         """
         Gets the full zone contents
@@ -327,14 +368,45 @@ class PDNSApi:
         :param str zone: The zone we want the full contents for
         :return: a :class:`pdnsapi.zone.Zone`
         """
-        code, resp = self._do_request('/zones/{}'.format(_sanitize_dnsname(zone)),
-                                      'GET')
+        code, resp = yield ('/zones/{}'.format(_sanitize_dnsname(zone)),
+                            'GET', None)
 
         if code == 200:
             return Zone(**resp)
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
+    def create_zone(self, zone, kind='Native', masters=None, nameservers=None, rrsets=None):
+        """
+        Creates a zone
+
+        :param str zone: The name of the new zone
+        :param str kind: 'Native', 'Master' or 'Slave'
+        :param list masters: The primaries of a 'Slave' zone
+        :param list nameservers: The names of the nameservers, used to create the NS RRSet when ``rrsets`` has none
+        :param list rrsets: The initial RRSets as dicts, see https://doc.powerdns.com/authoritative/http-api/zone.html
+        :return: a :class:`pdnsapi.zone.Zone`
+        :raises: Exception on failure
+        """
+        data = {
+            'name': zone,
+            'kind': kind,
+            'masters': masters or [],
+            'nameservers': nameservers or [],
+        }
+        if rrsets:
+            data['rrsets'] = rrsets
+        code, resp = yield ('/zones',
+                            'POST',
+                            data)
+
+        if code == 201:
+            return Zone(**resp)
+
+        raise Exception('Unexpected response: {}: {}'.format(code, resp))
+
+    @_operation
     def bump_soa(self, zone, serial=None):
         """
         Bump zone SOA serial number
@@ -345,7 +417,7 @@ class PDNSApi:
         """
 
         soa = None
-        content = self.get_zone(zone)
+        content = yield from self.get_zone.__wrapped__(self, zone)
         for rrset in content.rrsets:
             if rrset.rtype == "SOA" :
                 soa = rrset
@@ -354,34 +426,67 @@ class PDNSApi:
         if soa is None:
             raise Exception('No such SOA record')
 
-        
+        yield from self.bump_soa_rrset.__wrapped__(self, zone, soa, serial)
+        return (yield from self.get_zone.__wrapped__(self, zone))
+
+    @_operation
+    def bump_soa_rrset(self, zone, soa, serial=None):
+        """
+        Bump zone SOA serial number, based on an already retrieved SOA RRSet. Unlike :meth:`bump_soa`, this does not
+        fetch the zone before or after the change.
+
+        :param str zone: The zone we want to bump
+        :param soa: The current SOA :class:`pdnsapi.zone.RRSet` of the zone
+        :param str serial: The new serial otherwise will update to existing serial+1
+        :raises: Exception on failure
+        """
         newcontent = soa.records[0].content.split(" ")
         if serial != None:
             newcontent[2] = serial
         else:
             newcontent[2] = str(int(newcontent[2]) + 1)
-        code, resp = self._do_request('/zones/{}'.format(_sanitize_dnsname(zone)),
-                                      'PATCH',
-                                      {
-                                          "rrsets": [{
-                                              "name": soa.name,
-                                              "type": soa.rtype,
-                                              "ttl": soa.ttl,
-                                              "changetype": "REPLACE",
-                                              "records": [
-                                                  {
-                                                      "content": " ".join(newcontent),
-                                                      "disabled": soa.records[0].disabled
-                                                  }
-                                              ]
-                                          }]
-                                      })
+        code, resp = yield ('/zones/{}'.format(_sanitize_dnsname(zone)),
+                            'PATCH',
+                            {
+                                "rrsets": [{
+                                    "name": soa.name,
+                                    "type": soa.rtype,
+                                    "ttl": soa.ttl,
+                                    "changetype": "REPLACE",
+                                    "records": [
+                                        {
+                                            "content": " ".join(newcontent),
+                                            "disabled": soa.records[0].disabled
+                                        }
+                                    ]
+                                }]
+                            })
 
         if code == 204:
-            return self.get_zone(zone)
+            return
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
+    def patch_rrsets(self, zone, rrsets):
+        """
+        Changes RRSets of a zone with a single PATCH request. All changes are applied, or none are.
+
+        :param str zone: The zone to change
+        :param list rrsets: The RRSets to change as dicts, each with a `changetype` of 'REPLACE' or 'DELETE', see
+                            https://doc.powerdns.com/authoritative/http-api/zone.html#rrset
+        :raises: Exception on failure
+        """
+        code, resp = yield ('/zones/{}'.format(_sanitize_dnsname(zone)),
+                            'PATCH',
+                            {'rrsets': rrsets})
+
+        if code == 204:
+            return
+
+        raise Exception('Unexpected response: {}: {}'.format(code, resp))
+
+    @_operation
     def set_zone_param(self, zone, param, value):
         """
 
@@ -391,14 +496,15 @@ class PDNSApi:
         :return:
         """
         zonename = _sanitize_dnsname(zone)
-        code, resp = self._do_request('/zones/{}'.format(zonename),
-                                      'PUT', {param: value})
+        code, resp = yield ('/zones/{}'.format(zonename),
+                            'PUT', {param: value})
 
         if code == 204:
-            return self.get_zone(zonename)
+            return (yield from self.get_zone.__wrapped__(self, zonename))
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def get_zone_metadata(self, zone, kind=''):
         """
         Gets zone metadata
@@ -407,8 +513,8 @@ class PDNSApi:
         :param kind: The zone metadata kind to retrieve. If this is an empty string, all zone metadata is retrieved
         :return: A list of :class:`pdnsapi.metadata.ZoneMetadata` objects
         """
-        code, resp = self._do_request('/zones/{}/metadata{}'.format(_sanitize_dnsname(zone), '/' + kind if len(kind) else ''),
-                                      'GET')
+        code, resp = yield ('/zones/{}/metadata{}'.format(_sanitize_dnsname(zone), '/' + kind if len(kind) else ''),
+                            'GET', None)
 
         if code == 200:
             if kind == '':
@@ -418,13 +524,14 @@ class PDNSApi:
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def set_zone_metadata(self, zone, kind, metadata):
         if not isinstance(metadata, list):
             metadata = [metadata]
         obj = {'metadata': metadata}
-        code, resp = self._do_request('/zones/{}/metadata/{}'.format(_sanitize_dnsname(zone), kind),
-                                      'PUT',
-                                      obj)
+        code, resp = yield ('/zones/{}/metadata/{}'.format(_sanitize_dnsname(zone), kind),
+                            'PUT',
+                            obj)
 
         if code == 422:
             raise Exception('Failed to set metadata {} in zone {} to {}: {}'.format(kind, zone, metadata, resp))
@@ -433,13 +540,156 @@ class PDNSApi:
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
 
+    @_operation
     def delete_zone_metadata(self, zone, kind):
-        code, resp = self._do_request('/zones/{}/metadata/{}'.format(_sanitize_dnsname(zone), kind),
-                                      'DELETE')
+        code, resp = yield ('/zones/{}/metadata/{}'.format(_sanitize_dnsname(zone), kind),
+                            'DELETE', None)
 
         if code == 422:
             raise Exception('Failed to remove metadata {} in zone {}: {}'.format(kind, zone, resp))
-        if code == 200:
+        if code in (200, 204):
             return
 
         raise Exception('Unexpected response: {}: {}'.format(code, resp))
+
+
+class PDNSApi(PDNSApiBase):
+    """
+    A wrapper-class that connects to the PowerDNS REST API to perform data manipulations
+
+    TODO: We should probably try to do some caching
+    """
+
+    def __init__(self, apikey, version=1, baseurl='http://localhost:8081', server='localhost', timeout=2,
+                 request_observer=None):
+        """
+        :param apikey: The API Key needed to access the API (`api-key` setting)
+        :param version: The version of the API used, only 1 is supported at the moment
+        :param baseurl: The URL where the lives, without the `/api....`
+        :param server: The name of the server, 'localhost' by default. Use this when connecting to the API through e.g.
+                       pdnscontrol or zone-control
+        :param timeout: The timeout in seconds for a request
+        :param request_observer: An optional callable that is called after every request with the HTTP method, the
+                                 endpoint (see :func:`_endpoint_of`), the status code (or None when no response was
+                                 received) and the duration of the request in seconds
+        :raises: ConnectionError when the API is not reachable
+        """
+        super().__init__(apikey, version, baseurl, server, timeout, request_observer)
+
+        # Test the API, raises in _do_request
+        self._do_request('', 'GET')
+
+    def _run(self, operation):
+        """
+        Does the requests of ``operation`` one after the other, see :func:`_operation`
+
+        :return: The result of the operation
+        """
+        try:
+            request = next(operation)
+            while True:
+                request = operation.send(self._do_request(*request))
+        except StopIteration as e:
+            return e.value
+
+    def _do_request(self, uri, method, data=None):
+        """
+        Does the actual API call.
+
+        :param uri: Sub-path for the request, e.g. '/zones'
+        :param method: HTTP method to use
+        :param data: dict or list of data to send along with the request
+        :return: a tuple containing the HTTP status code and the JSON response in Python format (i.e. list/dict)
+        :rtype: tuple(int, str)
+        """
+        headers = self._request_headers(method, data)
+
+        full_url = self.url + uri
+
+        logger.debug('Attempting {} request to {} with data: {}'.format(method, full_url, data))
+
+        status = None
+        start = time.monotonic()
+        try:
+            res = requests.request(method, full_url, headers=headers, json=data)
+            status = res.status_code
+        except requests.ConnectionError as e:
+            logger.debug("Got a Connection error: {}".format(str(e)))
+            raise ConnectionError("Unable to connect to {}: {}".format(full_url, e))
+        except Exception as e:
+            msg = "Error doing {} request to {}: {}".format(method, full_url, e)
+            logger.debug(msg)
+            raise ConnectionError(msg)
+        finally:
+            self._observe(method, uri, status, start)
+
+        return self._parse_response(full_url, status, res.content)
+
+    def _do_stream_request(self, uri, method='GET', chunk_size=65536):
+        """
+        Like :meth:`_do_request`, but the response body is not decoded. Instead, it is returned as an iterator
+        over chunks of raw bytes, so large responses can be parsed while they are being received. The duration passed
+        to the request observer is the time until the response headers were received.
+
+        :param uri: Sub-path for the request, e.g. '/zones'
+        :param method: HTTP method to use
+        :param chunk_size: The maximum size of each chunk in bytes
+        :return: a tuple containing the HTTP status code and a generator over the response body. Close the generator
+                 when not reading the body to the end, to release the connection
+        :rtype: tuple(int, generator(bytes))
+        """
+        headers = {
+            'Accept': 'application/json',
+            'X-API-Key': self.apikey,
+        }
+
+        full_url = self.url + uri
+
+        logger.debug('Attempting streaming {} request to {}'.format(method, full_url))
+
+        start = time.monotonic()
+        try:
+            res = requests.request(method, full_url, headers=headers, stream=True, timeout=self.timeout)
+        except requests.ConnectionError as e:
+            logger.debug("Got a Connection error: {}".format(str(e)))
+            self._observe(method, uri, None, start)
+            raise ConnectionError("Unable to connect to {}: {}".format(full_url, e))
+        except Exception as e:
+            msg = "Error doing {} request to {}: {}".format(method, full_url, e)
+            logger.debug(msg)
+            self._observe(method, uri, None, start)
+            raise ConnectionError(msg)
+        self._observe(method, uri, res.status_code, start)
+
+        if res.status_code >= 400:
+            ret = None
+            try:
+                ret = res.json()
+            except ValueError:
+                pass
+            finally:
+                res.close()
+            logger.debug("Got an HTTP {} Error: {}".format(res.status_code, ret))
+            raise ConnectionError("HTTP error code {} received for {}: {}".format(
+                res.status_code, full_url, ret.get('error', ret) if isinstance(ret, dict) else ret))
+
+        logger.debug("Success! Got a {} response, streaming the body".format(res.status_code))
+        return res.status_code, _iter_body(res, chunk_size)
+
+    def iter_zone(self, zone, zoneobject=None):
+        """
+        Streams the contents of a zone. Unlike :meth:`get_zone`, the RRSets are parsed while the response is being
+        received and are never all held in memory at the same time.
+
+        :param str zone: The zone we want the full contents for
+        :param zoneobject: An optional :class:`pdnsapi.zone.Zone` that receives the other attributes of the zone
+        :return: a generator of :class:`pdnsapi.zone.RRSet`
+        """
+        code, chunks = self._do_stream_request('/zones/{}'.format(_sanitize_dnsname(zone)),
+                                               'GET')
+
+        if code == 200:
+            return iter_rrsets(chunks, zoneobject)
+
+        chunks.close()
+        raise Exception('Unexpected response: {}'.format(code))
@@ -0,0 +1,283 @@
+import asyncio
+import collections
+import json
+import logging
+import ssl
+import time
+import urllib.parse
+
+from pdnsapi.api import PDNSApiBase
+
+logger = logging.getLogger(__name__)
+
+
+# Requests that can be sent again when the connection fails before the response arrived
+_IDEMPOTENT_METHODS = ('GET', 'HEAD')
+
+
+class _Response:
+    __slots__ = ('status', 'headers', 'body', 'version', 'framed')
+
+    def __init__(self, status, headers, body, version='HTTP/1.1', framed=True):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.version = version
+        # False when the end of the body was only known because the server closed the connection
+        self.framed = framed
+
+    @property
+    def keep_alive(self):
+        if not self.framed:
+            return False
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+
+class _ConnectionPool:
+    """
+    Keeps idle HTTP/1.1 connections to a single host, and limits the number of requests in flight
+    """
+
+    def __init__(self, host, port, use_ssl, max_connections):
+        self._host = host
+        self._port = port
+        self._ssl = ssl.create_default_context() if use_ssl else None
+        self._idle = collections.deque()
+        self._semaphore = asyncio.Semaphore(max_connections)
+
+    async def _connect(self):
+        return await asyncio.open_connection(self._host, self._port, ssl=self._ssl)
+
+    @staticmethod
+    async def _readline(reader):
+        """
+        :return: The next line, including the newline
+        :raises: asyncio.IncompleteReadError when the connection is closed before the end of the line
+        """
+        line = await reader.readline()
+        if not line.endswith(b'\n'):
+            raise asyncio.IncompleteReadError(line, None)
+        return line
+
+    @classmethod
+    async def _read_body(cls, reader, headers):
+        """
+        :return: The body, and whether its length was known before the connection was closed
+        :rtype: tuple(bytes, bool)
+        """
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await cls._readline(reader)).split(b';')[0].strip(), 16)
+                if size == 0:
+                    # Trailers, up to the empty line
+                    while (await cls._readline(reader)) not in (b'\r\n', b'\n'):
+                        pass
+                    return b''.join(chunks), True
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        if 'content-length' in headers:
+            return await reader.readexactly(int(headers['content-length'])), True
+        return await reader.read(), False
+
+    @staticmethod
+    async def _send(conn, request):
+        _, writer = conn
+        writer.write(request)
+        await writer.drain()
+
+    async def _receive(self, conn, method):
+        reader, _ = conn
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('Connection closed by the server')
+        if not status_line.endswith(b'\n'):
+            raise asyncio.IncompleteReadError(status_line, None)
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        status = int(status)
+        headers = {}
+        while True:
+            line = await self._readline(reader)
+            if line in (b'\r\n', b'\n'):
+                break
+            k, _, v = line.decode('latin-1').partition(':')
+            headers[k.strip().lower()] = v.strip()
+        body, framed = b'', True
+        if method != 'HEAD' and status not in (204, 304) and not 100 <= status < 200:
+            body, framed = await self._read_body(reader, headers)
+        return _Response(status, headers, body, version, framed)
+
+    def _take_idle(self):
+        """
+        :return: An idle connection that the server has not closed (as far as we know), or None
+        """
+        while self._idle:
+            conn = self._idle.popleft()
+            if not conn[0].at_eof():
+                return conn
+            conn[1].close()
+        return None
+
+    async def _attempt(self, request, method):
+        while True:
+            conn = self._take_idle()
+            reused = conn is not None
+            if not reused:
+                conn = await self._connect()
+            sent = False
+            try:
+                await self._send(conn, request)
+                sent = True
+                response = await self._receive(conn, method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn[1].close()
+                # The server might have closed this idle connection. Unless the request could not have been sent, only
+                # requests without side effects are sent again: the server may have acted on the first one.
+                if reused and (not sent or method in _IDEMPOTENT_METHODS):
+                    continue
+                raise
+            except BaseException:
+                conn[1].close()
+                raise
+
+            if response.keep_alive:
+                self._idle.append(conn)
+            else:
+                conn[1].close()
+            return response
+
+    async def request(self, method, path, headers, body=None, timeout=None):
+        """
+        Sends a request and reads the response, reusing an idle connection when possible
+
+        :param float timeout: Maximum number of seconds for the request, not counting the time spent waiting for a
+                              free slot
+        """
+        lines = ['{} {} HTTP/1.1'.format(method, path), 'Host: {}:{}'.format(self._host, self._port)]
+        lines += ['{}: {}'.format(k, v) for k, v in headers.items()]
+        lines.append('Content-Length: {}'.format(len(body) if body else 0))
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+        async with self._semaphore:
+            return await asyncio.wait_for(self._attempt(request, method), timeout)
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.popleft()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+
+class AsyncPDNSApi(PDNSApiBase):
+    """
+    An asyncio variant of :class:`pdnsapi.api.PDNSApi`, with the same methods as coroutines. All requests go over a
+    pool of persistent HTTP/1.1 connections, and at most ``max_concurrency`` requests are in flight at any time, so
+    thousands of zones can be handled with a single :func:`asyncio.gather`::
+
+        async with AsyncPDNSApi('secret', baseurl='http://127.0.0.1:8081') as api:
+            zones = await api.get_zones()
+            keys = await asyncio.gather(*[api.get_cryptokeys(zone.id) for zone in zones])
+    """
+
+    def __init__(self, apikey, version=1, baseurl='http://localhost:8081', server='localhost', timeout=2,
+                 request_observer=None, max_concurrency=16):
+        """
+        :param apikey: The API Key needed to access the API (`api-key` setting)
+        :param version: The version of the API used, only 1 is supported at the moment
+        :param baseurl: The URL where the lives, without the `/api....`
+        :param server: The name of the server, 'localhost' by default
+        :param timeout: The timeout in seconds for a request
+        :param request_observer: An optional callable, see :class:`pdnsapi.api.PDNSApi`
+        :param max_concurrency: The maximum number of requests (and connections) in flight
+        """
+        super().__init__(apikey, version, baseurl, server, float(timeout), request_observer)
+        self.max_concurrency = max_concurrency
+
+        parsed = urllib.parse.urlparse(self.url)
+        self._path = parsed.path
+        self._host = parsed.hostname
+        self._port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        self._use_ssl = parsed.scheme == 'https'
+        self._pool = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        """
+        Tests the API
+
+        :raises: ConnectionError when the API is not reachable
+        """
+        await self._do_request('', 'GET')
+
+    async def close(self):
+        """
+        Closes all idle connections
+        """
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _run(self, operation):
+        """
+        Does the requests of ``operation`` one after the other, see :func:`pdnsapi.api._operation`
+
+        :return: The result of the operation
+        """
+        try:
+            request = next(operation)
+            while True:
+                request = operation.send(await self._do_request(*request))
+        except StopIteration as e:
+            return e.value
+
+    async def _do_request(self, uri, method, data=None):
+        """
+        Does the actual API call.
+
+        :param uri: Sub-path for the request, e.g. '/zones'
+        :param method: HTTP method to use
+        :param data: dict or list of data to send along with the request
+        :return: a tuple containing the HTTP status code and the JSON response in Python format (i.e. list/dict)
+        :rtype: tuple(int, str)
+        """
+        if self._pool is None:
+            # Created here, so it is bound to the running event loop
+            self._pool = _ConnectionPool(self._host, self._port, self._use_ssl, self.max_concurrency)
+
+        method = method.upper()
+        headers = self._request_headers(method, data)
+        body = json.dumps(data).encode() if data is not None else None
+
+        full_url = self.url + uri
+
+        logger.debug('Attempting {} request to {} with data: {}'.format(method, full_url, data))
+
+        status = None
+        start = time.monotonic()
+        try:
+            res = await self._pool.request(method, urllib.parse.quote(self._path + uri, safe='/=?&'), headers, body,
+                                           self.timeout)
+            status = res.status
+        except asyncio.TimeoutError:
+            msg = "Timeout doing {} request to {}".format(method, full_url)
+            logger.debug(msg)
+            raise ConnectionError(msg)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            logger.debug("Got a Connection error: {}".format(str(e)))
+            raise ConnectionError("Unable to connect to {}: {}".format(full_url, e))
+        finally:
+            self._observe(method, uri, status, start)
+
+        return self._parse_response(full_url, status, res.body)
@@ -0,0 +1,373 @@
+"""
+Exports all zones of a server to a directory and imports them again, with a bounded number of concurrent requests.
+
+Every zone is written to its own file, either in the zone file format (`.zone`) or as JSON Lines (`.jsonl`, one RRSet
+in the JSON format of the API per line). RRSets are written to disk while the zone is streamed from the API, so the
+memory use does not depend on the size of the zones. Disabled records and comments are only kept in the JSON Lines
+format.
+
+Progress is appended to a manifest (JSON Lines, one entry per finished zone) in the directory. When an export or
+import is interrupted, running it again skips the zones that are already in the manifest.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from pdnsapi import zonefile, zonesync
+from pdnsapi.concurrency import iter_concurrently
+from pdnsapi.zone import RRSet
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('zone', 'jsonl')
+
+EXPORT_MANIFEST = 'manifest.jsonl'
+IMPORT_MANIFEST = 'import-manifest.jsonl'
+
+# Record types that are generated by the server, they are neither exported nor imported
+SKIPPED_TYPES = zonesync.DEFAULT_IGNORED_TYPES
+
+
+def zone_filename(zone, fmt):
+    """
+    :param str zone: The name of the zone
+    :param str fmt: 'zone' or 'jsonl'
+    :return: The name of the file for ``zone``, without a directory
+    :rtype: str
+    """
+    name = zone.rstrip('.') or 'root'
+    return '{}.{}'.format(name.replace('/', '%2F'), fmt)
+
+
+def zone_from_filename(filename, fmt):
+    """
+    The inverse of :func:`zone_filename`
+
+    :param str filename: The name of the file, without a directory
+    :param str fmt: 'zone' or 'jsonl'
+    :return: The name of the zone, with a trailing dot
+    :rtype: str
+    """
+    name = filename[:-len(fmt) - 1].replace('%2F', '/')
+    if name == 'root':
+        return '.'
+    return '{}.'.format(name)
+
+
+def _rrset_dict(rrset):
+    return {
+        'name': rrset.name,
+        'type': rrset.rtype,
+        'ttl': rrset.ttl,
+        'records': [{'content': r.content, 'disabled': r.disabled} for r in rrset.records],
+        'comments': [{'content': c.content, 'modified_at': c.modified_at, 'account': c.account}
+                     for c in rrset.comments],
+    }
+
+
+def iter_jsonl_rrsets(lines):
+    """
+    :param lines: An iterable of lines, each an RRSet in the JSON format of the API
+    :return: A generator of :class:`pdnsapi.zone.RRSet`
+    """
+    for line in lines:
+        if line.strip():
+            yield RRSet(**json.loads(line))
+
+
+def read_zone_file(path, zone, fmt):
+    """
+    :param str path: The file to read
+    :param str zone: The name of the zone
+    :param str fmt: 'zone' or 'jsonl'
+    :return: The RRSets in ``path``
+    :rtype: list(:class:`pdnsapi.zone.RRSet`)
+    """
+    with open(path, 'r') as f:
+        if fmt == 'jsonl':
+            return list(iter_jsonl_rrsets(f))
+        return zonefile.read_rrsets(f, zone)
+
+
+class Manifest:
+    """
+    An append-only log of the zones that were processed, safe to use from several threads
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: The file the manifest is kept in, it is created when it does not exist
+        """
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line that was cut off when the previous run was interrupted
+                        logger.warning('Ignoring a damaged line in {}'.format(path))
+                        continue
+                    self.entries[entry['zone']] = entry
+        self._f = open(path, 'a')
+
+    def __contains__(self, zone):
+        return zone in self.entries
+
+    def get(self, zone):
+        return self.entries.get(zone)
+
+    def add(self, entry):
+        """
+        Records ``entry`` (a dict with at least a `zone`) and flushes it to disk
+        """
+        with self._lock:
+            self.entries[entry['zone']] = entry
+            self._f.write(json.dumps(entry) + '\n')
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class _Progress:
+    """
+    Keeps the totals of a bulk operation and logs them every ``interval`` seconds
+    """
+
+    def __init__(self, operation, total, interval=10):
+        self.operation = operation
+        self.start = time.monotonic()
+        self.interval = interval
+        self._last_log = self.start
+        self.stats = {'zones': total, 'done': 0, 'skipped': 0, 'failed': 0, 'rrsets': 0, 'records': 0}
+
+    def add(self, result=None, error=None):
+        if error is not None:
+            self.stats['failed'] += 1
+        elif result is None:
+            self.stats['skipped'] += 1
+        else:
+            self.stats['done'] += 1
+            self.stats['rrsets'] += result['rrsets']
+            self.stats['records'] += result['records']
+        now = time.monotonic()
+        if now - self._last_log >= self.interval:
+            self._last_log = now
+            logger.info('{}: {} of {} zones, {:.0f} records/s'.format(
+                self.operation, self.stats['done'] + self.stats['skipped'] + self.stats['failed'],
+                self.stats['zones'], self.stats['records'] / (now - self.start)))
+
+    def finish(self):
+        seconds = time.monotonic() - self.start
+        return dict(self.stats, seconds=seconds,
+                    records_per_second=self.stats['records'] / seconds if seconds > 0 else 0.0)
+
+
+def export_zone(api, zone, directory, fmt='zone'):
+    """
+    Streams ``zone`` from the API into a file in ``directory``. The file is written under a temporary name and
+    renamed when it is complete, so a file with the final name is never partial.
+
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param str zone: The zone to export
+    :param str directory: The directory to write the file to
+    :param str fmt: 'zone' or 'jsonl'
+    :return: The name of the `file` and the number of `rrsets` and `records` written
+    :rtype: dict
+    """
+    filename = zone_filename(zone, fmt)
+    path = os.path.join(directory, filename)
+    tmp = '{}.tmp'.format(path)
+    rrsets = records = 0
+    try:
+        with open(tmp, 'w') as f:
+            if fmt == 'zone':
+                f.write('$ORIGIN {}\n'.format(zone))
+            for rrset in api.iter_zone(zone):
+                if rrset.rtype.upper() in SKIPPED_TYPES:
+                    continue
+                if fmt == 'jsonl':
+                    f.write(json.dumps(_rrset_dict(rrset)) + '\n')
+                else:
+                    zonefile.write_rrset(f, rrset)
+                rrsets += 1
+                records += len(rrset.records)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return {'file': filename, 'rrsets': rrsets, 'records': records}
+
+
+def export_zones(api, directory, fmt='zone', zones=None, jobs=8, restart=False):
+    """
+    Exports zones to ``directory``, ``jobs`` at a time. Zones that are in the manifest with the serial they currently
+    have are skipped, so running this again only exports the zones that were not done or changed since.
+
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param str directory: The directory to write the files and the manifest to, it is created when needed
+    :param str fmt: 'zone' or 'jsonl'
+    :param zones: The names of the zones to export, all zones when None
+    :param int jobs: The maximum number of zones to export at the same time
+    :param bool restart: Ignore the manifest of a previous run
+    :return: The number of ``zones``, of zones ``done``, ``skipped`` and ``failed``, the number of ``rrsets`` and
+             ``records`` exported, the ``seconds`` it took and the ``records_per_second``
+    :rtype: dict
+    """
+    if fmt not in FORMATS:
+        raise ValueError('Unknown format {}'.format(fmt))
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, EXPORT_MANIFEST)
+    if restart and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    manifest = Manifest(manifest_path)
+
+    all_zones = api.get_zones()
+    if zones is not None:
+        wanted = set(zones)
+        all_zones = [z for z in all_zones if z.name in wanted or z.id in wanted]
+    progress = _Progress('export', len(all_zones))
+
+    def export(zone):
+        entry = manifest.get(zone.name)
+        if entry is not None and entry.get('serial') == getattr(zone, 'serial', None) and entry.get('format') == fmt:
+            return None
+        result = export_zone(api, zone.name, directory, fmt)
+        manifest.add(dict(result, zone=zone.name, format=fmt, kind=zone.kind, masters=getattr(zone, 'masters', []),
+                          serial=getattr(zone, 'serial', None)))
+        return result
+
+    try:
+        for zone, result, error in iter_concurrently(export, all_zones, jobs):
+            if error is not None:
+                logger.error('Unable to export {}: {}'.format(zone.name, error))
+            progress.add(result, error)
+    finally:
+        manifest.close()
+    return progress.finish()
+
+
+def import_zone(api, zone, rrsets, kind='Native', masters=None, exists=False, max_rrsets=zonesync.DEFAULT_MAX_RRSETS,
+                max_bytes=zonesync.DEFAULT_MAX_BYTES, comments=False):
+    """
+    Creates ``zone`` with ``rrsets``. The zone is created with the first chunk of RRSets (with the SOA and NS RRSets
+    at the apex first) and the rest is added with PATCH requests of bounded size. When the zone already exists (e.g.
+    from an interrupted import), it is synchronized with :func:`pdnsapi.zonesync.sync_zone` instead.
+
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param str zone: The name of the zone
+    :param list rrsets: The :class:`pdnsapi.zone.RRSet` of the zone
+    :param str kind: The kind of the zone, for a 'Slave' zone no RRSets are imported
+    :param list masters: The primaries of a 'Slave' zone
+    :param bool exists: True when the zone already exists on the server
+    :param bool comments: Import the comments of the RRSets too
+    :return: The number of `rrsets` and `records` imported and the number of `requests` made
+    :rtype: dict
+    """
+    rrsets = [r for r in rrsets if r.rtype.upper() not in SKIPPED_TYPES]
+    if kind == 'Slave':
+        rrsets = []
+    records = sum(len(r.records) for r in rrsets)
+
+    if exists:
+        if kind == 'Slave':
+            return {'rrsets': 0, 'records': 0, 'requests': 0}
+        stats = zonesync.sync_zone(api, zone, rrsets, max_rrsets=max_rrsets, max_bytes=max_bytes, comments=comments)
+        return {'rrsets': stats['added'] + stats['changed'] + stats['deleted'], 'records': records,
+                'requests': stats['patches'] + 1}
+
+    apex = zone.lower()
+    rrsets.sort(key=lambda r: (r.name.lower() != apex or r.rtype.upper() not in ('SOA', 'NS')))
+    chunks = zonesync.chunk_changes([zonesync.rrset_change(r, comments=comments) for r in rrsets], max_rrsets,
+                                    max_bytes)
+    first = next(chunks, [])
+    for change in first:
+        change.pop('changetype')
+    api.create_zone(zone, kind=kind, masters=masters, rrsets=first)
+    requests = 1
+    for chunk in chunks:
+        api.patch_rrsets(zone, chunk)
+        requests += 1
+    return {'rrsets': len(rrsets), 'records': records, 'requests': requests}
+
+
+def _import_sources(directory, fmt):
+    """
+    :return: A dict of zone name to export manifest entry, from the manifest in ``directory`` or, when there is none,
+             from the names of the files
+    """
+    path = os.path.join(directory, EXPORT_MANIFEST)
+    if os.path.exists(path):
+        sources = {}
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                sources[entry['zone']] = entry
+        return sources
+    suffix = '.{}'.format(fmt)
+    return {
+        zone_from_filename(f, fmt): {'file': f, 'format': fmt, 'kind': 'Native'}
+        for f in sorted(os.listdir(directory)) if f.endswith(suffix)
+    }
+
+
+def import_zones(api, directory, fmt='zone', zones=None, jobs=8, restart=False,
+                 max_rrsets=zonesync.DEFAULT_MAX_RRSETS, max_bytes=zonesync.DEFAULT_MAX_BYTES):
+    """
+    Imports the zones in ``directory`` (written by :func:`export_zones`), ``jobs`` at a time. Zones that are in the
+    import manifest are skipped. Zones that exist on the server but are not in the import manifest are synchronized
+    instead of created.
+
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param str directory: The directory with the exported zones
+    :param str fmt: The format of the files when there is no export manifest, 'zone' or 'jsonl'
+    :param zones: The names of the zones to import, all zones in ``directory`` when None
+    :param int jobs: The maximum number of zones to import at the same time
+    :param bool restart: Ignore the import manifest of a previous run
+    :return: The same statistics as :func:`export_zones`, and the number of API ``requests``
+    :rtype: dict
+    """
+    sources = _import_sources(directory, fmt)
+    if zones is not None:
+        wanted = set(zones)
+        sources = {zone: entry for zone, entry in sources.items() if zone in wanted}
+    manifest_path = os.path.join(directory, IMPORT_MANIFEST)
+    if restart and os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    manifest = Manifest(manifest_path)
+    existing = {z.name for z in api.get_zones()}
+    progress = _Progress('import', len(sources))
+    requests = 0
+
+    def do_import(zone):
+        if zone in manifest:
+            return None
+        entry = sources[zone]
+        source_fmt = entry.get('format', fmt)
+        rrsets = read_zone_file(os.path.join(directory, entry['file']), zone, source_fmt)
+        # Only JSON Lines files have comments, the zone file format would remove them from the server
+        result = import_zone(api, zone, rrsets, kind=entry.get('kind', 'Native'), masters=entry.get('masters'),
+                             exists=zone in existing, max_rrsets=max_rrsets, max_bytes=max_bytes,
+                             comments=source_fmt == 'jsonl')
+        manifest.add(dict(result, zone=zone))
+        return result
+
+    try:
+        for zone, result, error in iter_concurrently(do_import, sorted(sources), jobs):
+            if error is not None:
+                logger.error('Unable to import {}: {}'.format(zone, error))
+            elif result is not None:
+                requests += result['requests']
+            progress.add(result, error)
+    finally:
+        manifest.close()
+    return dict(progress.finish(), requests=requests)
@@ -0,0 +1,35 @@
+"""
+Runs many API calls at the same time, without queueing all of them up front.
+"""
+import concurrent.futures
+
+
+def iter_concurrently(func, items, jobs):
+    """
+    Calls ``func`` for every item of ``items`` with at most ``jobs`` calls running at the same time. Only a bounded
+    number of items is taken from ``items`` ahead of time, so it can be a generator.
+
+    :return: A generator of (item, result or None, Exception or None) tuples, in the order the calls complete
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = {}
+        items = iter(items)
+        exhausted = False
+        while pending or not exhausted:
+            # Keep a bounded number of calls queued, so we do not create a future for every item at once
+            while not exhausted and len(pending) < jobs * 2:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(func, item)] = item
+            if not pending:
+                break
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    yield item, future.result(), None
+                except Exception as e:
+                    yield item, None, e
@@ -0,0 +1,153 @@
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+# What can follow a value inside an object or array
+_delimiters = _whitespace + ',]}'
+
+
+class _Buffer:
+    """
+    Holds the not-yet-parsed part of a JSON document that arrives in chunks
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def _next_chunk(self):
+        """
+        :return: The next chunk as :class:`str`, '' once there is no more data
+        """
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self.eof = True
+            return self._utf8.decode(b'', final=True)
+        if isinstance(chunk, bytes):
+            chunk = self._utf8.decode(chunk)
+        return chunk
+
+    def fill(self, want=0):
+        """
+        Discards everything that was already parsed and appends chunks until at least ``want`` characters are
+        buffered (at least one chunk)
+
+        :return: False when there is no more data
+        """
+        if self.eof:
+            return False
+        parts = [self.text[self.pos:]]
+        size = len(parts[0])
+        while not self.eof:
+            parts.append(self._next_chunk())
+            size += len(parts[-1])
+            if size >= want:
+                break
+        self.text = ''.join(parts)
+        self.pos = 0
+        return True
+
+    def close(self):
+        """
+        Closes the underlying chunk iterator, if it can be closed (e.g. a generator that holds a response open)
+        """
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+
+    def skip_whitespace(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def expect(self, chars):
+        """
+        Consumes one of ``chars`` (after any whitespace)
+
+        :return: The consumed character
+        :raises: ValueError when something else is found
+        """
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise ValueError('Unexpected end of JSON document, expected one of "{}"'.format(chars))
+        c = self.text[self.pos]
+        if c not in chars:
+            raise ValueError('Unexpected "{}" at offset {}, expected one of "{}"'.format(c, self.pos, chars))
+        self.pos += 1
+        return c
+
+    def peek(self):
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            return None
+        return self.text[self.pos]
+
+    def value(self):
+        """
+        Decodes the next complete JSON value, reading more chunks as needed.
+
+        When the value is not complete yet, the buffered part is at least doubled before decoding is tried again, so
+        a value that spans many chunks is decoded a logarithmic number of times instead of once per chunk.
+        """
+        self.skip_whitespace()
+        while True:
+            try:
+                val, end = _decoder.raw_decode(self.text, self.pos)
+                # A number might continue in the next chunk, e.g. '-1.' followed by '5'
+                complete = end < len(self.text) and (
+                    not isinstance(val, (int, float)) or isinstance(val, bool) or self.text[end] in _delimiters)
+                if complete or self.eof:
+                    self.pos = end
+                    return val
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.fill(2 * (len(self.text) - self.pos))
+
+
+def iter_object(chunks, stream_key):
+    """
+    Incrementally parses a JSON object from ``chunks``.
+
+    Every member of the object is yielded as a ``(key, value)`` tuple, except for the array named ``stream_key``, whose
+    elements are yielded one by one as ``(stream_key, element)`` tuples. Only one element of that array is held in
+    memory at any time. ``chunks`` is closed (when it has a ``close`` method) once the generator finishes or is closed.
+
+    :param chunks: An iterable of :class:`bytes` or :class:`str` that together form the JSON document
+    :param str stream_key: The name of the member that holds the array to stream
+    :return: A generator of ``(key, value)`` tuples
+    :raises: ValueError when the document is not a JSON object
+    """
+    buf = _Buffer(chunks)
+    try:
+        buf.expect('{')
+        if buf.peek() == '}':
+            return
+        while True:
+            key = buf.value()
+            if not isinstance(key, str):
+                raise ValueError('Object key is not a string: {}'.format(key))
+            buf.expect(':')
+            if key == stream_key and buf.peek() == '[':
+                buf.expect('[')
+                if buf.peek() != ']':
+                    while True:
+                        yield key, buf.value()
+                        if buf.expect(',]') == ']':
+                            break
+                else:
+                    buf.expect(']')
+            else:
+                yield key, buf.value()
+            if buf.expect(',}') == '}':
+                return
+    finally:
+        # Also when the caller stops iterating early
+        buf.close()
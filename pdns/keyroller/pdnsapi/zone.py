@@ -1,4 +1,9 @@
+import pdnsapi.jsonstream
+
+
 class RRSet:
+    __slots__ = ('name', 'rtype', 'ttl', '_records', '_comments')
+
     def __init__(self, name, type, ttl, records, comments=[]):
         """
         Represents and RRSet from the API, see https://doc.powerdns.com/md/httpapi/api_spec/#zone95collection
@@ -62,6 +67,8 @@ class RRSet:
 
 
 class Record:
+    __slots__ = ('content', 'disabled')
+
     def __init__(self, content, disabled):
         """
         Represents a Record from the API. Note that is does not contian the rrname nor ttl (these are held by the
@@ -78,6 +85,8 @@ class Record:
 
 
 class Comment:
+    __slots__ = ('content', 'modified_at', 'account')
+
     def __init__(self, content, modified_at, account):
         """
         Constructor, see https://doc.powerdns.com/md/httpapi/api_spec/#zone95collection
@@ -158,3 +167,22 @@ class Zone:
         if not all(isinstance(v, RRSet) for v in val):
             raise Exception('Not all rrsets are actually RRSets')
         self._rrsets = val
+
+
+def iter_rrsets(chunks, zone=None):
+    """
+    Incrementally parses a zone as returned by the API, yielding every :class:`RRSet` as soon as it has been read.
+
+    Only the RRSet that is currently being parsed is kept in memory, so this can be used to iterate over zones that
+    are too large to be loaded as a :class:`Zone` at once.
+
+    :param chunks: An iterable of :class:`bytes` that together form the JSON representation of the zone
+    :param zone: If this is a :class:`Zone`, all other attributes of the zone are set on it while parsing. Note that
+                 attributes that appear after the rrsets are only available once the generator is exhausted
+    :return: A generator of :class:`RRSet`
+    """
+    for k, v in pdnsapi.jsonstream.iter_object(chunks, 'rrsets'):
+        if k == 'rrsets':
+            yield RRSet(**v)
+        elif zone is not None and k in Zone._keys:
+            setattr(zone, k, v)
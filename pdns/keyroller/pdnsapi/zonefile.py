@@ -0,0 +1,223 @@
+"""
+Reading and writing zones in the zone file format (:rfc:`1035#section-5`), as far as it is needed to move zones in and
+out of the API: ``$ORIGIN``, ``$TTL``, relative names, ``@``, omitted owners, TTLs and classes, comments and
+parentheses. ``$INCLUDE`` and ``$GENERATE`` are not supported.
+"""
+import collections
+import re
+
+from pdnsapi.zone import RRSet, Record
+
+# For these types, the fields (0-based) that are domain names and need to be made absolute
+_name_fields = {
+    'AFSDB': (1,),
+    'CNAME': (0,),
+    'DNAME': (0,),
+    'KX': (1,),
+    'MX': (1,),
+    'NS': (0,),
+    'PTR': (0,),
+    'RP': (0, 1),
+    'RT': (1,),
+    'SOA': (0, 1),
+    'SRV': (3,),
+}
+
+_ttl_units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+_classes = ('IN', 'CH', 'HS', 'CS')
+
+
+def parse_ttl(value):
+    """
+    Parses a TTL, either a number of seconds or a BIND style duration like `1h30m`
+
+    :param str value: The TTL
+    :return: The TTL in seconds
+    :rtype: int
+    :raises: ValueError if ``value`` is not a TTL
+    """
+    if value.isdigit():
+        return int(value)
+    parts = re.findall(r'(\d+)([smhdw])', value.lower())
+    if not parts or ''.join(n + u for n, u in parts) != value.lower():
+        raise ValueError('Invalid TTL {}'.format(value))
+    return sum(int(n) * _ttl_units[u] for n, u in parts)
+
+
+def _tokenize(line):
+    """
+    Splits a line in tokens, keeping quoted strings (including the quotes) together and dropping comments
+
+    :return: A list of tokens, with '(' and ')' as separate tokens
+    """
+    tokens = []
+    i = 0
+    n = len(line)
+    while i < n:
+        c = line[i]
+        if c in ' \t\r\n':
+            i += 1
+        elif c == ';':
+            break
+        elif c in '()':
+            tokens.append(c)
+            i += 1
+        elif c == '"':
+            j = i + 1
+            while j < n and line[j] != '"':
+                j += 2 if line[j] == '\\' else 1
+            tokens.append(line[i:j + 1])
+            i = j + 1
+        else:
+            j = i
+            while j < n and line[j] not in ' \t\r\n;()"':
+                j += 2 if line[j] == '\\' else 1
+            tokens.append(line[i:j])
+            i = j
+    return tokens
+
+
+def _logical_lines(lines):
+    """
+    Joins lines that are continued with parentheses
+
+    :return: A generator of tuples of a bool that is True when the line started with whitespace, and the tokens
+    """
+    tokens = []
+    depth = 0
+    indented = False
+    for line in lines:
+        line = line.rstrip('\n')
+        if depth == 0:
+            indented = line[:1] in (' ', '\t')
+        for token in _tokenize(line):
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+            else:
+                tokens.append(token)
+        if depth == 0 and tokens:
+            yield indented, tokens
+            tokens = []
+    if depth != 0:
+        raise ValueError('Unbalanced parentheses at the end of the zone')
+
+
+def absolute_name(name, origin):
+    """
+    :param str name: A name from a zone file, '@', relative or absolute
+    :param str origin: The current origin, with a trailing dot
+    :return: ``name`` as an absolute name
+    :rtype: str
+    """
+    if name == '@':
+        return origin
+    if name.endswith('.') and not name.endswith('\\.'):
+        return name
+    if origin == '.':
+        return name + '.'
+    return '{}.{}'.format(name, origin)
+
+
+def normalize_content(rtype, content):
+    """
+    Normalizes the content of a record so it can be compared: whitespace outside of quoted strings is collapsed, and
+    the names in types like MX and SOA are lowercased
+
+    :param str rtype: The type of the record
+    :param str content: The content of the record
+    :return: The normalized content
+    :rtype: str
+    """
+    content = ' '.join(_tokenize(content))
+    if rtype.upper() in _name_fields:
+        content = content.lower()
+    return content
+
+
+def iter_records(lines, origin, default_ttl=3600):
+    """
+    Parses a zone file
+
+    :param lines: An iterable of the lines of the zone file
+    :param str origin: The name of the zone
+    :param int default_ttl: The TTL of records without a TTL when there is no ``$TTL``
+    :return: A generator of tuples of the name, TTL, type and content of every record, all names are absolute
+    :raises: ValueError on syntax errors
+    """
+    origin = absolute_name(origin, '.')
+    ttl = None
+    last_ttl = None
+    owner = None
+    for indented, tokens in _logical_lines(lines):
+        if tokens[0].upper() == '$ORIGIN':
+            origin = absolute_name(tokens[1], origin)
+            continue
+        if tokens[0].upper() == '$TTL':
+            ttl = parse_ttl(tokens[1])
+            continue
+        if tokens[0].startswith('$'):
+            raise ValueError('Unsupported directive {}'.format(tokens[0]))
+
+        if not indented:
+            owner = absolute_name(tokens.pop(0), origin)
+        if owner is None:
+            raise ValueError('Record without an owner: {}'.format(' '.join(tokens)))
+
+        record_ttl = None
+        # TTL and class can appear in either order
+        for _ in range(2):
+            if tokens and tokens[0].upper() in _classes:
+                if tokens.pop(0).upper() != 'IN':
+                    raise ValueError('Only class IN is supported')
+            elif tokens and record_ttl is None and tokens[0][:1].isdigit():
+                record_ttl = parse_ttl(tokens.pop(0))
+        if not tokens:
+            raise ValueError('Record for {} without a type'.format(owner))
+        rtype = tokens.pop(0).upper()
+
+        for i in _name_fields.get(rtype, ()):
+            if i < len(tokens):
+                tokens[i] = absolute_name(tokens[i], origin)
+
+        if record_ttl is None:
+            # $TTL (RFC 2308), otherwise the last explicit TTL (RFC 1035)
+            record_ttl = next(t for t in (ttl, last_ttl, default_ttl) if t is not None)
+        else:
+            last_ttl = record_ttl
+        yield owner, record_ttl, rtype, ' '.join(tokens)
+
+
+def read_rrsets(lines, origin, default_ttl=3600):
+    """
+    Parses a zone file into RRSets. When the records of an RRSet have different TTLs, the lowest one is used.
+
+    :param lines: An iterable of the lines of the zone file
+    :param str origin: The name of the zone
+    :param int default_ttl: The TTL of records without a TTL when there is no ``$TTL``
+    :return: The RRSets in the order they first appear
+    :rtype: list(:class:`pdnsapi.zone.RRSet`)
+    """
+    rrsets = collections.OrderedDict()
+    for name, ttl, rtype, content in iter_records(lines, origin, default_ttl):
+        key = (name.lower(), rtype)
+        rrset = rrsets.get(key)
+        if rrset is None:
+            rrset = rrsets[key] = RRSet(name, rtype, ttl, [])
+        rrset.ttl = min(rrset.ttl, ttl)
+        rrset.records.append(Record(content, False))
+    return list(rrsets.values())
+
+
+def write_rrset(f, rrset):
+    """
+    Writes ``rrset`` to ``f`` in the zone file format, with absolute names. Disabled records are written as comments.
+
+    :param f: A file-like object opened for writing text
+    :param rrset: The :class:`pdnsapi.zone.RRSet`
+    """
+    for record in rrset.records:
+        f.write('{}{}\t{}\tIN\t{}\t{}\n'.format(';' if record.disabled else '', rrset.name, rrset.ttl, rrset.rtype,
+                                                record.content))
@@ -0,0 +1,251 @@
+"""
+Synchronizes the contents of a zone in the API with a desired state, sending only the RRSets that differ.
+"""
+import hashlib
+import json
+import logging
+import time
+
+from pdnsapi.zone import Zone
+from pdnsapi.zonefile import normalize_content
+
+logger = logging.getLogger(__name__)
+
+# Record types that the server generates itself, they are never changed by a sync
+DEFAULT_IGNORED_TYPES = ('DNSKEY', 'RRSIG', 'NSEC', 'NSEC3')
+
+# Record types that are never deleted from the apex, the server rejects a zone without them
+APEX_TYPES = ('SOA', 'NS')
+
+# Bounds for the size of a single PATCH request
+DEFAULT_MAX_RRSETS = 500
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+
+def rrset_key(rrset):
+    """
+    :param rrset: A :class:`pdnsapi.zone.RRSet`
+    :return: The name (lowercased) and type of ``rrset``, which identify it within a zone
+    :rtype: tuple(str, str)
+    """
+    return rrset.name.lower(), rrset.rtype.upper()
+
+
+def rrset_fingerprint(rrset, ignore_soa_serial=True, comments=False):
+    """
+    Hashes the TTL and records of ``rrset``. RRSets with the same contents have the same fingerprint, regardless of
+    the order of the records or the formatting of their content.
+
+    :param rrset: A :class:`pdnsapi.zone.RRSet`
+    :param bool ignore_soa_serial: Leave the serial out of the fingerprint of SOA RRSets, as the server changes it
+    :param bool comments: Include the content and account of the comments (not their modification time)
+    :return: The fingerprint
+    :rtype: bytes
+    """
+    rtype = rrset.rtype.upper()
+    records = []
+    for record in rrset.records:
+        content = normalize_content(rtype, record.content)
+        if rtype == 'SOA' and ignore_soa_serial:
+            fields = content.split(' ')
+            if len(fields) > 2:
+                fields[2] = '0'
+            content = ' '.join(fields)
+        records.append((content, bool(record.disabled)))
+    records.sort()
+    fields = [rrset.ttl, records]
+    if comments:
+        fields.append(sorted((c.content, c.account) for c in rrset.comments))
+    return hashlib.sha256(json.dumps(fields).encode()).digest()
+
+
+def rrset_change(rrset, changetype='REPLACE', comments=False):
+    """
+    :param rrset: A :class:`pdnsapi.zone.RRSet`
+    :param str changetype: 'REPLACE' or 'DELETE'
+    :param bool comments: Replace the comments of the RRSet as well, otherwise the server keeps its current comments
+    :return: The change of ``rrset`` as a dict, for :meth:`pdnsapi.api.PDNSApi.patch_rrsets`
+    :rtype: dict
+    """
+    if changetype == 'DELETE':
+        return {'name': rrset.name, 'type': rrset.rtype, 'changetype': 'DELETE'}
+    ret = {
+        'name': rrset.name,
+        'type': rrset.rtype,
+        'ttl': rrset.ttl,
+        'changetype': 'REPLACE',
+        'records': [{'content': r.content, 'disabled': r.disabled} for r in rrset.records],
+    }
+    if comments:
+        ret['comments'] = [{'content': c.content, 'account': c.account, 'modified_at': c.modified_at}
+                           for c in rrset.comments]
+    return ret
+
+
+class ZoneDiff:
+    """
+    The changes needed to turn one version of a zone into another
+    """
+
+    def __init__(self):
+        self.added = []
+        self.changed = []
+        self.deleted = []
+        self.unchanged = 0
+
+    @property
+    def changes(self):
+        """
+        All changes, as dicts for :meth:`pdnsapi.api.PDNSApi.patch_rrsets`
+        """
+        return self.deleted + self.changed + self.added
+
+    @property
+    def empty(self):
+        return not (self.added or self.changed or self.deleted)
+
+    def __repr__(self):
+        return 'ZoneDiff(added={}, changed={}, deleted={}, unchanged={})'.format(
+            len(self.added), len(self.changed), len(self.deleted), self.unchanged)
+
+
+def diff_zone(desired, live, ignored_types=DEFAULT_IGNORED_TYPES, ignore_soa_serial=True, apex=None,
+              comments=False):
+    """
+    Computes the RRSet changes that turn ``live`` into ``desired``. Only the fingerprints of the live RRSets are kept
+    in memory, so ``live`` can be a stream (e.g. :meth:`pdnsapi.api.PDNSApi.iter_zone`).
+
+    The SOA and NS RRSets of the apex (see :data:`APEX_TYPES`) are changed, but never deleted: when ``desired`` does
+    not have them, the live ones are kept.
+
+    :param desired: The desired state, a :class:`pdnsapi.zone.Zone` or an iterable of :class:`pdnsapi.zone.RRSet`
+    :param live: The current state, a :class:`pdnsapi.zone.Zone` or an iterable of :class:`pdnsapi.zone.RRSet`
+    :param ignored_types: RRSets of these types are neither changed nor deleted
+    :param bool ignore_soa_serial: Do not replace the SOA when only its serial differs
+    :param str apex: The name of the zone, by default the name of ``live`` or of its SOA
+    :param bool comments: Compare and send the comments of the RRSets too
+    :return: The changes
+    :rtype: ZoneDiff
+    """
+    if apex is None and isinstance(live, Zone):
+        apex = live.name
+    if isinstance(desired, Zone):
+        desired = desired.rrsets
+    if isinstance(live, Zone):
+        live = live.rrsets
+    ignored_types = {t.upper() for t in ignored_types}
+
+    wanted = {}
+    for rrset in desired:
+        key = rrset_key(rrset)
+        if key[1] in ignored_types:
+            continue
+        if key in wanted:
+            raise ValueError('RRSet {}/{} appears more than once'.format(rrset.name, rrset.rtype))
+        wanted[key] = rrset
+
+    diff = ZoneDiff()
+    seen = set()
+    # Deletions of apex types, only known to be at the apex once the SOA was seen
+    apex_deletes = []
+    for rrset in live:
+        key = rrset_key(rrset)
+        if key[1] in ignored_types:
+            continue
+        seen.add(key)
+        if key[1] == 'SOA' and apex is None:
+            apex = rrset.name
+        target = wanted.get(key)
+        if target is None:
+            if key[1] in APEX_TYPES:
+                apex_deletes.append(rrset)
+            else:
+                diff.deleted.append(rrset_change(rrset, 'DELETE'))
+        elif (rrset_fingerprint(target, ignore_soa_serial, comments) !=
+              rrset_fingerprint(rrset, ignore_soa_serial, comments)):
+            diff.changed.append(rrset_change(target, comments=comments))
+        else:
+            diff.unchanged += 1
+
+    for rrset in apex_deletes:
+        if apex is not None and rrset.name.lower().rstrip('.') == apex.lower().rstrip('.'):
+            logger.warning('Not deleting the {} RRSet of {}, it is not in the desired zone'.format(rrset.rtype,
+                                                                                                   rrset.name))
+        else:
+            diff.deleted.append(rrset_change(rrset, 'DELETE'))
+
+    for key, rrset in wanted.items():
+        if key not in seen:
+            diff.added.append(rrset_change(rrset, comments=comments))
+
+    return diff
+
+
+def chunk_changes(changes, max_rrsets=DEFAULT_MAX_RRSETS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Splits ``changes`` in chunks of at most ``max_rrsets`` RRSets and about ``max_bytes`` of JSON. A single change
+    that is larger than ``max_bytes`` gets a chunk of its own.
+
+    :param list changes: RRSet changes as dicts
+    :return: A generator of lists of changes
+    """
+    chunk = []
+    size = 0
+    for change in changes:
+        change_size = len(json.dumps(change)) + 1
+        if chunk and (len(chunk) >= max_rrsets or size + change_size > max_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(change)
+        size += change_size
+    if chunk:
+        yield chunk
+
+
+def sync_zone(api, zone, desired, dry_run=False, max_rrsets=DEFAULT_MAX_RRSETS, max_bytes=DEFAULT_MAX_BYTES,
+              ignored_types=DEFAULT_IGNORED_TYPES, ignore_soa_serial=True, comments=False):
+    """
+    Makes the contents of ``zone`` equal to ``desired``, with as few changes as possible. The live zone is streamed
+    from the API and compared RRSet by RRSet using fingerprints (see :func:`rrset_fingerprint`). Only the RRSets that
+    were added, changed or removed are sent, in PATCH requests of bounded size (see :func:`chunk_changes`).
+
+    Note that every PATCH is applied atomically, but when the changes need more than one PATCH, the zone is briefly
+    in a state between the old and the new one.
+
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param str zone: The zone to synchronize
+    :param desired: The desired state, a :class:`pdnsapi.zone.Zone` or an iterable of :class:`pdnsapi.zone.RRSet`
+    :param bool dry_run: Only compute the changes, do not apply them
+    :param int max_rrsets: The maximum number of RRSets in a PATCH
+    :param int max_bytes: The approximate maximum size of the JSON of a PATCH
+    :param ignored_types: RRSets of these types are neither changed nor deleted
+    :param bool ignore_soa_serial: Do not replace the SOA when only its serial differs
+    :param bool comments: Synchronize the comments of the RRSets too
+    :return: The number of ``added``, ``changed``, ``deleted`` and ``unchanged`` RRSets, the number of ``patches``
+             sent and the time it took in ``seconds`` (``diff_seconds`` of which were spent computing the changes)
+    :rtype: dict
+    """
+    start = time.monotonic()
+    diff = diff_zone(desired, api.iter_zone(zone), ignored_types, ignore_soa_serial, apex=zone,
+                     comments=comments)
+    diff_seconds = time.monotonic() - start
+
+    patches = 0
+    if not dry_run:
+        for chunk in chunk_changes(diff.changes, max_rrsets, max_bytes):
+            api.patch_rrsets(zone, chunk)
+            patches += 1
+
+    stats = {
+        'added': len(diff.added),
+        'changed': len(diff.changed),
+        'deleted': len(diff.deleted),
+        'unchanged': diff.unchanged,
+        'patches': patches,
+        'diff_seconds': diff_seconds,
+        'seconds': time.monotonic() - start,
+    }
+    logger.debug('{}: {} added, {} changed, {} deleted, {} unchanged RRSets, {} PATCH request(s) in {:.3f}s'.format(
+        zone, stats['added'], stats['changed'], stats['deleted'], stats['unchanged'], patches, stats['seconds']))
+    return stats
@@ -2,3 +2,4 @@ __author__ = 'PowerDNS.COM BV'
 
 PDNSKEYROLLER_CONFIG_metadata_kind = 'X-PDNSKEYROLLER-CONFIG'
 PDNSKEYROLLER_STATE_metadata_kind = 'X-PDNSKEYROLLER-STATE'
+PDNSKEYROLLER_LEASE_metadata_kind = 'X-PDNSKEYROLLER-LEASE'
@@ -1,3 +1,4 @@
+import copy
 import yaml
 import datetime
 import logging
@@ -8,61 +9,94 @@ import pdnskeyroller.keyrollerdomain
 logger = logging.getLogger(__name__)
 
 
+# These are all the Defaults
+DEFAULTS = {
+    'keyroller': {
+        'loglevel': 'info',
+        'state_mirror': None,
+        'workers': 1,
+        'lease_duration': 0,
+        'metrics_textfile': None,
+        'metrics_listen': None,
+        'interval': 0,
+    },
+    'API': {
+        'version': 1,
+        'baseurl': 'http://localhost:8081',
+        'server': 'localhost',
+        'apikey': '',
+        'timeout': '2',
+    },
+    'domain_defaults': {
+        'ksk_frequency': 0,
+        'ksk_algo': 13,
+        'ksk_method': 'prepublish',
+        'zsk_frequency': '6w',
+        'zsk_algo': 13,
+        'zsk_method': 'prepublish',
+        'key_style': 'single',
+        'ksk_keysize': 3069,
+        'zsk_keysize': 3069,
+    },
+}
+
+
+def load_config(configfile, must_exist=False):
+    """
+    Reads the configuration file on top of :data:`DEFAULTS` and sets the loglevel
+
+    :param string configfile: The path to the configuration file
+    :param bool must_exist: Raise :class:`FileNotFoundError` when the file does not exist, instead of logging it and
+                            returning the defaults
+    :return: The configuration, by section
+    :rtype: dict
+    """
+    tmp_conf = copy.deepcopy(DEFAULTS)
+
+    logger.debug("Loading configuration from {}".format(configfile))
+    try:
+        with open(configfile, 'r') as f:
+            a = yaml.safe_load(f)
+            if a:
+                for k, v in tmp_conf.items():
+                    if isinstance(v, dict) and isinstance(a.get(k), dict):
+                        tmp_conf[k].update(a.get(k))
+                    if isinstance(v, list) and isinstance(a.get(k), list):
+                        tmp_conf[k] = a.get(k)
+
+        loglevel = getattr(logging, tmp_conf['keyroller']['loglevel'].upper())
+        if not isinstance(loglevel, int):
+            loglevel = logging.INFO
+        logger.info("Setting loglevel to {}".format(loglevel))
+        logging.basicConfig(level=loglevel)
+
+    except FileNotFoundError as e:
+        if must_exist:
+            raise
+        logger.error('Unable to load configuration file: {}'.format(e))
+
+    return tmp_conf
+
+
 class KeyrollerConfig:
     def __init__(self, configfile):
         self._configfile = configfile
-        self._config = self._load_config()
-
-    def _load_config(self):
-        # These are all the Defaults
-        tmp_conf = {
-            'keyroller': {
-                'loglevel': 'info',
-            },
-            'API': {
-                'version': 1,
-                'baseurl': 'http://localhost:8081',
-                'server': 'localhost',
-                'apikey': '',
-                'timeout': '2',
-            },
-            'domain_defaults': {
-                'ksk_frequency': 0,
-                'ksk_algo': 13,
-                'ksk_method': 'prepublish',
-                'zsk_frequency': '6w',
-                'zsk_algo': 13,
-                'zsk_method': 'prepublish',
-                'key_style': 'single',
-                'ksk_keysize': 3069,
-                'zsk_keysize': 3069,
-            },
-        }
-
-        logger.debug("Loading configuration from {}".format(self._configfile))
-        try:
-            with open(self._configfile, 'r') as f:
-                a = yaml.safe_load(f)
-                if a:
-                    for k, v in tmp_conf.items():
-                        if isinstance(v, dict) and isinstance(a.get(k), dict):
-                            tmp_conf[k].update(a.get(k))
-                        if isinstance(v, list) and isinstance(a.get(k), list):
-                            tmp_conf[k] = a.get(k)
-
-            loglevel = getattr(logging, tmp_conf['keyroller']['loglevel'].upper())
-            if not isinstance(loglevel, int):
-                loglevel = logging.INFO
-            logger.info("Setting loglevel to {}".format(loglevel))
-            logging.basicConfig(level=loglevel)
-
-        except FileNotFoundError as e:
-            logger.error('Unable to load configuration file: {}'.format(e))
-
-        return tmp_conf
+        self._config = load_config(configfile)
 
     def api(self):
         return self._config['API']
 
     def defaults(self):
         return self._config['domain_defaults']
+
+    def state_mirror(self):
+        return self._config['keyroller']['state_mirror']
+
+    def interval(self):
+        return int(self._config['keyroller']['interval'] or 0)
+
+    def metrics_listen(self):
+        return self._config['keyroller']['metrics_listen']
+
+    def workers(self):
+        return int(self._config['keyroller']['workers'] or 1)
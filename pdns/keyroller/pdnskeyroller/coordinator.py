@@ -0,0 +1,189 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+
+import pdnskeyroller.daemon
+
+logger = logging.getLogger(__name__)
+
+# Signals the supervisor forwards to its workers
+FORWARDED_SIGNALS = (signal.SIGHUP, signal.SIGTERM)
+# Seconds between two checks of the workers by the supervisor
+SUPERVISE_INTERVAL = 1
+# Minimal number of seconds between two starts of the worker of a shard, so a worker that cannot start (e.g. because
+# the API is down) is not restarted in a loop
+RESTART_DELAY = 30
+
+
+def _init_worker():
+    """
+    Resets the signal handlers a worker inherits from the coordinator: SIGTERM terminates the worker (as
+    :meth:`multiprocessing.pool.Pool.terminate` expects), SIGHUP is for the coordinator only
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+
+def _run_worker(args):
+    """
+    Runs one :class:`Daemon <pdnskeyroller.daemon.Daemon>` for a shard, in a worker process
+
+    :param tuple args: The configuration file, the shard and the total number of shards
+    :return: A tuple of the shard, the statistics of the run (or None) and the error message (or None)
+    """
+    configfile, shard, shards = args
+    try:
+        d = pdnskeyroller.daemon.Daemon(configfile, shard=shard, shards=shards)
+        return shard, d.run(), None
+    except Exception as e:
+        return shard, None, str(e)
+
+
+def run_sharded(configfile, workers):
+    """
+    Splits all zones over ``workers`` processes, each running its own
+    :class:`Daemon <pdnskeyroller.daemon.Daemon>` for a stable partition of the zones, and reports the progress of all
+    of them.
+
+    :param string configfile: The path to the configuration file
+    :param int workers: The number of worker processes
+    :return: The statistics of all workers added up, plus the number of ``errors`` (workers that could not run)
+    :rtype: dict
+    """
+    start = time.monotonic()
+    totals = {
+        'domains': 0,
+        'actionable': 0,
+        'processed': 0,
+        'failed': 0,
+        'leased': 0,
+        'errors': 0,
+    }
+    done = 0
+
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        # Report every worker as soon as it is done
+        for shard, stats, error in pool.imap_unordered(_run_worker, [(configfile, shard, workers)
+                                                                     for shard in range(workers)]):
+            done += 1
+            if error is not None:
+                logger.error("Worker {} failed: {}".format(shard, error))
+                totals['errors'] += 1
+                continue
+            for k, v in stats.items():
+                totals[k] += v
+            logger.info("Worker {} done ({}/{}): {} domain(s), {} actionable, {} processed, {} failed, {} leased".format(
+                shard, done, workers, stats['domains'], stats['actionable'], stats['processed'], stats['failed'],
+                stats['leased']))
+
+    logger.info("All {} workers done in {:.3f}s: {} domain(s), {} actionable, {} processed, {} failed, {} leased, "
+                "{} worker error(s)".format(workers, time.monotonic() - start, totals['domains'],
+                                            totals['actionable'], totals['processed'], totals['failed'],
+                                            totals['leased'], totals['errors']))
+    return totals
+
+
+def _serve_worker(configfile, shard, shards, interval):
+    """
+    Runs :meth:`Daemon.serve <pdnskeyroller.daemon.Daemon.serve>` for a shard until it receives SIGTERM, in a worker
+    process started by :class:`Supervisor`. The forwarded signals are blocked until the zones are loaded.
+    """
+    # Ctrl-C reaches the whole process group, the supervisor stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        d = pdnskeyroller.daemon.Daemon(configfile, shard=shard, shards=shards)
+    except Exception as e:
+        logger.error("Worker {} is unable to start: {}".format(shard, e))
+        sys.exit(1)
+    signal.signal(signal.SIGHUP, lambda signum, frame: d.request_reload())
+    signal.signal(signal.SIGTERM, lambda signum, frame: d.stop())
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, FORWARDED_SIGNALS)
+    d.serve(interval)
+
+
+class Supervisor:
+    """
+    Keeps one worker process per shard running :meth:`Daemon.serve <pdnskeyroller.daemon.Daemon.serve>` on its own
+    partition of the zones. Workers keep their zones (and state mirror) between runs and schedule their runs
+    themselves; the supervisor only restarts the workers that exit and forwards SIGHUP and SIGTERM to them.
+    """
+
+    def __init__(self, configfile, workers, interval):
+        """
+        :param string configfile: The path to the configuration file
+        :param int workers: The number of worker processes
+        :param int interval: Seconds between two runs of every worker
+        """
+        self._configfile = configfile
+        self._workers = workers
+        self._interval = interval
+        self._processes = [None] * workers
+        self._started = [0.0] * workers
+        self._wakeup = threading.Event()
+        self._stop_requested = False
+        self._reload_requested = False
+
+    def _start(self, shard):
+        # The worker unblocks the signals once it can handle them
+        signal.pthread_sigmask(signal.SIG_BLOCK, FORWARDED_SIGNALS)
+        try:
+            process = multiprocessing.Process(target=_serve_worker, name='pdns-keyroller-worker-{}'.format(shard),
+                                              args=(self._configfile, shard, self._workers, self._interval))
+            process.start()
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, FORWARDED_SIGNALS)
+        self._processes[shard] = process
+        self._started[shard] = time.monotonic()
+        logger.info("Started worker {} (pid {})".format(shard, process.pid))
+
+    def _signal(self, signum):
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signum)
+
+    def request_reload(self):
+        """
+        Makes the workers reload the configuration before their next run. Safe to call from a signal handler.
+        """
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def stop(self):
+        """
+        Makes :meth:`serve` stop the workers, and return once they finished their current run. Safe to call from a
+        signal handler.
+        """
+        self._stop_requested = True
+        self._wakeup.set()
+
+    def serve(self):
+        """
+        Starts the workers and keeps them running until :meth:`stop` is called
+        """
+        try:
+            for shard in range(self._workers):
+                self._start(shard)
+            while not self._stop_requested:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    logger.info("Reloading the configuration of all workers")
+                    self._signal(signal.SIGHUP)
+                for shard, process in enumerate(self._processes):
+                    if process is not None and process.exitcode is not None:
+                        logger.error("Worker {} exited with code {}".format(shard, process.exitcode))
+                        self._processes[shard] = None
+                    if self._processes[shard] is None and time.monotonic() - self._started[shard] >= RESTART_DELAY:
+                        self._start(shard)
+                self._wakeup.wait(SUPERVISE_INTERVAL)
+                self._wakeup.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._signal(signal.SIGTERM)
+            for process in self._processes:
+                if process is not None:
+                    process.join()
@@ -1,119 +1,431 @@
-import yaml
 import datetime
 import logging
+import threading
+import time
 
 from pdnsapi.api import PDNSApi
-from pdnskeyroller import domainstate
+from pdnskeyroller import domainstate, lease, metrics
+from pdnskeyroller.config import load_config
 import pdnskeyroller.keyrollerdomain
 from pdnskeyroller.prepublishkeyroll import PrePublishKeyRoll
+from pdnskeyroller.lease import shard_of
+from pdnskeyroller.statemirror import StateMirror
 
 logger = logging.getLogger(__name__)
 
+# Lease duration in seconds when running with several workers and none is configured
+DEFAULT_LEASE_DURATION = 600
+# Number of zones to lease at once
+LEASE_BATCH_SIZE = 100
+
 
 class Daemon:
-    def __init__(self, configfile):
+    def __init__(self, configfile, shard=None, shards=1):
+        """
+        :param string configfile: The path to the configuration file
+        :param int shard: When set, only handle the zones for which :func:`pdnskeyroller.lease.shard_of` returns this
+        :param int shards: The total number of shards
+        """
         self._configfile = configfile
         self._config = self._load_config()
+        self._shard = shard
+        self._shards = shards
+        self._wakeup = threading.Event()
+        self._stop_requested = False
+        self._reload_requested = False
+
+        self.metrics = metrics.Metrics({'shard': shard} if shard is not None else None)
+        self._metrics_server = None
+        self._setup_leases()
+        self._setup_metrics()
 
         # Initialize all domains
+        start = time.monotonic()
+        self._api = PDNSApi(request_observer=self.metrics.observe_api_request, **self._config['API'])
+        self._setup_domains()
+        self.metrics.set('pdns_keyroller_load_duration_seconds', time.monotonic() - start)
+        self.metrics.set('pdns_keyroller_zones', len(self._domains))
+
+    def _setup_leases(self):
+        # Leases protect against other keyrollers stepping the same zone
+        self._lease_duration = int(self._config['keyroller']['lease_duration'] or 0)
+        if self._shards > 1 and not self._lease_duration:
+            self._lease_duration = DEFAULT_LEASE_DURATION
+        self._lease_owner = lease.default_owner(self._shard) if self._lease_duration else None
+
+    def _setup_metrics(self):
+        self._metrics_textfile = None
+        if self._config['keyroller'].get('metrics_textfile'):
+            self._metrics_textfile = metrics.textfile_path(self._config['keyroller']['metrics_textfile'], self._shard)
+        if self._metrics_server is not None:
+            self._metrics_server.shutdown()
+            self._metrics_server.server_close()
+            self._metrics_server = None
+        if self._config['keyroller'].get('metrics_listen') and self._shard is None:
+            self._metrics_server = self.metrics.serve(self._config['keyroller']['metrics_listen'])
+
+    def _setup_domains(self):
+        """
+        (Re)loads all zones, from the state mirror when one is configured
+        """
         self._domains = {}
-        api = PDNSApi(**self._config['API'])
-        for zone in api.get_zones():
-            try:
-                zoneconf = pdnskeyroller.keyrollerdomain.KeyrollerDomain(zone.id, api)
-                self._domains[zone.id] = zoneconf
-            except FileNotFoundError:
-                logger.debug("No config found for zone {}".format(zone.id))
-                continue
-            except Exception as e:
-                logger.error("Unable to load informations for zone {}".format(zone.id))
+        # The serial of every zone we know of, configured or not, None when it has to be reloaded
+        self._serials = {}
+        self._mirror = None
+        if self._config['keyroller'].get('state_mirror'):
+            self._mirror = StateMirror(self._config['keyroller']['state_mirror'])
+            self._domains = self._mirror.load(self._api, zone_filter=self._owns)
+            self._serials = {zone: serial for zone, serial in self._mirror.serials().items() if self._owns(zone)}
+            return
+        self.refresh_zones()
+
+    def _load_domain(self, zone, serial):
+        """
+        Reads the config and state of ``zone`` from the API and stores the result in the domain table (and the state
+        mirror)
+        """
+        try:
+            config, state = pdnskeyroller.keyrollerdomain.fetch_metadata(zone, self._api)
+            keyrollerdomain = pdnskeyroller.keyrollerdomain.from_json(zone, self._api, config, state)
+        except Exception as e:
+            logger.error("Unable to load informations for zone {}: {}".format(zone, e))
+            # Try again at the next refresh
+            self._serials[zone] = None
+            return
+        self._serials[zone] = serial
+        if keyrollerdomain is None:
+            logger.debug("No config found for zone {}".format(zone))
+            self._domains.pop(zone, None)
+        else:
+            self._domains[zone] = keyrollerdomain
+        if self._mirror:
+            self._mirror.store(zone, serial, config, state, keyrollerdomain)
+
+    def refresh_zones(self):
+        """
+        Compares the zones on the server with the ones that are loaded, using their serial. Only zones that were added
+        or whose serial changed are read from the API, zones that were removed are dropped.
+
+        Metadata changes that do not change the serial of a zone are not noticed, use :meth:`reconcile` or restart the
+        keyroller for those.
+
+        :return: The number of ``added``, ``changed`` and ``removed`` zones
+        :rtype: dict
+        """
+        counts = {'added': 0, 'changed': 0, 'removed': 0}
+        seen = set()
+        for zone in self._api.get_zones():
+            if not self._owns(zone.id):
                 continue
+            seen.add(zone.id)
+            serial = getattr(zone, 'serial', None)
+            if zone.id in self._serials:
+                if serial is not None and self._serials[zone.id] == serial:
+                    continue
+                counts['changed'] += 1
+            else:
+                counts['added'] += 1
+            self._load_domain(zone.id, serial)
 
-    def _load_config(self):
-        # These are all the Defaults
-        tmp_conf = {
-            'keyroller': {
-                'loglevel': 'info',
-            },
-            'API': {
-                'version': 1,
-                'baseurl': 'http://localhost:8081',
-                'server': 'localhost',
-                'apikey': '',
-                'timeout': '2',
-            },
-        }
+        for zone in [zone for zone in self._serials if zone not in seen]:
+            logger.info("Zone {} was removed".format(zone))
+            counts['removed'] += 1
+            del self._serials[zone]
+            self._domains.pop(zone, None)
+            if self._mirror:
+                self._mirror.remove(zone)
 
-        logger.debug("Loading configuration from {}".format(self._configfile))
-        try:
-            with open(self._configfile, 'r') as f:
-                a = yaml.safe_load(f)
-                if a:
-                    for k, v in tmp_conf.items():
-                        if isinstance(v, dict) and isinstance(a.get(k), dict):
-                            tmp_conf[k].update(a.get(k))
-                        if isinstance(v, list) and isinstance(a.get(k), list):
-                            tmp_conf[k] = a.get(k)
-
-            loglevel = getattr(logging, tmp_conf['keyroller']['loglevel'].upper())
-            if not isinstance(loglevel, int):
-                loglevel = logging.INFO
-            logger.info("Setting loglevel to {}".format(loglevel))
-            logging.basicConfig(level=loglevel)
-
-        except FileNotFoundError as e:
-            logger.error('Unable to load configuration file: {}'.format(e))
-
-        return tmp_conf
+        logger.debug("Refreshed zones: {} added, {} changed, {} removed, {} configured".format(
+            counts['added'], counts['changed'], counts['removed'], len(self._domains)))
+        self.metrics.set('pdns_keyroller_zones', len(self._domains))
+        return counts
+
+    def _load_config(self, must_exist=False):
+        return load_config(self._configfile, must_exist=must_exist)
 
     def _get_actionable_domains(self):
         now = datetime.datetime.now()
         return [zone for zone, domainconf in self._domains.items() if
                 domainconf.next_action_datetime and domainconf.next_action_datetime <= now]
 
+    def reconcile(self):
+        """
+        Checks the state mirror (if enabled) against the API and reloads the zones that differ
+
+        :return: The zones that were out of date
+        :rtype: list(string)
+        """
+        if self._mirror is None:
+            return []
+        drifted = self._mirror.reconcile(self._api, zone_filter=self._owns)
+        if drifted:
+            self._domains = self._mirror.load(self._api, zone_filter=self._owns)
+            self._serials = {zone: serial for zone, serial in self._mirror.serials().items() if self._owns(zone)}
+        return drifted
+
     def update_config(self):
         """
-        Should be called when we want to update the config of a running instance (not implemented)
+        Re-reads the configuration file and applies the changes to the running instance. The zones are only reloaded
+        when the API endpoint or the state mirror changed, otherwise the loaded zones are kept as they are. Changing
+        the number of workers requires a restart.
 
-        :return:
+        :return: The settings that changed, as `section.setting`
+        :rtype: list(string)
         """
-        pass
+        try:
+            config = self._load_config(must_exist=True)
+        except Exception as e:
+            logger.error('Unable to reload the configuration, keeping the current one: {}'.format(e))
+            return []
+
+        changed = sorted('{}.{}'.format(section, k) for section, values in config.items()
+                         for k in set(values) | set(self._config[section])
+                         if values.get(k) != self._config[section].get(k))
+        if not changed:
+            logger.info('Configuration reloaded, nothing changed')
+            return []
+        self._config = config
+
+        loglevel = getattr(logging, config['keyroller']['loglevel'].upper(), logging.INFO)
+        logging.getLogger().setLevel(loglevel if isinstance(loglevel, int) else logging.INFO)
+        if 'keyroller.lease_duration' in changed:
+            self._setup_leases()
+        if 'keyroller.metrics_textfile' in changed or 'keyroller.metrics_listen' in changed:
+            self._setup_metrics()
+        if 'keyroller.workers' in changed:
+            logger.warning('Changing the number of workers requires a restart')
+
+        if any(setting.startswith('API.') for setting in changed):
+            self._api = PDNSApi(request_observer=self.metrics.observe_api_request, **config['API'])
+            if 'API.baseurl' in changed or 'API.server' in changed or 'API.version' in changed:
+                # Another server, nothing we know is valid anymore
+                self._setup_domains()
+            else:
+                for keyrollerdomain in self._domains.values():
+                    keyrollerdomain.api = self._api
+        if 'keyroller.state_mirror' in changed:
+            if self._mirror is not None:
+                self._mirror.close()
+            self._setup_domains()
+
+        logger.info('Configuration reloaded, changed: {}'.format(', '.join(changed)))
+        return changed
+
+    def request_reload(self):
+        """
+        Makes :meth:`serve` reload the configuration before its next run. Safe to call from a signal handler.
+        """
+        self._reload_requested = True
+        self._wakeup.set()
+
+    def stop(self):
+        """
+        Makes :meth:`serve` return after the current run. Safe to call from a signal handler.
+        """
+        self._stop_requested = True
+        self._wakeup.set()
+
+    def serve(self, interval=None):
+        """
+        Keeps running every ``interval`` seconds until :meth:`stop` is called. Before every run but the first, the zones
+        on the server are refreshed with :meth:`refresh_zones`, and the configuration is reloaded when
+        :meth:`request_reload` was called.
+
+        :param int interval: Seconds between two runs, defaults to ``keyroller.interval`` from the configuration
+        """
+        first = True
+        while not self._stop_requested:
+            try:
+                if not first:
+                    if self._reload_requested:
+                        self._reload_requested = False
+                        self.update_config()
+                    self.refresh_zones()
+                first = False
+                self.run()
+            except Exception as e:
+                logger.error("Unable to run: {}".format(e))
+            self._wakeup.wait(interval if interval is not None else int(self._config['keyroller']['interval'] or 60))
+            self._wakeup.clear()
+
+    @staticmethod
+    def _lag(keyrollerdomain, now):
+        """
+        :return: How many seconds ``keyrollerdomain`` is past its next action, or None when that is meaningless (e.g. a
+                 zone that was never rolled)
+        """
+        next_action = keyrollerdomain.next_action_datetime
+        if next_action is None or next_action <= datetime.datetime.fromtimestamp(0):
+            return None
+        return max((now - next_action).total_seconds(), 0)
+
+    def _owns(self, zone):
+        return self._shard is None or shard_of(zone, self._shards) == self._shard
+
+    def _action_done(self, keyrollerdomain, action, start):
+        duration = time.monotonic() - start
+        self.metrics.observe('pdns_keyroller_action_duration_seconds', duration, {'action': action})
+        self.metrics.set('pdns_keyroller_zone_action_duration_seconds', duration,
+                         {'zone': keyrollerdomain.zone, 'action': action})
+        return duration
+
+    def _process_domain(self, keyrollerdomain, now):
+        """
+        Performs the action that is due for ``keyrollerdomain``
+
+        :return: True if an action was taken, False if it failed
+        """
+        if keyrollerdomain.state.is_rolling:
+            try:
+                logger.info("Moving to step {} for {} roll".format(keyrollerdomain.current_step_name, keyrollerdomain.zone))
+                start = time.monotonic()
+                keyrollerdomain.step()
+                if self._mirror:
+                    self._mirror.update(keyrollerdomain)
+                logger.info("Step for {} took {:.3f}s".format(
+                    keyrollerdomain.zone, self._action_done(keyrollerdomain, 'step', start)))
+            except Exception as e:
+                logger.error("Unable to advance keyroll: {}".format(e))
+                return False
+        else:
+            next_ksk_roll = keyrollerdomain.next_ksk_roll()
+            next_zsk_roll = keyrollerdomain.next_zsk_roll()
+            if next_zsk_roll is not None and next_zsk_roll <= now:
+                try:
+                    logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "ZSK", keyrollerdomain.zone, keyrollerdomain.config.zsk_algo))
+                    start = time.monotonic()
+                    roll = PrePublishKeyRoll()
+                    roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'zsk', keyrollerdomain.config.zsk_algo)
+                    keyrollerdomain.state.current_roll = roll
+                    domainstate.to_api(keyrollerdomain.zone, keyrollerdomain.api, keyrollerdomain.state)
+                    if self._mirror:
+                        self._mirror.update(keyrollerdomain)
+                    logger.info("Starting the roll for {} took {:.3f}s".format(
+                        keyrollerdomain.zone, self._action_done(keyrollerdomain, 'initiate', start)))
+                except Exception as e:
+                    logger.error("Unable to start keyroll: {}".format(e))
+                    return False
+            elif next_ksk_roll is not None and next_ksk_roll <= now:
+                try:
+                    logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "KSK", keyrollerdomain.zone, keyrollerdomain.config.zsk_algo))
+                    start = time.monotonic()
+                    roll = PrePublishKeyRoll()
+                    roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'ksk', keyrollerdomain.config.ksk_algo)
+                    keyrollerdomain.state.current_roll = roll
+                    domainstate.to_api(keyrollerdomain.zone, keyrollerdomain.api, keyrollerdomain.state)
+                    if self._mirror:
+                        self._mirror.update(keyrollerdomain)
+                    logger.info("Starting the roll for {} took {:.3f}s".format(
+                        keyrollerdomain.zone, self._action_done(keyrollerdomain, 'initiate', start)))
+                except Exception as e:
+                    logger.error("Unable to start keyroll: {}".format(e))
+                    return False
+        return True
 
     def run(self):
+        """
+        Performs all actions that are due
+
+        :return: Counters for this run: the number of ``domains``, the number of ``actionable`` domains, and how many
+                 of those were ``processed``, ``failed`` or ``leased`` (skipped because another keyroller holds the
+                 lease)
+        :rtype: dict
+        """
+        start = time.monotonic()
         actionable_domains = self._get_actionable_domains()
         now = datetime.datetime.now()
         logger.debug("Found {} domain(s) ({} actionable)".format(len(self._domains), len(actionable_domains)))
 
+        lags = {}
+        for domain in actionable_domains:
+            lag = self._lag(self._domains[domain], now)
+            if lag is not None:
+                lags[domain] = lag
+                self.metrics.observe('pdns_keyroller_scheduler_lag_seconds', lag)
+        self.metrics.set('pdns_keyroller_scheduler_max_lag_seconds', max(lags.values(), default=0))
+        self.metrics.clear('pdns_keyroller_zone_action_duration_seconds')
+        self.metrics.clear('pdns_keyroller_zone_lag_seconds')
+
+        stats = {
+            'domains': len(self._domains),
+            'actionable': len(actionable_domains),
+            'processed': 0,
+            'failed': 0,
+            'leased': 0,
+        }
 
         if len(actionable_domains) > 0:
-            for domain in actionable_domains:
-                keyrollerdomain = self._domains[domain]
-                if keyrollerdomain.state.is_rolling:
-                    try:
-                        logger.info("Moving to step {} for {} roll".format(keyrollerdomain.current_step_name, keyrollerdomain.zone))
-                        keyrollerdomain.step()
-                    except Exception as e:
-                        logger.error("Unable to advance keyroll: {}".format(e))
-                else:
-                    next_ksk_roll = keyrollerdomain.next_ksk_roll()
-                    next_zsk_roll = keyrollerdomain.next_zsk_roll()
-                    if next_zsk_roll is not None and next_zsk_roll <= now:
-                        try:
-                            logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "ZSK", keyrollerdomain.zone, keyrollerdomain.config.zsk_algo))
-                            roll = PrePublishKeyRoll()
-                            roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'zsk', keyrollerdomain.config.zsk_algo)
-                            keyrollerdomain.state.current_roll = roll
-                            domainstate.to_api(keyrollerdomain.zone, keyrollerdomain.api, keyrollerdomain.state)
-                        except Exception as e:
-                            logger.error("Unable to start keyroll: {}".format(e))
-                    elif next_ksk_roll is not None and next_ksk_roll <= now:
+            # Leases are taken for a batch of zones at a time, so the settle time of the lease protocol is only paid
+            # once per batch, while the leases of the last zones of a batch are still far from expiring
+            batch_size = LEASE_BATCH_SIZE if self._lease_owner is not None else len(actionable_domains)
+            for offset in range(0, len(actionable_domains), batch_size):
+                batch = actionable_domains[offset:offset + batch_size]
+                tokens = {}
+                if self._lease_owner is not None:
+                    tokens, failed = lease.acquire_many(batch, self._api, self._lease_owner, self._lease_duration)
+                    for domain, e in failed.items():
+                        logger.error("Unable to lease {}: {}".format(domain, e))
+                        stats['failed'] += 1
+                for domain in batch:
+                    keyrollerdomain = self._domains[domain]
+                    if self._lease_owner is not None:
+                        if domain not in tokens:
+                            if domain not in failed:
+                                logger.info("Skipping {}, it is leased by another keyroller".format(domain))
+                                stats['leased'] += 1
+                            continue
                         try:
-                            logger.info("Starting {} {} keyroll for {} ({} algo)".format("pre-publish", "KSK", keyrollerdomain.zone, keyrollerdomain.config.zsk_algo))
-                            roll = PrePublishKeyRoll()
-                            roll.initiate(keyrollerdomain.zone, keyrollerdomain.api, 'ksk', keyrollerdomain.config.ksk_algo)
-                            keyrollerdomain.state.current_roll = roll
-                            domainstate.to_api(keyrollerdomain.zone, keyrollerdomain.api, keyrollerdomain.state)
+                            # The other keyroller might have changed the state while it held the lease
+                            keyrollerdomain = pdnskeyroller.keyrollerdomain.KeyrollerDomain(
+                                domain, self._api, config=keyrollerdomain.config)
+                            self._domains[domain] = keyrollerdomain
                         except Exception as e:
-                            logger.error("Unable to start keyroll: {}".format(e))
+                            logger.error("Unable to reload {}: {}".format(domain, e))
+                            stats['failed'] += 1
+                            self._release_lease(domain, tokens[domain])
+                            continue
+                    try:
+                        if keyrollerdomain.next_action_datetime is not None and keyrollerdomain.next_action_datetime <= now:
+                            if self._process_domain(keyrollerdomain, now):
+                                stats['processed'] += 1
+                                lags.pop(domain, None)
+                            else:
+                                stats['failed'] += 1
+                        else:
+                            lags.pop(domain, None)
+                    finally:
+                        if self._lease_owner is not None:
+                            self._release_lease(domain, tokens[domain])
         else:
             logger.info("No action taken")
+
+        # Zones that are (still) late, e.g. because they failed or another keyroller holds their lease
+        for domain, lag in lags.items():
+            self.metrics.set('pdns_keyroller_zone_lag_seconds', lag, {'zone': domain})
+        self.metrics.set('pdns_keyroller_zones', stats['domains'])
+        self.metrics.set('pdns_keyroller_zones_due', stats['actionable'])
+        self.metrics.set('pdns_keyroller_zones_processed', stats['processed'])
+        self.metrics.set('pdns_keyroller_zones_failed', stats['failed'])
+        self.metrics.set('pdns_keyroller_zones_leased', stats['leased'])
+        self.metrics.set('pdns_keyroller_run_duration_seconds', time.monotonic() - start)
+        self.metrics.set('pdns_keyroller_last_run_timestamp_seconds', time.time())
+        self.write_metrics()
+
+        return stats
+
+    def _release_lease(self, domain, token):
+        try:
+            lease.release(domain, self._api, self._lease_owner, token)
+        except Exception as e:
+            logger.warning("Unable to release the lease on {}: {}".format(domain, e))
+
+    def write_metrics(self):
+        """
+        Writes the metrics to the configured textfile, if any
+        """
+        if self._metrics_textfile is None:
+            return
+        try:
+            self.metrics.write_textfile(self._metrics_textfile)
+        except Exception as e:
+            logger.error("Unable to write the metrics to {}: {}".format(self._metrics_textfile, e))
@@ -28,8 +28,19 @@ def from_api(zone, api):
     if len(metadata.metadata) > 1:
         raise Exception("More than one {} Domain Metadata found for {}!".format(PDNSKEYROLLER_CONFIG_metadata_kind,
                                                                                 zone))
+    return from_json(metadata.metadata[0])
+
+def from_json(content):
+    """
+    Decode a keyroller configuration, as stored in the domain metadata
+
+    :param string content: The JSON representation of the configuration
+    :return: The configuration
+    :rtype: :class:`DomainConfig`
+    :raises: ValueError if the JSON cannot be unpacked
+    """
     try:
-        state = json_tricks.loads(metadata.metadata[0])
+        state = json_tricks.loads(content)
     except Exception as e:
         raise ValueError(e)
 
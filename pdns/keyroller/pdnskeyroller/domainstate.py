@@ -30,21 +30,38 @@ def from_api(zone, api):
     if len(tmp_state) > 1:
         raise Exception('More than one {} metadata found!'.format(PDNSKEYROLLER_STATE_metadata_kind))
 
+    return from_json(tmp_state[0])
+
+
+def from_json(content):
+    """
+    Decode a keyroller state, as stored in the domain metadata
+
+    :param string content: The JSON representation of the state
+    :return: The decoded state
+    :rtype: DomainState
+    :raises: ValueError if the JSON cannot be unpacked
+    """
     try:
-        state = json_tricks.loads(tmp_state[0])
+        state = json_tricks.loads(content)
     except Exception as e:
         raise ValueError(e)
 
-    return DomainState(**state)
+    ret = DomainState(**state)
+    ret.persisted = content
+    return ret
 
 
 def to_api(zone, api, state):
     """
+    Stores the keyroller state in the domain metadata. Nothing is written when the state is the same as what was read
+    from (or last written to) the API, e.g. when a step had nothing to do yet.
 
-    :param zone:
-    :param api:
-    :param state:
-    :return:
+    :param string zone: The zone to store the state for
+    :param pdnsapi.api.PDNSApi api: the API endpoint to use
+    :param DomainState state: The state to store
+    :return: True if the state was written, False if it was unchanged
+    :rtype: bool
     """
     if not isinstance(api, pdnsapi.api.PDNSApi):
         raise Exception('api must be a PDNSApi instance, not a {}'.format(type(api)))
@@ -55,7 +72,14 @@ def to_api(zone, api, state):
         state.set_last_roll_date(state.current_roll.keytype, state.current_roll.step_datetimes[-1])
         state.current_roll = KeyRoll()
 
-    api.set_zone_metadata(zone, PDNSKEYROLLER_STATE_metadata_kind, str(state))
+    content = str(state)
+    if content == state.persisted:
+        logger.debug('{}: state unchanged, not writing it'.format(zone))
+        return False
+
+    api.set_zone_metadata(zone, PDNSKEYROLLER_STATE_metadata_kind, content)
+    state.persisted = content
+    return True
 
 
 class DomainState:
@@ -63,6 +87,7 @@ class DomainState:
     __last_ksk_roll_datetime = None
     __current_roll = None
     __version = DOMAINSTATE_VERSION
+    __persisted = None
 
     def __init__(self, version=DOMAINSTATE_VERSION, last_ksk_roll_datetime=datetime.min,
                  last_zsk_roll_datetime=datetime.min, current_roll=KeyRoll(), **kwargs):
@@ -114,6 +139,17 @@ class DomainState:
             raise Exception('Roll is not a KeyRoll')
         self.__current_roll = val
 
+    @property
+    def persisted(self):
+        """
+        The JSON representation of this state as it is stored in the domain metadata, None when unknown
+        """
+        return self.__persisted
+
+    @persisted.setter
+    def persisted(self, val):
+        self.__persisted = val
+
     @property
     def version(self):
         return self.__version
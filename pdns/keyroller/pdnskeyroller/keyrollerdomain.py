@@ -1,5 +1,6 @@
 from pdnsapi.api import PDNSApi
 import logging
+from pdnskeyroller import PDNSKEYROLLER_CONFIG_metadata_kind, PDNSKEYROLLER_STATE_metadata_kind
 import pdnskeyroller.domainconfig
 import pdnskeyroller.domainstate
 from pytimeparse.timeparse import timeparse
@@ -7,6 +8,51 @@ import datetime
 
 logger = logging.getLogger(__name__)
 
+
+def fetch_metadata(zone, api):
+    """
+    Retrieves the keyroller config and state of ``zone`` from the API with a single call
+
+    :param string zone: The zone
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :return: a tuple with the JSON representation of the config and state, each None if not set
+    :rtype: tuple(string, string)
+    """
+    config = None
+    state = None
+    for md in api.get_zone_metadata(zone):
+        if md.kind == PDNSKEYROLLER_CONFIG_metadata_kind and md.metadata:
+            if len(md.metadata) > 1:
+                raise Exception("More than one {} Domain Metadata found for {}!".format(
+                    PDNSKEYROLLER_CONFIG_metadata_kind, zone))
+            config = md.metadata[0]
+        elif md.kind == PDNSKEYROLLER_STATE_metadata_kind and md.metadata:
+            if len(md.metadata) > 1:
+                raise Exception('More than one {} metadata found!'.format(PDNSKEYROLLER_STATE_metadata_kind))
+            state = md.metadata[0]
+    return config, state
+
+
+def from_json(zone, api, config, state):
+    """
+    Builds a :class:`KeyrollerDomain` from the JSON representations of its config and state, as returned by
+    :func:`fetch_metadata`
+
+    :param string zone: The zone
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param string config: The JSON representation of the config
+    :param string state: The JSON representation of the state, None when the zone was never rolled
+    :return: The domain, or None if ``config`` is None
+    :rtype: KeyrollerDomain
+    """
+    if config is None:
+        return None
+    return KeyrollerDomain(
+        zone, api,
+        config=pdnskeyroller.domainconfig.from_json(config),
+        state=pdnskeyroller.domainstate.from_json(state) if state is not None else
+        pdnskeyroller.domainstate.DomainState())
+
 class KeyrollerDomain:
     def __init__(self, zone, api, config=None, state=None):
         if not isinstance(api, PDNSApi):
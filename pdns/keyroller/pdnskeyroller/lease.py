@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import json_tricks.nonp as json_tricks
+from pdnskeyroller import PDNSKEYROLLER_LEASE_metadata_kind
+from pdnskeyroller.util import validate_api
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(zone, shards):
+    """
+    Returns the shard ``zone`` belongs to. Unlike :func:`hash`, this is stable across processes and hosts.
+
+    :param string zone: The zone
+    :param int shards: The total number of shards
+    :return: A number between 0 and ``shards`` - 1
+    :rtype: int
+    """
+    digest = hashlib.sha1(zone.lower().rstrip('.').encode()).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def default_owner(shard=None):
+    """
+    Returns a lease owner name that is unique for this process
+
+    :param int shard: The shard handled by this process, if any
+    :rtype: string
+    """
+    owner = '{}:{}'.format(socket.gethostname(), os.getpid())
+    if shard is not None:
+        owner += ':{}'.format(shard)
+    return owner
+
+
+# How long a keyroller waits after writing its leases before it checks that they are still its own
+DEFAULT_SETTLE = 1.0
+
+
+def _read(zone, api):
+    metadata = api.get_zone_metadata(zone, PDNSKEYROLLER_LEASE_metadata_kind).metadata
+    if not metadata:
+        return None
+    try:
+        return json_tricks.loads(metadata[0])
+    except Exception as e:
+        logger.warning('Ignoring unreadable lease for {}: {}'.format(zone, e))
+        return None
+
+
+def _held_by_other(current, owner, now):
+    return current and current.get('owner') != owner and datetime.fromtimestamp(current.get('expires', 0)) > now
+
+
+def acquire_many(zones, api, owner, duration, settle=DEFAULT_SETTLE):
+    """
+    Tries to take the lease on every zone in ``zones``, so no other keyroller (on this or another host) steps their
+    rolls at the same time. A lease is stored in the domain metadata and expires after ``duration`` seconds, so a
+    crashed keyroller does not block the zone forever.
+
+    The API has no conditional write, so this uses a timed protocol (Fischer's mutual exclusion) instead of a
+    compare-and-swap. For every zone that is not leased by someone else, our lease (with a unique token) is written,
+    and the zone is given up when reading the old lease and writing ours took longer than half of ``settle``. After
+    waiting ``settle`` seconds, a zone is ours if the lease still holds our token: anyone who wrote a lease later must
+    have read the old one after ours was in place, and backed off.
+
+    Zones that are given up keep the lease we wrote until it expires, as it might have replaced the lease of another
+    keyroller that is working on the zone.
+
+    :param list zones: The zones to lease
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param string owner: The name of the lease owner, see :func:`default_owner`
+    :param int duration: The number of seconds the lease is valid
+    :param float settle: The number of seconds to wait before checking the leases, longer than it can take for a
+                         lease that is written to become visible
+    :return: The zones for which we hold the lease, mapped to the lease token to pass to :func:`release`, and the
+             zones for which the API failed, mapped to the exception
+    :rtype: tuple(dict, dict)
+    """
+    validate_api(api)
+    written = {}
+    failed = {}
+    for zone in zones:
+        try:
+            start = time.monotonic()
+            now = datetime.now()
+            current = _read(zone, api)
+            if _held_by_other(current, owner, now):
+                logger.debug('{} is leased by {}'.format(zone, current.get('owner')))
+                continue
+
+            token = uuid.uuid4().hex
+            api.set_zone_metadata(zone, PDNSKEYROLLER_LEASE_metadata_kind, json_tricks.dumps({
+                'owner': owner,
+                'token': token,
+                'expires': (now + timedelta(seconds=duration)).timestamp(),
+            }))
+        except Exception as e:
+            failed[zone] = e
+            continue
+        if time.monotonic() - start > settle / 2:
+            logger.info('Giving up the lease on {}, writing it took too long'.format(zone))
+            continue
+        written[zone] = token
+
+    held = {}
+    if not written:
+        return held, failed
+    time.sleep(settle)
+
+    for zone, token in written.items():
+        try:
+            current = _read(zone, api)
+        except Exception as e:
+            failed[zone] = e
+            continue
+        if current is not None and current.get('token') == token:
+            held[zone] = token
+        else:
+            logger.debug('{} was leased by {} at the same time'.format(zone, current.get('owner') if current else None))
+    return held, failed
+
+
+def acquire(zone, api, owner, duration, settle=DEFAULT_SETTLE):
+    """
+    Tries to take the lease on ``zone``, see :func:`acquire_many`
+
+    :param string zone: The zone to lease
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param string owner: The name of the lease owner, see :func:`default_owner`
+    :param int duration: The number of seconds the lease is valid
+    :param float settle: See :func:`acquire_many`
+    :return: The lease token if we hold the lease, None if someone else does
+    :rtype: string
+    :raises: Exception when the API fails
+    """
+    held, failed = acquire_many([zone], api, owner, duration, settle)
+    if zone in failed:
+        raise failed[zone]
+    return held.get(zone)
+
+
+def release(zone, api, owner, token, settle=DEFAULT_SETTLE):
+    """
+    Gives up the lease on ``zone``, if we hold it.
+
+    A lease that expires within ``settle`` seconds is left to expire instead: someone else might take it over before
+    the removal arrives, and we would remove their lease instead of ours.
+
+    :param string zone: The leased zone
+    :param pdnsapi.api.PDNSApi api: The API endpoint to use
+    :param string owner: The name of the lease owner
+    :param string token: The token returned by :func:`acquire` or :func:`acquire_many`
+    :param float settle: See :func:`acquire_many`
+    :return: True if the lease was removed
+    :rtype: bool
+    """
+    validate_api(api)
+    current = _read(zone, api)
+    if not current or current.get('owner') != owner or current.get('token') != token:
+        return False
+    if datetime.fromtimestamp(current.get('expires', 0)) - datetime.now() < timedelta(seconds=settle):
+        logger.debug('Not releasing the lease on {}, it is about to expire'.format(zone))
+        return False
+    api.delete_zone_metadata(zone, PDNSKEYROLLER_LEASE_metadata_kind)
+    return True
@@ -0,0 +1,232 @@
+import bisect
+import http.server
+import logging
+import os
+import socketserver
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+API_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ACTION_DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+# From one second up to a day late
+LAG_BUCKETS = (1, 10, 60, 300, 900, 3600, 4 * 3600, 12 * 3600, 86400)
+
+# name: (type, help, histogram buckets)
+_metrics = {
+    'pdns_keyroller_api_requests_total': (
+        'counter', 'Requests to the PowerDNS API, by method, endpoint and status code', None),
+    'pdns_keyroller_api_request_duration_seconds': (
+        'histogram', 'Duration of the requests to the PowerDNS API', API_LATENCY_BUCKETS),
+    'pdns_keyroller_action_duration_seconds': (
+        'histogram', 'Duration of starting a roll (initiate) or moving it to the next step (step)',
+        ACTION_DURATION_BUCKETS),
+    'pdns_keyroller_zone_action_duration_seconds': (
+        'gauge', 'Duration of the last action taken for a zone during the last run', None),
+    'pdns_keyroller_scheduler_lag_seconds': (
+        'histogram', 'How late the due zones were, compared to their next action time, when the run started',
+        LAG_BUCKETS),
+    'pdns_keyroller_scheduler_max_lag_seconds': (
+        'gauge', 'How late the latest due zone was when the last run started', None),
+    'pdns_keyroller_zone_lag_seconds': (
+        'gauge', 'How late the zones that were due but not processed during the last run are', None),
+    'pdns_keyroller_zones': (
+        'gauge', 'Zones with a keyroller configuration', None),
+    'pdns_keyroller_zones_due': (
+        'gauge', 'Zones that had an action due during the last run', None),
+    'pdns_keyroller_zones_processed': (
+        'gauge', 'Zones for which an action was taken during the last run', None),
+    'pdns_keyroller_zones_failed': (
+        'gauge', 'Zones for which the action failed during the last run', None),
+    'pdns_keyroller_zones_leased': (
+        'gauge', 'Zones that were skipped during the last run because another keyroller held their lease', None),
+    'pdns_keyroller_load_duration_seconds': (
+        'gauge', 'Time it took to load the configuration and state of all zones', None),
+    'pdns_keyroller_run_duration_seconds': (
+        'gauge', 'Duration of the last run', None),
+    'pdns_keyroller_last_run_timestamp_seconds': (
+        'gauge', 'Time at which the last run finished', None),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v)) for k, v in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 2**53:
+        return str(int(value))
+    return repr(value)
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Collects the metrics of the keyroller and renders them in the Prometheus text exposition format. Metrics can be
+    written to a file for the node_exporter textfile collector (:meth:`write_textfile`) or served over HTTP
+    (:meth:`serve`).
+
+    All methods are thread safe.
+    """
+
+    def __init__(self, labels=None):
+        """
+        :param dict labels: Labels added to every metric, e.g. the shard of a worker
+        """
+        self._labels = tuple(sorted((labels or {}).items()))
+        self._lock = threading.Lock()
+        # name -> {labels tuple: value or _Histogram}
+        self._values = {name: {} for name in _metrics}
+
+    def _key(self, labels):
+        return self._labels + tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[name][key] = self._values[name].get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        with self._lock:
+            self._values[name][self._key(labels)] = value
+
+    def clear(self, name):
+        """
+        Removes all values of metric ``name``, e.g. per zone gauges that are only valid for one run
+        """
+        with self._lock:
+            self._values[name] = {}
+
+    def observe(self, name, value, labels=None):
+        key = self._key(labels)
+        with self._lock:
+            histogram = self._values[name].get(key)
+            if histogram is None:
+                histogram = self._values[name][key] = _Histogram(_metrics[name][2])
+            histogram.observe(value)
+
+    def observe_api_request(self, method, endpoint, status, duration):
+        """
+        Records a request to the API, use this as the ``request_observer`` of a :class:`pdnsapi.api.PDNSApi`
+        """
+        self.inc('pdns_keyroller_api_requests_total',
+                 {'method': method, 'endpoint': endpoint, 'code': status if status is not None else 'error'})
+        self.observe('pdns_keyroller_api_request_duration_seconds', duration,
+                     {'method': method, 'endpoint': endpoint})
+
+    def render(self):
+        """
+        :return: All metrics in the Prometheus text exposition format
+        :rtype: string
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, helptext, _) in _metrics.items():
+                values = self._values[name]
+                if not values:
+                    continue
+                lines.append('# HELP {} {}'.format(name, helptext))
+                lines.append('# TYPE {} {}'.format(name, kind))
+                for labels, value in sorted(values.items()):
+                    if kind != 'histogram':
+                        lines.append('{}{} {}'.format(name, _format_labels(labels), _format_value(value)))
+                        continue
+                    cumulative = 0
+                    for le, count in zip(value.buckets + (float('inf'),), value.counts + [value.count]):
+                        cumulative = count if le == float('inf') else cumulative + count
+                        lines.append('{}_bucket{} {}'.format(
+                            name, _format_labels(labels + (('le', _format_value(float(le))),)), cumulative))
+                    lines.append('{}_sum{} {}'.format(name, _format_labels(labels), _format_value(value.sum)))
+                    lines.append('{}_count{} {}'.format(name, _format_labels(labels), value.count))
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """
+        Atomically replaces ``path`` with the current metrics, so the textfile collector never reads a partial file
+
+        :param string path: The file to write, should end in `.prom` for the node_exporter
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.pdns-keyroller-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.render())
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def serve(self, address):
+        """
+        Serves the metrics over HTTP on ``/metrics`` from a background thread
+
+        :param string address: The address to listen on as `host:port`, e.g. `127.0.0.1:9853`
+        :return: The server, call its ``shutdown()`` method to stop it
+        :rtype: http.server.HTTPServer
+        """
+        host, _, port = address.rpartition(':')
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                payload = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logger.debug('Metrics request from {}: {}'.format(self.address_string(), format % args))
+
+        class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+            daemon_threads = True
+
+        server = Server((host.strip('[]') or '0.0.0.0', int(port)), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info('Serving metrics on http://{}/metrics'.format(address))
+        return server
+
+
+def textfile_path(path, shard=None):
+    """
+    Returns the textfile to write the metrics of ``shard`` to, so workers do not overwrite each other's metrics
+
+    :param string path: The configured textfile, e.g. `/var/lib/node_exporter/pdns-keyroller.prom`
+    :param int shard: The shard of the worker, or None
+    :return: e.g. `/var/lib/node_exporter/pdns-keyroller.3.prom` for shard 3
+    :rtype: string
+    """
+    if shard is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return '{}.{}{}'.format(root, shard, ext)
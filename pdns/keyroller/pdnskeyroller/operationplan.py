@@ -0,0 +1,104 @@
+import logging
+from pdnskeyroller.util import validate_api
+
+logger = logging.getLogger(__name__)
+
+
+class OperationPlan:
+    """
+    Collects all the changes the keyroller wants to make to a zone during one run, so they can be applied with as few
+    API calls as possible. Most notably, the SOA serial is bumped at most once, and the zone contents are fetched at
+    most once (to find both the SOA and the highest TTL).
+    """
+
+    def __init__(self, zone):
+        """
+        :param string zone: The zone the operations are for
+        """
+        self.zone = zone
+        self._key_states = {}
+        self._key_deletions = []
+        self._bump_soa = False
+        self._need_highest_ttl = False
+
+    def set_key_active(self, keyid, active=True):
+        """
+        Schedule a change of the `active` flag of key ``keyid``. Changes are applied in the order they were added.
+
+        :param int keyid: The id of the key
+        :param bool active: The new value for the `active` flag
+        """
+        self._key_states.pop(keyid, None)
+        self._key_states[keyid] = active
+
+    def delete_key(self, keyid):
+        """
+        Schedule the removal of key ``keyid``
+
+        :param int keyid: The id of the key
+        """
+        self._key_states.pop(keyid, None)
+        if keyid not in self._key_deletions:
+            self._key_deletions.append(keyid)
+
+    def bump_soa(self):
+        """
+        Schedule a SOA serial bump. Calling this more than once still results in a single bump.
+        """
+        self._bump_soa = True
+
+    def need_highest_ttl(self):
+        """
+        Request the highest TTL in the zone to be determined when the plan is executed
+        """
+        self._need_highest_ttl = True
+
+    @property
+    def empty(self):
+        """
+        True when nothing was scheduled, executing the plan then makes no API calls
+        """
+        return not (self._key_states or self._key_deletions or self._bump_soa or self._need_highest_ttl)
+
+    def execute(self, api):
+        """
+        Applies all scheduled operations
+
+        :param pdnsapi.api.PDNSApi api: The API endpoint to use
+        :return: The highest TTL found in the zone, or None when it was not requested
+        :raises: Exception when an operation fails
+        """
+        validate_api(api)
+        if self.empty:
+            return None
+
+        for keyid, active in self._key_states.items():
+            api.set_cryptokey_active(self.zone, keyid, active=active, refetch=False)
+        for keyid in self._key_deletions:
+            api.delete_cryptokey(self.zone, keyid)
+
+        httl = None
+        if self._bump_soa or self._need_highest_ttl:
+            soa = None
+            httl = 0
+            # A single pass over the zone gives us both the SOA and the highest TTL
+            for rrset in api.iter_zone(self.zone):
+                httl = max(rrset.ttl, httl)
+                if soa is None and rrset.rtype == 'SOA':
+                    soa = rrset
+
+            if self._bump_soa:
+                if soa is None:
+                    raise Exception('No SOA record found for zone {}'.format(self.zone))
+                api.bump_soa_rrset(self.zone, soa)
+
+        logger.debug('{}: executed plan with {} key change(s), {} key removal(s){}'.format(
+            self.zone, len(self._key_states), len(self._key_deletions), ' and a SOA bump' if self._bump_soa else ''))
+
+        want_ttl = self._need_highest_ttl
+        self._key_states = {}
+        self._key_deletions = []
+        self._bump_soa = False
+        self._need_highest_ttl = False
+
+        return httl if want_ttl else None
@@ -3,6 +3,7 @@ import json_tricks.nonp as json_tricks
 from pdnskeyroller.util import (get_keys_of_type, DNSKEY_ALGO_TO_MNEMONIC, DNSKEY_MNEMONIC_TO_ALGO, validate_api)
 from datetime import datetime, timedelta
 from pdnskeyroller.keyroll import KeyRoll
+from pdnskeyroller.operationplan import OperationPlan
 
 _step_to_name = {
     0: 'initial',
@@ -65,19 +66,12 @@ class PrePublishKeyRoll(KeyRoll):
         self.algo = algo
         self.old_keyids = [k.id for k in current_keys if k.algo == algo and k.keytype == keytype]
         self.new_keyid = new_key.id
-        httl = self._get_highest_ttl(zone, api)
-        self.current_step_datetime = datetime.now() + timedelta(seconds=httl)
-
-        api.bump_soa(zone);
-
-    def _get_highest_ttl(self, zone, api, zoneobject=None):
-        if zoneobject is None:
-            zoneobject = api.get_zone(zone)
-        httl = 0
-        for rrset in zoneobject.rrsets:
-            httl = max(rrset.ttl, httl)
 
-        return httl
+        plan = OperationPlan(zone)
+        plan.bump_soa()
+        plan.need_highest_ttl()
+        httl = plan.execute(api)
+        self.current_step_datetime = datetime.now() + timedelta(seconds=httl)
 
     def is_waiting_ds(self):
         return self.started and self.keytype == "ksk" and self.current_step == 1
@@ -102,16 +96,19 @@ class PrePublishKeyRoll(KeyRoll):
         if self.current_step_datetime > datetime.now():
             return
 
+        # All changes of this step are collected here and applied at once
+        plan = OperationPlan(zone)
+
         if self.current_step == 1:
             if self.keytype == "zsk":
                 # activate the new keys and deactivate the old ones
-                api.set_cryptokey_active(zone, self.new_keyid, active=True)
+                plan.set_key_active(self.new_keyid, active=True)
                 for keyid in self.old_keyids:
-                    api.set_cryptokey_active(zone, keyid, active=False)
-
-                api.bump_soa(zone);
+                    plan.set_key_active(keyid, active=False)
+                plan.bump_soa()
+                plan.need_highest_ttl()
 
-                httl = self._get_highest_ttl(zone, api)
+                httl = plan.execute(api)
                 self.current_step_datetime = datetime.now() + timedelta(seconds=httl)
                 self.step_datetimes.append(datetime.now())
                 self.current_step = 2
@@ -126,8 +123,9 @@ class PrePublishKeyRoll(KeyRoll):
             if self.keytype == "zsk":
                 # remove the old keys
                 for keyid in self.old_keyids:
-                    api.delete_cryptokey(zone, keyid)
-                api.bump_soa(zone);
+                    plan.delete_key(keyid)
+                plan.bump_soa()
+                plan.execute(api)
                 # rollover is finished
                 self.complete = True
                 self.step_datetimes.append(datetime.now())
@@ -137,8 +135,9 @@ class PrePublishKeyRoll(KeyRoll):
             if self.keytype == "ksk":
                 # remove the old keys
                 for keyid in self.old_keyids:
-                    api.delete_cryptokey(zone, keyid)
-                api.bump_soa(zone);
+                    plan.delete_key(keyid)
+                plan.bump_soa()
+                plan.execute(api)
                 # rollover is finished
                 self.complete = True
                 self.step_datetimes.append(datetime.now())
@@ -0,0 +1,208 @@
+import datetime
+import logging
+import sqlite3
+
+import pdnskeyroller.keyrollerdomain
+from pdnskeyroller.util import validate_api
+
+logger = logging.getLogger(__name__)
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS zones (
+  zone         TEXT PRIMARY KEY,
+  serial       INTEGER DEFAULT NULL,
+  config       TEXT DEFAULT NULL,
+  state        TEXT DEFAULT NULL,
+  next_action  REAL DEFAULT NULL
+);
+CREATE INDEX IF NOT EXISTS next_action_index ON zones(next_action);
+'''
+
+
+def _timestamp(dt):
+    if dt is None:
+        return None
+    try:
+        return dt.timestamp()
+    except (OverflowError, ValueError, OSError):
+        # e.g. datetime.min plus a roll frequency, this zone is due
+        return 0
+
+
+class StateMirror:
+    """
+    A local SQLite copy of the keyroller configuration and state of every zone, together with the time the next
+    action is due.
+
+    Zones are only re-read from the API when their serial changed since they were mirrored, or when their state was
+    changed by the keyroller (see :meth:`update`). Changes to the metadata that do not change the serial are picked up
+    by :meth:`reconcile`.
+    """
+
+    def __init__(self, path):
+        """
+        :param string path: The path to the SQLite database, created if it does not exist
+        """
+        self.path = path
+        self._db = sqlite3.connect(path)
+        # Several keyroller workers can share the mirror
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_schema)
+
+    def _store(self, zone, serial, config, state, next_action):
+        self._db.execute('INSERT OR REPLACE INTO zones (zone, serial, config, state, next_action) '
+                         'VALUES (:zone, :serial, :config, :state, :next_action)',
+                         {'zone': zone, 'serial': serial, 'config': config, 'state': state,
+                          'next_action': next_action})
+
+    def load(self, api, zone_filter=None):
+        """
+        Returns the :class:`KeyrollerDomain <pdnskeyroller.keyrollerdomain.KeyrollerDomain>` for every configured zone
+        on the server. Zones that are unchanged since the last call are built from the mirror, without any API calls.
+        Zones that no longer exist are removed from the mirror.
+
+        :param pdnsapi.api.PDNSApi api: The API endpoint to use
+        :param zone_filter: An optional callable that gets a zone name, only zones for which it returns True are loaded
+        :return: The configured zones
+        :rtype: dict(string, pdnskeyroller.keyrollerdomain.KeyrollerDomain)
+        """
+        validate_api(api)
+        known = {row[0]: row[1:] for row in self._db.execute('SELECT zone, serial, config, state FROM zones')}
+        domains = {}
+        refreshed = 0
+        for zone in api.get_zones():
+            serial = getattr(zone, 'serial', None)
+            row = known.pop(zone.id, None)
+            if zone_filter is not None and not zone_filter(zone.id):
+                continue
+            try:
+                if row is None or row[0] is None or row[0] != serial:
+                    config, state = pdnskeyroller.keyrollerdomain.fetch_metadata(zone.id, api)
+                    refreshed += 1
+                else:
+                    config, state = row[1], row[2]
+                domain = pdnskeyroller.keyrollerdomain.from_json(zone.id, api, config, state)
+                if row is None or row[0] != serial:
+                    self._store(zone.id, serial, config, state,
+                                _timestamp(domain.next_action_datetime) if domain else None)
+            except Exception as e:
+                logger.error("Unable to load informations for zone {}: {}".format(zone.id, e))
+                continue
+            if domain is not None:
+                domains[zone.id] = domain
+
+        for zone in known:
+            logger.debug("Removing zone {} from the state mirror".format(zone))
+            self._db.execute('DELETE FROM zones WHERE zone = ?', (zone,))
+        self._db.commit()
+
+        logger.debug("Loaded {} configured zone(s) from the state mirror, {} refreshed from the API".format(
+            len(domains), refreshed))
+        return domains
+
+    def update(self, keyrollerdomain):
+        """
+        Stores the current config and state of a zone after the keyroller changed it. As the serial of the zone
+        probably changed as well, the zone will be refreshed from the API by the next :meth:`load`.
+
+        :param pdnskeyroller.keyrollerdomain.KeyrollerDomain keyrollerdomain: The zone to store
+        """
+        self._store(keyrollerdomain.zone, None, str(keyrollerdomain.config), str(keyrollerdomain.state),
+                    _timestamp(keyrollerdomain.next_action_datetime))
+        self._db.commit()
+
+    def store(self, zone, serial, config, state, keyrollerdomain):
+        """
+        Stores the config and state of a zone, as read from the API (see
+        :func:`pdnskeyroller.keyrollerdomain.fetch_metadata`) when the zone had serial ``serial``
+
+        :param string zone: The zone
+        :param int serial: The serial of the zone
+        :param string config: The JSON representation of the config
+        :param string state: The JSON representation of the state
+        :param pdnskeyroller.keyrollerdomain.KeyrollerDomain keyrollerdomain: The domain built from them, None when the
+                                                                               zone is not configured
+        """
+        self._store(zone, serial, config, state,
+                    _timestamp(keyrollerdomain.next_action_datetime) if keyrollerdomain else None)
+        self._db.commit()
+
+    def remove(self, zone):
+        """
+        Removes ``zone`` from the mirror
+
+        :param string zone: The zone
+        """
+        self._db.execute('DELETE FROM zones WHERE zone = ?', (zone,))
+        self._db.commit()
+
+    def serials(self):
+        """
+        :return: The serial of every mirrored zone, None for the zones that have to be refreshed from the API
+        :rtype: dict(string, int)
+        """
+        return {row[0]: row[1] for row in self._db.execute('SELECT zone, serial FROM zones')}
+
+    def invalidate(self, zone):
+        """
+        Forces ``zone`` to be refreshed from the API by the next :meth:`load`
+
+        :param string zone: The zone
+        """
+        self._db.execute('UPDATE zones SET serial = NULL WHERE zone = ?', (zone,))
+        self._db.commit()
+
+    def due_zones(self, before=None):
+        """
+        Lists the mirrored zones that have an action due
+
+        :param datetime.datetime before: List the zones with an action due before this moment, defaults to now
+        :return: The zones, the first one due first
+        :rtype: list(string)
+        """
+        if before is None:
+            before = datetime.datetime.now()
+        cur = self._db.execute('SELECT zone FROM zones WHERE next_action <= ? ORDER BY next_action',
+                               (_timestamp(before),))
+        return [row[0] for row in cur.fetchall()]
+
+    def reconcile(self, api, zone_filter=None):
+        """
+        Compares the mirror with the config and state of all zones in the API, and updates the mirror where they
+        differ.
+
+        :param pdnsapi.api.PDNSApi api: The API endpoint to use
+        :param zone_filter: An optional callable that gets a zone name, only zones for which it returns True are checked
+        :return: The zones for which the mirror was out of date
+        :rtype: list(string)
+        """
+        validate_api(api)
+        known = {row[0]: row[1:] for row in self._db.execute('SELECT zone, config, state FROM zones')}
+        drifted = []
+        for zone in api.get_zones():
+            row = known.pop(zone.id, (None, None))
+            if zone_filter is not None and not zone_filter(zone.id):
+                continue
+            try:
+                config, state = pdnskeyroller.keyrollerdomain.fetch_metadata(zone.id, api)
+                if (config, state) == tuple(row):
+                    continue
+                domain = pdnskeyroller.keyrollerdomain.from_json(zone.id, api, config, state)
+            except Exception as e:
+                logger.error("Unable to reconcile zone {}: {}".format(zone.id, e))
+                continue
+            logger.warning("State mirror for zone {} differs from the API, updating".format(zone.id))
+            drifted.append(zone.id)
+            self._store(zone.id, getattr(zone, 'serial', None), config, state,
+                        _timestamp(domain.next_action_datetime) if domain else None)
+
+        for zone in known:
+            logger.warning("Zone {} is in the state mirror but not in the API, removing".format(zone))
+            drifted.append(zone)
+            self._db.execute('DELETE FROM zones WHERE zone = ?', (zone,))
+        self._db.commit()
+
+        return drifted
+
+    def close(self):
+        self._db.close()
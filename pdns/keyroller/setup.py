@@ -50,7 +50,7 @@ setup(
     packages = find_packages(),
     install_requires=install_reqs,
     include_package_data = True,
-    scripts=['pdns-keyroller.py', 'pdns-keyroller-ctl.py'],
+    scripts=['pdns-keyroller.py', 'pdns-keyroller-ctl.py', 'pdns-zone-sync.py', 'pdns-zone-bulk.py'],
     long_description=read('README.md'),
     classifiers=[],
 )
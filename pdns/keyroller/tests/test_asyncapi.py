@@ -0,0 +1,351 @@
+"""
+Checks that :class:`pdnsapi.asyncapi.AsyncPDNSApi` behaves like :class:`pdnsapi.api.PDNSApi`, using the mock API from
+the benchmarks as a stub server.
+
+Mutating calls are made with the blocking client on one zone and with the asyncio client on another, identical, zone.
+Afterwards, both zones must look the same.
+"""
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+KEYROLLER_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, KEYROLLER_DIR)
+sys.path.insert(0, os.path.join(KEYROLLER_DIR, 'benchmarks'))
+
+from mockapi import MockBackend, MockServer, zone_name  # noqa: E402
+from pdnsapi.api import PDNSApi  # noqa: E402
+from pdnsapi.asyncapi import AsyncPDNSApi  # noqa: E402
+
+APIKEY = 'secret'
+
+
+def key_fields(key):
+    return (key.id, key.active, key.keytype, key.flags, key.algo, key.dnskey)
+
+
+def rrset_fields(rrset, zone):
+    return (rrset.name.replace(zone, ''), rrset.rtype, rrset.ttl,
+            tuple((r.content.replace(zone, ''), r.disabled) for r in rrset.records))
+
+
+class TestAsyncPDNSApiParity(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockServer(('127.0.0.1', 0), MockBackend(zones=20, records=5,
+                                                              metadata={'SOA-EDIT-API': ['DEFAULT']}),
+                                apikey=APIKEY)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.api = PDNSApi(APIKEY, baseurl=self.server.baseurl)
+
+    def run_async(self, func, *args, **kwargs):
+        async def runner():
+            async with AsyncPDNSApi(APIKEY, baseurl=self.server.baseurl, max_concurrency=4) as api:
+                return await getattr(api, func)(*args, **kwargs)
+        return asyncio.run(runner())
+
+    def assertSameZone(self, zone_a, zone_b):
+        rrsets_a = sorted(rrset_fields(r, zone_a) for r in self.api.get_zone(zone_a).rrsets)
+        rrsets_b = sorted(rrset_fields(r, zone_b) for r in self.api.get_zone(zone_b).rrsets)
+        self.assertEqual(rrsets_a, rrsets_b)
+        self.assertEqual([key_fields(k) for k in self.api.get_cryptokeys(zone_a)],
+                         [key_fields(k) for k in self.api.get_cryptokeys(zone_b)])
+        self.assertEqual([(m.kind, m.metadata) for m in self.api.get_zone_metadata(zone_a)],
+                         [(m.kind, m.metadata) for m in self.api.get_zone_metadata(zone_b)])
+
+    def testGetZones(self):
+        sync = self.api.get_zones()
+        aio = self.run_async('get_zones')
+        self.assertEqual([(z.id, z.serial) for z in sync], [(z.id, z.serial) for z in aio])
+
+    def testGetZone(self):
+        zone = zone_name(0)
+        sync = self.api.get_zone(zone)
+        aio = self.run_async('get_zone', zone)
+        self.assertEqual([rrset_fields(r, zone) for r in sync.rrsets], [rrset_fields(r, zone) for r in aio.rrsets])
+
+    def testGetCryptokeys(self):
+        zone = zone_name(0)
+        self.assertEqual([key_fields(k) for k in self.api.get_cryptokeys(zone)],
+                         [key_fields(k) for k in self.run_async('get_cryptokeys', zone)])
+        self.assertEqual(key_fields(self.api.get_cryptokey(zone, 2)),
+                         key_fields(self.run_async('get_cryptokey', zone, 2)))
+
+    def testGetMetadata(self):
+        zone = zone_name(0)
+        self.assertEqual([(m.kind, m.metadata) for m in self.api.get_zone_metadata(zone)],
+                         [(m.kind, m.metadata) for m in self.run_async('get_zone_metadata', zone)])
+        sync = self.api.get_zone_metadata(zone, 'SOA-EDIT-API')
+        aio = self.run_async('get_zone_metadata', zone, 'SOA-EDIT-API')
+        self.assertEqual((sync.kind, sync.metadata), (aio.kind, aio.metadata))
+
+    def testKeyManagement(self):
+        zone_a, zone_b = zone_name(1), zone_name(2)
+        sync = self.api.add_cryptokey(zone_a, 'zsk', active=False, algo='ECDSAP256')
+        aio = self.run_async('add_cryptokey', zone_b, 'zsk', active=False, algo='ECDSAP256')
+        self.assertEqual(key_fields(sync), key_fields(aio))
+
+        self.assertEqual(key_fields(self.api.set_cryptokey_active(zone_a, sync.id, active=True)),
+                         key_fields(self.run_async('set_cryptokey_active', zone_b, aio.id, active=True)))
+        self.assertIsNone(self.run_async('set_cryptokey_active', zone_b, 2, active=False, refetch=False))
+        self.api.set_cryptokey_active(zone_a, 2, active=False, refetch=False)
+        self.assertEqual(key_fields(self.api.unpublish_cryptokey(zone_a, 2)),
+                         key_fields(self.run_async('unpublish_cryptokey', zone_b, 2)))
+
+        self.api.delete_cryptokey(zone_a, 2)
+        self.run_async('delete_cryptokey', zone_b, 2)
+        self.assertSameZone(zone_a, zone_b)
+
+    def testMetadataManagement(self):
+        zone_a, zone_b = zone_name(3), zone_name(4)
+        sync = self.api.set_zone_metadata(zone_a, 'X-TEST', ['one', 'two'])
+        aio = self.run_async('set_zone_metadata', zone_b, 'X-TEST', ['one', 'two'])
+        self.assertEqual((sync.kind, sync.metadata), (aio.kind, aio.metadata))
+        self.assertSameZone(zone_a, zone_b)
+
+        self.api.delete_zone_metadata(zone_a, 'SOA-EDIT-API')
+        self.run_async('delete_zone_metadata', zone_b, 'SOA-EDIT-API')
+        self.assertSameZone(zone_a, zone_b)
+
+    def testBumpSoa(self):
+        zone_a, zone_b = zone_name(5), zone_name(6)
+        sync = self.api.bump_soa(zone_a)
+        aio = self.run_async('bump_soa', zone_b)
+        self.assertEqual(sync.serial, aio.serial)
+        self.assertEqual(sync.serial, 2)
+        self.api.bump_soa(zone_a, serial='2024010100')
+        self.run_async('bump_soa', zone_b, serial='2024010100')
+        self.assertSameZone(zone_a, zone_b)
+
+    def testPatchRRSets(self):
+        zone_a, zone_b = zone_name(7), zone_name(8)
+        for zone, client in ((zone_a, None), (zone_b, 'async')):
+            changes = [
+                {'name': 'host0.' + zone, 'type': 'A', 'changetype': 'DELETE'},
+                {'name': 'new.' + zone, 'type': 'TXT', 'ttl': 60, 'changetype': 'REPLACE',
+                 'records': [{'content': '"hello"', 'disabled': False}]},
+            ]
+            if client is None:
+                self.api.patch_rrsets(zone, changes)
+            else:
+                self.run_async('patch_rrsets', zone, changes)
+        self.assertSameZone(zone_a, zone_b)
+
+    def testErrors(self):
+        with self.assertRaises(ConnectionError) as sync:
+            self.api.get_zone('nonexistent.example.')
+        with self.assertRaises(ConnectionError) as aio:
+            self.run_async('get_zone', 'nonexistent.example.')
+        self.assertEqual(str(sync.exception), str(aio.exception))
+
+        async def unauthorized():
+            async with AsyncPDNSApi('wrong', baseurl=self.server.baseurl):
+                pass
+        with self.assertRaises(ConnectionError):
+            asyncio.run(unauthorized())
+
+        async def unreachable():
+            async with AsyncPDNSApi(APIKEY, baseurl='http://127.0.0.1:1'):
+                pass
+        with self.assertRaises(ConnectionError):
+            asyncio.run(unreachable())
+
+    def testConcurrency(self):
+        calls = []
+
+        async def runner():
+            async with AsyncPDNSApi(APIKEY, baseurl=self.server.baseurl, max_concurrency=4,
+                                    request_observer=lambda *args: calls.append(args)) as api:
+                zones = await api.get_zones()
+                return await asyncio.gather(*[api.get_cryptokeys(zone.id) for zone in zones])
+
+        self.assertEqual(len(asyncio.run(runner())), 20)
+        self.assertEqual(len(calls), 22)
+        self.assertEqual(calls[-1][:3], ('GET', '/zones/{zone}/cryptokeys', 200))
+
+
+class ScriptedServer:
+    """
+    An HTTP server that answers the n-th request on the c-th connection with ``script(c, n)``: the raw response, or
+    None to close the connection without answering. A response can also be a list of pieces, written one at a time so
+    the client reads them separately; a list ending with None closes the connection after the other pieces.
+    Responses that are not framed (by a Content-Length or chunks) or have ``Connection: close`` are ended by closing
+    the connection. ``connections`` has the methods of the requests per connection.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.connections = []
+        self.baseurl = None
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, '127.0.0.1', 0)
+        self.baseurl = 'http://127.0.0.1:{}'.format(self._server.sockets[0].getsockname()[1])
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        requests = []
+        self.connections.append(requests)
+        conn = len(self.connections) - 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b''):
+                        break
+                    k, _, v = line.decode().partition(':')
+                    if k.lower() == 'content-length':
+                        length = int(v)
+                await reader.readexactly(length)
+                requests.append(request_line.split()[0].decode())
+                response = self.script(conn, len(requests) - 1)
+                if response is None:
+                    return
+                pieces = response if isinstance(response, list) else [response]
+                for piece in pieces:
+                    if piece is None:
+                        return
+                    writer.write(piece)
+                    await writer.drain()
+                    if len(pieces) > 1:
+                        await asyncio.sleep(0.01)
+                head = b''.join(pieces).split(b'\r\n\r\n')[0].lower()
+                if (b'content-length' not in head and b'transfer-encoding: chunked' not in head) or \
+                        b'connection: close' in head:
+                    return
+        finally:
+            writer.close()
+
+
+OK = b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}'
+
+
+class TestAsyncPDNSApiTransport(unittest.TestCase):
+
+    def run_scripted(self, script, requests):
+        """
+        Opens the API against a :class:`ScriptedServer` and does ``requests``, a list of ``(uri, method, data)``
+
+        :return: The server, the results of the requests (or the exceptions they raised) and the API
+        """
+        server = ScriptedServer(script)
+        results = []
+
+        async def runner():
+            await server.start()
+            api = AsyncPDNSApi(APIKEY, baseurl=server.baseurl)
+            try:
+                await api.open()
+                for request in requests:
+                    try:
+                        results.append(await api._do_request(*request))
+                    except ConnectionError as e:
+                        results.append(e)
+                return api
+            finally:
+                await server.stop()
+
+        api = asyncio.run(runner())
+        return server, results, api
+
+    def testPostNotResentOnStaleConnection(self):
+        # The server drops the connection after reading the POST; it might have acted on it
+        server, results, _ = self.run_scripted(lambda conn, n: OK if (conn, n) == (0, 0) else None,
+                                               [('/zones', 'POST', {'name': 'example.com.'})])
+        self.assertIsInstance(results[0], ConnectionError)
+        self.assertEqual(server.connections, [['GET', 'POST']])
+
+    def testGetResentOnStaleConnection(self):
+        server, results, _ = self.run_scripted(lambda conn, n: OK if (conn, n) != (0, 1) else None,
+                                               [('/zones', 'GET', None)])
+        self.assertEqual(results, [(200, {})])
+        self.assertEqual(server.connections, [['GET', 'GET'], ['GET']])
+
+    def testUnframedResponseNotReused(self):
+        def script(conn, n):
+            if conn == 0:
+                # No Content-Length, the body ends when the connection is closed
+                return b'HTTP/1.1 200 OK\r\n\r\n{}'
+            # HTTP/1.0 without keep-alive, the server may close the connection at any time
+            return b'HTTP/1.0 200 OK\r\nContent-Length: 2\r\n\r\n{}'
+
+        server, results, api = self.run_scripted(script, [('/zones', 'POST', {'name': 'example.com.'})] * 2)
+        self.assertEqual(results, [(200, {}), (200, {})])
+        self.assertEqual(server.connections, [['GET'], ['POST'], ['POST']])
+        self.assertEqual(len(api._pool._idle), 0)
+
+    def testChunkedSplitAcrossReads(self):
+        body = json.dumps([{'id': 'example.com.'}]).encode()
+        # split inside the size line, the data, the CRLF after it and the trailers
+        chunked = [b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n',
+                   b'%x' % 5, b';ext=1\r\n', body[:2], body[2:5], b'\r', b'\n',
+                   b'%x\r\n' % (len(body) - 5), body[5:], b'\r\n',
+                   b'0\r\nX-Trailer: ', b'1\r\n', b'\r\n']
+        server, results, api = self.run_scripted(lambda conn, n: chunked if n == 1 else OK,
+                                                 [('/zones', 'GET', None), ('/zones', 'GET', None)])
+        self.assertEqual(results, [(200, [{'id': 'example.com.'}]), (200, {})])
+        # the connection is still usable after the chunked body
+        self.assertEqual(server.connections, [['GET', 'GET', 'GET']])
+
+    def testConnectionClose(self):
+        def script(conn, n):
+            if (conn, n) == (0, 1):
+                return b'HTTP/1.1 200 OK\r\nConnection: close\r\nContent-Length: 2\r\n\r\n{}'
+            return OK
+
+        server, results, api = self.run_scripted(script, [('/zones', 'POST', {'name': 'example.com.'})] * 3)
+        self.assertEqual(results, [(200, {})] * 3)
+        # the connection is not used after the reply that closed it, the next one is
+        self.assertEqual(server.connections, [['GET', 'POST'], ['POST', 'POST']])
+
+    def testClosedMidResponse(self):
+        truncated = {
+            'status line': [b'HTTP/1.1 200', None],
+            'headers': [b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n', None],
+            'body': [b'HTTP/1.1 200 OK\r\nContent-Length: 20\r\n\r\n{"id": ', None],
+            'chunk': [b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n10\r\n{"id": ', None],
+            'chunk size': [b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n2\r\n{}\r\n', None],
+        }
+        for what, response in truncated.items():
+            with self.subTest(what):
+                # On a new connection, a GET fails
+                server, results, _ = self.run_scripted(
+                    lambda conn, n: response if conn == 1 else None if n > 0 else OK,
+                    [('/zones', 'GET', None)])
+                self.assertIsInstance(results[0], ConnectionError)
+                self.assertEqual(server.connections, [['GET', 'GET'], ['GET']])
+
+                # On a reused connection, a GET is sent again and a POST is not
+                server, results, _ = self.run_scripted(
+                    lambda conn, n: response if (conn, n) == (0, 1) else OK,
+                    [('/zones', 'GET', None), ('/zones', 'POST', {'name': 'example.com.'})])
+                self.assertEqual(results[0], (200, {}))
+                self.assertEqual(server.connections[:2], [['GET', 'GET'], ['GET', 'POST']])
+
+                server, results, _ = self.run_scripted(
+                    lambda conn, n: response if (conn, n) == (0, 1) else OK,
+                    [('/zones', 'POST', {'name': 'example.com.'})])
+                self.assertIsInstance(results[0], ConnectionError)
+                self.assertEqual(server.connections, [['GET', 'POST']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+import unittest
+
+KEYROLLER_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, KEYROLLER_DIR)
+sys.path.insert(0, os.path.join(KEYROLLER_DIR, 'benchmarks'))
+
+from mockapi import MockBackend, MockServer, zone_name  # noqa: E402
+from pdnsapi import bulk  # noqa: E402
+from pdnsapi.api import PDNSApi  # noqa: E402
+
+APIKEY = 'secret'
+
+
+class TestBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.servers = []
+        self.directory = tempfile.TemporaryDirectory()
+        self.source = self.start_server(zones=10, records=20)
+        self.target = self.start_server(zones=0, records=0)
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.directory.cleanup()
+
+    def start_server(self, **kwargs):
+        server = MockServer(('127.0.0.1', 0), MockBackend(**kwargs), apikey=APIKEY)
+        server.start()
+        self.servers.append(server)
+        return PDNSApi(APIKEY, baseurl=server.baseurl)
+
+    def assertSameZones(self):
+        self.assertEqual(sorted(z.name for z in self.source.get_zones()),
+                         sorted(z.name for z in self.target.get_zones()))
+        for zone in self.source.get_zones():
+            self.assertEqual(
+                sorted((r.name, r.rtype, r.ttl, [x.content for x in r.records]) for r in
+                       self.source.get_zone(zone.name).rrsets),
+                sorted((r.name, r.rtype, r.ttl, [x.content for x in r.records]) for r in
+                       self.target.get_zone(zone.name).rrsets))
+
+    def roundtrip(self, fmt):
+        stats = bulk.export_zones(self.source, self.directory.name, fmt=fmt, jobs=4)
+        self.assertEqual((stats['done'], stats['rrsets'], stats['records']), (10, 220, 230))
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, bulk.zone_filename(zone_name(3), fmt))))
+
+        stats = bulk.import_zones(self.target, self.directory.name, jobs=4, max_rrsets=5)
+        self.assertEqual((stats['done'], stats['failed'], stats['records']), (10, 0, 230))
+        # 22 RRSets in chunks of 5: a POST and 4 PATCHes per zone
+        self.assertEqual(stats['requests'], 50)
+        self.assertSameZones()
+
+    def testZoneFiles(self):
+        self.roundtrip('zone')
+
+    def testJSONLines(self):
+        self.roundtrip('jsonl')
+
+    def testResume(self):
+        bulk.export_zones(self.source, self.directory.name, zones=[zone_name(0), zone_name(1)])
+        stats = bulk.export_zones(self.source, self.directory.name)
+        self.assertEqual((stats['done'], stats['skipped']), (8, 2))
+
+        # A serial change means the zone is exported again
+        self.source.bump_soa(zone_name(0))
+        stats = bulk.export_zones(self.source, self.directory.name)
+        self.assertEqual((stats['done'], stats['skipped']), (1, 9))
+
+        # A zone that exists but was not finished is synchronized instead of created
+        self.target.create_zone(zone_name(2), rrsets=[])
+        bulk.import_zones(self.target, self.directory.name, zones=[zone_name(1)])
+        stats = bulk.import_zones(self.target, self.directory.name)
+        self.assertEqual((stats['done'], stats['skipped'], stats['failed']), (9, 1, 0))
+        self.assertSameZones()
+
+    def testJSONLinesComments(self):
+        comment = {'content': 'keep me', 'account': 'ops', 'modified_at': 1700000000}
+        for zone in (zone_name(0), zone_name(1)):
+            host = 'host9.' + zone
+            self.source.patch_rrsets(zone, [{'name': host, 'type': 'A', 'ttl': 3600, 'changetype': 'REPLACE',
+                                             'records': [{'content': '192.0.2.9', 'disabled': False}],
+                                             'comments': [comment]}])
+        bulk.export_zones(self.source, self.directory.name, fmt='jsonl', zones=[zone_name(0), zone_name(1)])
+        # One zone is created (its RRSets partly in PATCHes), the other exists and is synchronized
+        self.target.create_zone(zone_name(1), rrsets=[])
+        bulk.import_zones(self.target, self.directory.name, max_rrsets=5)
+        for zone in (zone_name(0), zone_name(1)):
+            rrset = [r for r in self.target.get_zone(zone).rrsets if r.name == 'host9.' + zone][0]
+            self.assertEqual([(c.content, c.account) for c in rrset.comments], [('keep me', 'ops')])
+
+    def testFileNames(self):
+        for zone in ('.', 'example.com.', 'a/b.example.'):
+            self.assertEqual(bulk.zone_from_filename(bulk.zone_filename(zone, 'zone'), 'zone'), zone)
+        # Without a manifest, the zones are named after the files
+        for name in ('root.zone', 'example.com.zone', 'example.com.jsonl'):
+            open(os.path.join(self.directory.name, name), 'w').close()
+        self.assertEqual(sorted(bulk._import_sources(self.directory.name, 'zone')), ['.', 'example.com.'])
+
+
+if __name__ == '__main__':
+    unittest.main()
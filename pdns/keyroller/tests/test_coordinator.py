@@ -0,0 +1,97 @@
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import yaml
+
+KEYROLLER_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, KEYROLLER_DIR)
+sys.path.insert(0, os.path.join(KEYROLLER_DIR, 'benchmarks'))
+
+from mockapi import MockBackend, MockServer  # noqa: E402
+from pdnskeyroller import coordinator  # noqa: E402
+
+APIKEY = 'secret'
+ZONES = 20
+WORKERS = 2
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.server = MockServer(('127.0.0.1', 0), MockBackend(zones=ZONES, records=1), apikey=APIKEY)
+        self.server.start()
+        self.dir = tempfile.mkdtemp()
+        self.configfile = os.path.join(self.dir, 'pdns-keyroller.conf')
+        self.metrics = os.path.join(self.dir, 'pdns-keyroller.prom')
+        self.write_config()
+        self.supervisor = coordinator.Supervisor(self.configfile, WORKERS, 1)
+        self.thread = threading.Thread(target=self.supervisor.serve)
+        self.thread.start()
+
+    def tearDown(self):
+        self.supervisor.stop()
+        self.thread.join(30)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.dir)
+
+    def write_config(self, **keyroller):
+        with open(self.configfile, 'w') as f:
+            yaml.safe_dump({'API': {'baseurl': self.server.baseurl, 'apikey': APIKEY},
+                            'keyroller': dict(keyroller, loglevel='warning')}, f)
+
+    def requests(self, endpoint):
+        return self.server.get_stats().get(endpoint, 0)
+
+    def workers(self):
+        return [process for process in self.supervisor._processes if process is not None and process.is_alive()]
+
+    def testZonesLoadedOnce(self):
+        # every run lists the zones, only the first one reads their metadata
+        self.assertTrue(wait_for(lambda: self.requests('GET zones') >= 3 * WORKERS))
+        self.assertEqual(self.requests('GET metadata'), ZONES)
+        pids = [process.pid for process in self.workers()]
+        self.assertEqual(len(pids), WORKERS)
+
+        self.supervisor.stop()
+        self.thread.join(30)
+        self.assertFalse(self.thread.is_alive())
+        self.assertEqual([process.exitcode for process in self.supervisor._processes], [0] * WORKERS)
+
+    def testReload(self):
+        self.assertTrue(wait_for(lambda: self.requests('GET zones') >= WORKERS))
+        self.write_config(metrics_textfile=self.metrics)
+        self.supervisor.request_reload()
+        for shard in range(WORKERS):
+            self.assertTrue(wait_for(lambda: os.path.exists(os.path.join(self.dir, 'pdns-keyroller.{}.prom'.format(shard)))))
+
+    def testRestart(self):
+        self.assertTrue(wait_for(lambda: len(self.workers()) == WORKERS))
+        killed = self.supervisor._processes[0]
+        restart_delay = coordinator.RESTART_DELAY
+        coordinator.RESTART_DELAY = 0
+        try:
+            os.kill(killed.pid, signal.SIGKILL)
+            self.assertTrue(wait_for(lambda: self.supervisor._processes[0] not in (None, killed)))
+        finally:
+            coordinator.RESTART_DELAY = restart_delay
+        self.assertTrue(wait_for(lambda: len(self.workers()) == WORKERS))
+
+
+if __name__ == '__main__':
+    unittest.main()
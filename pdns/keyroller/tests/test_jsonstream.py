@@ -0,0 +1,177 @@
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+KEYROLLER_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, KEYROLLER_DIR)
+sys.path.insert(0, os.path.join(KEYROLLER_DIR, 'benchmarks'))
+
+from mockapi import MockBackend, MockServer, zone_name  # noqa: E402
+from pdnsapi import jsonstream  # noqa: E402
+from pdnsapi.api import PDNSApi  # noqa: E402
+from pdnsapi.zone import Zone, iter_rrsets  # noqa: E402
+
+APIKEY = 'secret'
+
+DOCUMENT = json.dumps({
+    'name': 'example.com.',
+    'serial': 2024010101,
+    'ratio': -1.5e-3,
+    'dnssec': True,
+    'master_tsig_key_ids': [],
+    'rrsets': [
+        {'name': 'example.com.', 'type': 'SOA', 'ttl': 3600, 'comments': [],
+         'records': [{'content': 'ns1.example.com. hostmaster.example.com. 1 10800 3600 604800 3600',
+                      'disabled': False}]},
+        {'name': 'txt.example.com.', 'type': 'TXT', 'ttl': 300, 'comments': [{'content': 'café ☃ "quoted" \\ }]',
+                                                                             'account': '', 'modified_at': 12}],
+         'records': [{'content': '"with [brackets] and {braces}, commas"', 'disabled': False}]},
+        {'name': 'n.example.com.', 'type': 'A', 'ttl': 12345678901234567890, 'records': [], 'comments': []},
+    ],
+    'account': None,
+    'nested': {'a': [1, {'b': [2, 3]}], 'c': ''},
+    'last': 10,
+}, indent=1).encode()
+
+
+def split_at(data, *offsets):
+    start = 0
+    for offset in offsets:
+        yield data[start:offset]
+        start = offset
+    yield data[start:]
+
+
+def parse(chunks, stream_key='rrsets'):
+    """The document that iter_object sees, with the streamed array put back together"""
+    ret = {}
+    for k, v in jsonstream.iter_object(chunks, stream_key):
+        if k == stream_key:
+            ret.setdefault(k, []).append(v)
+        else:
+            ret[k] = v
+    return ret
+
+
+class TestIterObject(unittest.TestCase):
+
+    def testWholeDocument(self):
+        self.assertEqual(parse([DOCUMENT]), json.loads(DOCUMENT))
+
+    def testSplitAtEveryOffset(self):
+        expected = json.loads(DOCUMENT)
+        for offset in range(len(DOCUMENT) + 1):
+            self.assertEqual(parse(split_at(DOCUMENT, offset)), expected, 'split at {}'.format(offset))
+
+    def testSplitAtEveryOffsetTwice(self):
+        # Values that span three chunks (or a chunk that is only part of a multi-byte character)
+        expected = json.loads(DOCUMENT)
+        for offset in range(len(DOCUMENT) + 1):
+            for length in (1, 2, 3, 7):
+                chunks = split_at(DOCUMENT, offset, min(offset + length, len(DOCUMENT)))
+                self.assertEqual(parse(chunks), expected, 'split at {} and {}'.format(offset, offset + length))
+
+    def testByteByByte(self):
+        self.assertEqual(parse(DOCUMENT[i:i + 1] for i in range(len(DOCUMENT))), json.loads(DOCUMENT))
+
+    def testStrChunks(self):
+        text = DOCUMENT.decode()
+        self.assertEqual(parse(text[i:i + 5] for i in range(0, len(text), 5)), json.loads(DOCUMENT))
+
+    def testStreamsArrayElements(self):
+        elements = [v for k, v in jsonstream.iter_object([DOCUMENT], 'rrsets') if k == 'rrsets']
+        self.assertEqual(elements, json.loads(DOCUMENT)['rrsets'])
+
+    def testNotStreamedWhenNotAnArray(self):
+        self.assertEqual(list(jsonstream.iter_object([b'{"rrsets": null, "a": {}}'], 'rrsets')),
+                         [('rrsets', None), ('a', {})])
+
+    def testEmpty(self):
+        self.assertEqual(list(jsonstream.iter_object([b' { } '], 'rrsets')), [])
+        self.assertEqual(list(jsonstream.iter_object([b'{"rrsets": [ ]}'], 'rrsets')), [])
+
+    def testTrailingNumber(self):
+        for offset in range(1, 9):
+            self.assertEqual(parse(split_at(b'{"a": 1234567}', offset)), {'a': 1234567})
+
+    def testInvalid(self):
+        for document in (b'', b'[]', b'{"a": 1', b'{"a" 1}', b'{"a": [1, 2}', b'{1: 2}', b'{"a": tru}'):
+            with self.assertRaises(ValueError, msg=document):
+                list(jsonstream.iter_object(split_at(document, len(document) // 2), 'a'))
+
+    def testLargeValueDecodedFewTimes(self):
+        document = json.dumps({'rrsets': [{'records': ['x' * 100] * 10000}]}).encode()
+        chunks = [document[i:i + 1024] for i in range(0, len(document), 1024)]
+        with mock.patch.object(jsonstream, '_decoder', wraps=jsonstream._decoder) as decoder:
+            self.assertEqual(parse(chunks), json.loads(document))
+        # Growing the buffer by one chunk at a time would take over a thousand attempts
+        self.assertLess(decoder.raw_decode.call_count, 20)
+
+    def testClosesChunksWhenAbandoned(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield from split_at(DOCUMENT, 100, 200)
+            finally:
+                closed.append(True)
+
+        stream = jsonstream.iter_object(chunks(), 'rrsets')
+        next(stream)
+        self.assertEqual(closed, [])
+        stream.close()
+        self.assertEqual(closed, [True])
+
+
+class TestIterRRSets(unittest.TestCase):
+
+    def testZoneAttributes(self):
+        zone = Zone()
+        rrsets = list(iter_rrsets(split_at(DOCUMENT, 300), zone))
+        self.assertEqual([(r.name, r.rtype) for r in rrsets],
+                         [('example.com.', 'SOA'), ('txt.example.com.', 'TXT'), ('n.example.com.', 'A')])
+        self.assertEqual(rrsets[1].records[0].content, '"with [brackets] and {braces}, commas"')
+        self.assertEqual(zone.name, 'example.com.')
+        self.assertEqual(zone.serial, 2024010101)
+
+
+class TestIterZone(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockServer(('127.0.0.1', 0), MockBackend(zones=3, records=50), apikey=APIKEY)
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.api = PDNSApi(APIKEY, baseurl=self.server.baseurl)
+
+    def testSameAsGetZone(self):
+        zone = zone_name(1)
+        expected = [(r.name, r.rtype, r.ttl, [rr.content for rr in r.records]) for r in self.api.get_zone(zone).rrsets]
+        for chunk_size in (1, 7, 65536):
+            with mock.patch('pdnsapi.api._iter_body', wraps=lambda res, _: res.iter_content(chunk_size=chunk_size)):
+                rrsets = [(r.name, r.rtype, r.ttl, [rr.content for rr in r.records]) for r in self.api.iter_zone(zone)]
+            self.assertEqual(rrsets, expected)
+
+    def testResponseClosedWhenAbandoned(self):
+        responses = []
+        request = PDNSApi.__init__.__globals__['requests'].request
+
+        def recording_request(*args, **kwargs):
+            responses.append(request(*args, **kwargs))
+            return responses[-1]
+
+        with mock.patch('pdnsapi.api.requests.request', side_effect=recording_request) as patched:
+            stream = self.api.iter_zone(zone_name(1))
+            next(stream)
+            self.assertEqual(patched.call_args.kwargs['timeout'], self.api.timeout)
+            with mock.patch.object(responses[0], 'close', wraps=responses[0].close) as close:
+                stream.close()
+                close.assert_called_once_with()
@@ -0,0 +1,147 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from pdnsapi.api import PDNSApi  # noqa: E402
+from pdnsapi.metadata import ZoneMetadata  # noqa: E402
+from pdnskeyroller import PDNSKEYROLLER_LEASE_metadata_kind, lease  # noqa: E402
+
+ZONE = 'example.com.'
+SETTLE = 0.05
+
+
+class FakeApi(PDNSApi):
+    """
+    Keeps the metadata of all zones in ``store``, which is shared by the keyrollers in a test. ``before_get`` and
+    ``before_set`` are called before the metadata is read and written, to interleave the keyrollers.
+    """
+
+    def __init__(self, store, before_get=None, before_set=None):
+        self.store = store
+        self.before_get = before_get
+        self.before_set = before_set
+
+    def get_zone_metadata(self, zone, kind=''):
+        if self.before_get:
+            self.before_get()
+        return ZoneMetadata(kind, list(self.store.get((zone, kind), [])))
+
+    def set_zone_metadata(self, zone, kind, metadata):
+        if self.before_set:
+            self.before_set()
+        self.store[(zone, kind)] = [metadata]
+        return ZoneMetadata(kind, [metadata])
+
+    def delete_zone_metadata(self, zone, kind):
+        self.store.pop((zone, kind), None)
+
+
+def run_concurrently(*funcs):
+    results = [None] * len(funcs)
+
+    def run(i):
+        results[i] = funcs[i]()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(funcs))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestLease(unittest.TestCase):
+
+    def setUp(self):
+        self.store = {}
+
+    def owner_of_lease(self):
+        return lease._read(ZONE, FakeApi(self.store)).get('owner')
+
+    def testAcquireAndRelease(self):
+        api = FakeApi(self.store)
+        token = lease.acquire(ZONE, api, 'a', 60, settle=SETTLE)
+        self.assertIsNotNone(token)
+        self.assertEqual(self.owner_of_lease(), 'a')
+        self.assertIsNone(lease.acquire(ZONE, api, 'b', 60, settle=SETTLE))
+        self.assertTrue(lease.release(ZONE, api, 'a', token, settle=SETTLE))
+        self.assertNotIn((ZONE, PDNSKEYROLLER_LEASE_metadata_kind), self.store)
+        self.assertIsNotNone(lease.acquire(ZONE, api, 'b', 60, settle=SETTLE))
+
+    def testExpiredLeaseIsTakenOver(self):
+        api = FakeApi(self.store)
+        self.assertIsNotNone(lease.acquire(ZONE, api, 'a', 0, settle=SETTLE))
+        self.assertIsNotNone(lease.acquire(ZONE, api, 'b', 60, settle=SETTLE))
+        self.assertEqual(self.owner_of_lease(), 'b')
+
+    def testSlowWriterBacksOff(self):
+        # b reads "no lease", then a takes the lease and checks it, and only then the lease of b arrives
+        a_done = threading.Event()
+        b_read = threading.Event()
+        api_a = FakeApi(self.store, before_get=lambda: b_read.wait())
+        api_b = FakeApi(self.store, before_get=b_read.set, before_set=lambda: a_done.wait())
+
+        def acquire_a():
+            try:
+                return lease.acquire(ZONE, api_a, 'a', 60, settle=SETTLE)
+            finally:
+                a_done.set()
+
+        token_a, token_b = run_concurrently(acquire_a, lambda: lease.acquire(ZONE, api_b, 'b', 60, settle=SETTLE))
+        self.assertIsNotNone(token_a)
+        self.assertIsNone(token_b)
+        # The lease of b replaced that of a, so a can not release it; it stays until it expires
+        self.assertEqual(self.owner_of_lease(), 'b')
+        self.assertFalse(lease.release(ZONE, api_a, 'a', token_a, settle=SETTLE))
+        self.assertIsNone(lease.acquire(ZONE, FakeApi(self.store), 'c', 60, settle=SETTLE))
+
+    def testSimultaneousWritersOneWins(self):
+        # Both read "no lease" before either writes
+        both_read = threading.Barrier(2)
+        first_get = {'a': True, 'b': True}
+
+        def before_get(owner):
+            if first_get[owner]:
+                first_get[owner] = False
+                both_read.wait()
+
+        api_a = FakeApi(self.store, before_get=lambda: before_get('a'))
+        api_b = FakeApi(self.store, before_get=lambda: before_get('b'))
+        tokens = run_concurrently(lambda: lease.acquire(ZONE, api_a, 'a', 60, settle=SETTLE),
+                                  lambda: lease.acquire(ZONE, api_b, 'b', 60, settle=SETTLE))
+        self.assertEqual(len([t for t in tokens if t is not None]), 1)
+        winner = 'a' if tokens[0] is not None else 'b'
+        self.assertEqual(self.owner_of_lease(), winner)
+
+    def testManyAcquirersMutualExclusion(self):
+        apis = [FakeApi(self.store) for _ in range(8)]
+        tokens = run_concurrently(*[lambda i=i: lease.acquire(ZONE, apis[i], str(i), 60, settle=SETTLE)
+                                    for i in range(len(apis))])
+        self.assertEqual(len([t for t in tokens if t is not None]), 1)
+
+    def testReleaseKeepsLeaseOfOthers(self):
+        api = FakeApi(self.store)
+        token_a = lease.acquire(ZONE, api, 'a', 0, settle=SETTLE)
+        token_b = lease.acquire(ZONE, api, 'b', 60, settle=SETTLE)
+        self.assertFalse(lease.release(ZONE, api, 'a', token_a, settle=SETTLE))
+        self.assertEqual(self.owner_of_lease(), 'b')
+        # Same owner, but an older lease
+        self.assertFalse(lease.release(ZONE, api, 'b', 'old-token', settle=SETTLE))
+        self.assertTrue(lease.release(ZONE, api, 'b', token_b, settle=SETTLE))
+
+    def testReleaseLeavesAlmostExpiredLease(self):
+        api = FakeApi(self.store)
+        token = lease.acquire(ZONE, api, 'a', 1, settle=SETTLE)
+        self.assertFalse(lease.release(ZONE, api, 'a', token, settle=2))
+        self.assertEqual(self.owner_of_lease(), 'a')
+
+    def testAcquireMany(self):
+        zones = ['zone{}.example.'.format(i) for i in range(5)]
+        api = FakeApi(self.store)
+        lease.acquire(zones[1], api, 'b', 60, settle=SETTLE)
+        held, failed = lease.acquire_many(zones, api, 'a', 60, settle=SETTLE)
+        self.assertEqual(sorted(held), [z for z in zones if z != zones[1]])
+        self.assertEqual(failed, {})
@@ -0,0 +1,103 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from pdnsapi.api import PDNSApi  # noqa: E402
+from pdnsapi.zone import RRSet  # noqa: E402
+from pdnskeyroller.operationplan import OperationPlan  # noqa: E402
+
+ZONE = 'example.com.'
+
+
+class FakeApi(PDNSApi):
+    """
+    Records the calls an :class:`OperationPlan` makes in ``calls``, and serves ``rrsets`` as the zone contents
+    """
+
+    def __init__(self, rrsets):
+        self.rrsets = rrsets
+        self.calls = []
+
+    def set_cryptokey_active(self, zone, cryptokey, active=True, refetch=True):
+        self.calls.append(('set_cryptokey_active', cryptokey, active))
+
+    def delete_cryptokey(self, zone, cryptokey):
+        self.calls.append(('delete_cryptokey', cryptokey))
+
+    def iter_zone(self, zone, zoneobject=None):
+        self.calls.append(('iter_zone',))
+        return iter(self.rrsets)
+
+    def bump_soa_rrset(self, zone, soa, serial=None):
+        self.calls.append(('bump_soa_rrset', soa.name))
+
+
+class TestOperationPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi([RRSet(ZONE, 'NS', 3600, []), RRSet(ZONE, 'SOA', 300, []),
+                            RRSet('www.' + ZONE, 'A', 7200, [])])
+        self.plan = OperationPlan(ZONE)
+
+    def testEmpty(self):
+        self.assertTrue(self.plan.empty)
+        self.assertIsNone(self.plan.execute(self.api))
+        self.assertEqual(self.api.calls, [])
+
+    def testRepeatedSetKeyActive(self):
+        self.plan.set_key_active(1)
+        self.plan.set_key_active(2)
+        self.plan.set_key_active(1, active=False)
+        self.assertFalse(self.plan.empty)
+        self.assertIsNone(self.plan.execute(self.api))
+        # one change per key, with the last value, in the order of the last change
+        self.assertEqual(self.api.calls, [('set_cryptokey_active', 2, True), ('set_cryptokey_active', 1, False)])
+
+    def testDeleteKeyAfterActivation(self):
+        self.plan.set_key_active(1)
+        self.plan.set_key_active(2)
+        self.plan.delete_key(1)
+        self.plan.delete_key(1)
+        self.plan.execute(self.api)
+        self.assertEqual(self.api.calls, [('set_cryptokey_active', 2, True), ('delete_cryptokey', 1)])
+
+    def testSingleSoaBump(self):
+        self.plan.bump_soa()
+        self.plan.bump_soa()
+        # the highest TTL was not asked for
+        self.assertIsNone(self.plan.execute(self.api))
+        self.assertEqual(self.api.calls, [('iter_zone',), ('bump_soa_rrset', ZONE)])
+
+    def testNoSoa(self):
+        self.api.rrsets = [RRSet(ZONE, 'NS', 3600, [])]
+        self.plan.bump_soa()
+        self.assertRaises(Exception, self.plan.execute, self.api)
+
+    def testHighestTTL(self):
+        self.plan.need_highest_ttl()
+        self.assertEqual(self.plan.execute(self.api), 7200)
+        self.assertEqual(self.api.calls, [('iter_zone',)])
+
+    def testHighestTTLAndSoaBump(self):
+        self.plan.need_highest_ttl()
+        self.plan.bump_soa()
+        self.plan.delete_key(3)
+        self.assertEqual(self.plan.execute(self.api), 7200)
+        # the zone is read once for both
+        self.assertEqual(self.api.calls, [('delete_cryptokey', 3), ('iter_zone',), ('bump_soa_rrset', ZONE)])
+
+    def testExecutedPlanIsEmpty(self):
+        self.plan.set_key_active(1)
+        self.plan.bump_soa()
+        self.plan.need_highest_ttl()
+        self.plan.execute(self.api)
+        self.assertTrue(self.plan.empty)
+        calls = len(self.api.calls)
+        self.assertIsNone(self.plan.execute(self.api))
+        self.assertEqual(len(self.api.calls), calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
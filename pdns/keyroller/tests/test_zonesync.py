@@ -0,0 +1,131 @@
+import os
+import sys
+import unittest
+
+KEYROLLER_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+sys.path.insert(0, KEYROLLER_DIR)
+sys.path.insert(0, os.path.join(KEYROLLER_DIR, 'benchmarks'))
+
+from mockapi import MockBackend, MockServer, zone_name  # noqa: E402
+from pdnsapi import zonefile, zonesync  # noqa: E402
+from pdnsapi.api import PDNSApi  # noqa: E402
+from pdnsapi.zone import RRSet  # noqa: E402
+
+ZONE = """$ORIGIN example.com.
+$TTL 1h
+@       IN SOA ns1 hostmaster ( 2024010101 ; serial
+                10800 3600 604800 3600 )
+        NS  ns1
+        NS  ns2.example.net.
+ns1     300 IN A 192.0.2.53
+www     IN  300 A 192.0.2.1
+        A   192.0.2.2
+mail    MX  10 mx
+txt     TXT "v=spf1 -all ; not a comment"
+"""
+
+
+def rrset(name, rtype, ttl, *contents):
+    return RRSet(name, rtype, ttl, [{'content': c, 'disabled': False} for c in contents])
+
+
+class TestZoneFile(unittest.TestCase):
+
+    def testReadRRSets(self):
+        rrsets = {(r.name, r.rtype): r for r in zonefile.read_rrsets(ZONE.splitlines(), 'example.com')}
+        self.assertEqual(len(rrsets), 6)
+        self.assertEqual(rrsets[('example.com.', 'SOA')].records[0].content,
+                         'ns1.example.com. hostmaster.example.com. 2024010101 10800 3600 604800 3600')
+        self.assertEqual(sorted(r.content for r in rrsets[('example.com.', 'NS')].records),
+                         ['ns1.example.com.', 'ns2.example.net.'])
+        self.assertEqual(rrsets[('www.example.com.', 'A')].ttl, 300)
+        self.assertEqual(len(rrsets[('www.example.com.', 'A')].records), 2)
+        self.assertEqual(rrsets[('mail.example.com.', 'MX')].records[0].content, '10 mx.example.com.')
+        self.assertEqual(rrsets[('txt.example.com.', 'TXT')].records[0].content, '"v=spf1 -all ; not a comment"')
+        self.assertEqual(rrsets[('mail.example.com.', 'MX')].ttl, 3600)
+
+    def testParseTTL(self):
+        self.assertEqual(zonefile.parse_ttl('3600'), 3600)
+        self.assertEqual(zonefile.parse_ttl('1h30m'), 5400)
+        with self.assertRaises(ValueError):
+            zonefile.parse_ttl('1x')
+
+
+class TestZoneSync(unittest.TestCase):
+
+    def setUp(self):
+        self.live = zonefile.read_rrsets(ZONE.splitlines(), 'example.com')
+
+    def testUnchanged(self):
+        desired = zonefile.read_rrsets(ZONE.replace('2024010101', '2024010102').splitlines(), 'example.com')
+        diff = zonesync.diff_zone(desired, self.live)
+        self.assertTrue(diff.empty)
+        self.assertEqual(diff.unchanged, 6)
+        diff = zonesync.diff_zone(desired, self.live, ignore_soa_serial=False)
+        self.assertEqual([c['type'] for c in diff.changed], ['SOA'])
+
+    def testRecordOrderAndFormatting(self):
+        desired = [r for r in self.live if r.rtype != 'A' or r.name != 'www.example.com.']
+        desired.append(rrset('WWW.example.com.', 'A', 300, '192.0.2.2', '192.0.2.1'))
+        desired = [r for r in desired if r.rtype != 'MX']
+        desired.append(rrset('mail.example.com.', 'MX', 3600, '10  MX.example.com.'))
+        self.assertTrue(zonesync.diff_zone(desired, self.live).empty)
+
+    def testChanges(self):
+        desired = [r for r in self.live if r.rtype not in ('TXT', 'MX')]
+        desired.append(rrset('mail.example.com.', 'MX', 3600, '20 mx.example.com.'))
+        desired.append(rrset('new.example.com.', 'AAAA', 60, '2001:db8::1'))
+        desired.append(rrset('ignored.example.com.', 'RRSIG', 60, 'A 13 3 300 ...'))
+        diff = zonesync.diff_zone(desired, self.live)
+        self.assertEqual(diff.changed, [{'name': 'mail.example.com.', 'type': 'MX', 'ttl': 3600,
+                                         'changetype': 'REPLACE',
+                                         'records': [{'content': '20 mx.example.com.', 'disabled': False}]}])
+        self.assertEqual(diff.deleted, [{'name': 'txt.example.com.', 'type': 'TXT', 'changetype': 'DELETE'}])
+        self.assertEqual([(c['name'], c['type']) for c in diff.added], [('new.example.com.', 'AAAA')])
+        self.assertEqual(diff.unchanged, 4)
+        self.assertEqual(diff.changes[0]['changetype'], 'DELETE')
+
+    def testApexNotDeleted(self):
+        desired = [r for r in self.live if r.rtype not in ('SOA', 'NS')]
+        desired.append(rrset('sub.example.com.', 'NS', 3600, 'ns1.example.net.'))
+        live = self.live + [rrset('old.example.com.', 'NS', 3600, 'ns1.example.net.')]
+        diff = zonesync.diff_zone(desired, live)
+        self.assertEqual(diff.deleted, [{'name': 'old.example.com.', 'type': 'NS', 'changetype': 'DELETE'}])
+        # The apex is also recognized without a SOA in the live zone
+        diff = zonesync.diff_zone(desired, [r for r in live if r.rtype != 'SOA'], apex='example.com')
+        self.assertEqual(diff.deleted, [{'name': 'old.example.com.', 'type': 'NS', 'changetype': 'DELETE'}])
+
+    def testChunks(self):
+        changes = [zonesync.rrset_change(rrset('h{}.example.com.'.format(i), 'A', 60, '192.0.2.1'))
+                   for i in range(10)]
+        self.assertEqual([len(c) for c in zonesync.chunk_changes(changes, max_rrsets=4)], [4, 4, 2])
+        size = len(zonesync.json.dumps(changes[0])) + 1
+        self.assertEqual([len(c) for c in zonesync.chunk_changes(changes, max_bytes=size * 3)], [3, 3, 3, 1])
+        self.assertEqual([len(c) for c in zonesync.chunk_changes(changes, max_bytes=1)], [1] * 10)
+
+
+class TestSyncZone(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockServer(('127.0.0.1', 0), MockBackend(zones=2, records=5), apikey='secret')
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def testDesiredWithoutSOA(self):
+        api = PDNSApi('secret', baseurl=self.server.baseurl)
+        zone = zone_name(0)
+        live = api.get_zone(zone)
+        desired = [r for r in live.rrsets if r.rtype not in ('SOA', 'NS') and r.name != 'host0.' + zone]
+        stats = zonesync.sync_zone(api, zone, desired)
+        self.assertEqual((stats['deleted'], stats['patches']), (1, 1))
+        self.assertEqual(sorted(zonesync.rrset_key(r) for r in api.get_zone(zone).rrsets),
+                         sorted(zonesync.rrset_key(r) for r in live.rrsets if r.name != 'host0.' + zone))
+
+
+if __name__ == '__main__':
+    unittest.main()
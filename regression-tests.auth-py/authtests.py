@@ -15,6 +15,7 @@ import dns.message
 
 from pprint import pprint
 from eqdnsmessage import AssertEqualDNSMessageMixin
+import signedzonecache
 
 class AuthTest(AssertEqualDNSMessageMixin, unittest.TestCase):
     """
@@ -126,6 +127,10 @@ options {
 
         os.system("sqlite3 ./configs/auth/powerdns.sqlite < ../modules/gsqlite3backend/schema.sqlite3.sql")
 
+        # already there when restored from the signed zone cache
+        if os.path.exists(bind_dnssec_db):
+            return
+
         pdnsutilCmd = [os.environ['PDNSUTIL'],
                        '--config-dir=%s' % confdir,
                        'create-bind-db',
@@ -164,8 +169,32 @@ options {
         except subprocess.CalledProcessError as e:
             raise AssertionError('%s failed (%d): %s' % (pdnsutilCmd, e.returncode, e.output))
 
+    @classmethod
+    def getSignedZoneCacheFiles(cls):
+        """
+        The database files secureZone leaves the keys in, for the signed zone
+        cache. Only done for bind (and its bind-dnssec db), None otherwise.
+        """
+        params = tuple([getattr(cls, param) for param in cls._config_params])
+        config = cls._config_template % params
+        launch = [line.split('=', 1)[1].split() for line in config.splitlines()
+                  if line.strip().startswith('launch=')]
+        if launch == [['bind']]:
+            return ['bind-dnssec.sqlite3']
+        return None
+
     @classmethod
     def generateAllAuthConfig(cls, confdir):
+        # the keys pdnsutil puts into the database come from the signed zone
+        # cache when an earlier run secured the same zones
+        dbFiles = cls.getSignedZoneCacheFiles()
+        cached = False
+        if dbFiles:
+            signedZones = [(zonename, zonecontent.format(prefix=cls._PREFIX, soa=cls._SOA), cls._zone_keys.get(zonename))
+                           for zonename, zonecontent in cls._zones.items() if cls._zone_keys.get(zonename, None)]
+            cacheKey = signedzonecache.getCacheKey(cls, signedZones, dbFiles)
+            cached = signedzonecache.restoreFromCache(cacheKey, confdir, dbFiles)
+
         cls.generateAuthConfig(confdir)
         cls.generateAuthNamedConf(confdir, cls._zones.keys())
 
@@ -173,9 +202,12 @@ options {
             cls.generateAuthZone(confdir,
                                  zonename,
                                  zonecontent)
-            if cls._zone_keys.get(zonename, None):
+            if cls._zone_keys.get(zonename, None) and not cached:
                 cls.secureZone(confdir, zonename, cls._zone_keys.get(zonename))
 
+        if dbFiles and not cached:
+            signedzonecache.storeInCache(cacheKey, confdir, dbFiles)
+
     @classmethod
     def waitForTCPSocket(cls, ipaddress, port):
         for try_number in range(0, 100):
@@ -0,0 +1 @@
+../regression-tests.common/signedzonecache.py
\ No newline at end of file
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+import fcntl
+import hashlib
+import inspect
+import os
+import shutil
+import subprocess
+import tempfile
+
+# A cache of the backend databases that pdnsutil leaves behind after securing
+# the zones of a test auth (import-zone-key, secure-zone, set-nsec3...), so
+# that setting up the same auth again is a copy instead of a series of
+# pdnsutil runs. Entries are directories named after the hash of everything
+# that went into them (see getCacheKey), holding the database files.
+#
+# The cache lives in $PDNS_SIGNED_ZONE_CACHE, configs/signed-zone-cache by
+# default (so it goes away with the rest of configs/). Set it to '' to disable
+# it.
+
+# linux/fs.h, clone a file (reflink) on filesystems that support it
+FICLONE = 0x40049409
+
+# bump when the layout of the entries changes
+CACHE_VERSION = 1
+
+_pdnsutilVersion = None
+
+
+def getCacheDir():
+    return os.environ.get('PDNS_SIGNED_ZONE_CACHE', os.path.join('configs', 'signed-zone-cache'))
+
+
+def getPdnsutilVersion():
+    """
+    The version of pdnsutil, plus the size and mtime of the binary so that
+    a rebuild with the same version string does not reuse old entries
+    """
+    global _pdnsutilVersion
+    if _pdnsutilVersion is None:
+        pdnsutil = os.environ['PDNSUTIL']
+        try:
+            version = subprocess.check_output([pdnsutil, '--version'], stderr=subprocess.STDOUT).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            version = ''
+        st = os.stat(os.path.realpath(pdnsutil))
+        _pdnsutilVersion = '%s %d %d' % (version, st.st_size, st.st_mtime_ns)
+    return _pdnsutilVersion
+
+
+def getFunctionSource(func):
+    """
+    The source of func, or its code when the source is not around
+    """
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return repr((func.__code__.co_code, func.__code__.co_consts, func.__code__.co_names))
+
+
+def getCacheKey(cls, zones, files):
+    """
+    The key of the databases (files) that cls.secureZone produces for zones,
+    a list of (zonename, zone text, key material or None). The source of
+    every secureZone implementation of cls stands in for the NSEC mode and
+    whatever else the test does to the zones.
+    """
+    secureZones = [getFunctionSource(klass.__dict__['secureZone'].__func__)
+                   for klass in cls.__mro__ if 'secureZone' in klass.__dict__]
+    config = repr((CACHE_VERSION, getPdnsutilVersion(), sorted(files), zones, secureZones))
+    return hashlib.sha256(config.encode()).hexdigest()
+
+
+def copyFile(src, dst):
+    """
+    Reflink src to dst where the filesystem can, copy it otherwise
+    """
+    with open(src, 'rb') as fdSrc, open(dst, 'wb') as fdDst:
+        try:
+            fcntl.ioctl(fdDst.fileno(), FICLONE, fdSrc.fileno())
+            return
+        except OSError:
+            pass
+        shutil.copyfileobj(fdSrc, fdDst)
+
+
+def restoreFromCache(key, confdir, files):
+    """
+    Put the cached files for key into confdir, return False when there are
+    none (or the cache is disabled)
+    """
+    cacheDir = getCacheDir()
+    if not cacheDir:
+        return False
+    entry = os.path.join(cacheDir, key)
+    if not os.path.isdir(entry):
+        return False
+    for filename in files:
+        copyFile(os.path.join(entry, filename), os.path.join(confdir, filename))
+    return True
+
+
+def storeInCache(key, confdir, files):
+    """
+    Store the files in confdir as the entry for key. Entries are renamed into
+    place once complete, so parallel test runs see either all of it or nothing.
+    """
+    cacheDir = getCacheDir()
+    if not cacheDir:
+        return
+    os.makedirs(cacheDir, exist_ok=True)
+    tmpdir = tempfile.mkdtemp(dir=cacheDir, prefix='.tmp-')
+    try:
+        for filename in files:
+            copyFile(os.path.join(confdir, filename), os.path.join(tmpdir, filename))
+        os.rename(tmpdir, os.path.join(cacheDir, key))
+    except OSError:
+        # stored by somebody else in the meantime
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,16 @@
+import pytest
+
+from recursortests import stopAuthFleet
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_cmdline_main(config):
+    # with -n, keep the classes of a module on one worker (unless --dist is given), they share
+    # config dirs and responders. Not in pytest.ini, --dist only exists when pytest-xdist is installed
+    if getattr(config.option, 'numprocesses', None) and config.option.dist == 'no':
+        config.option.dist = 'loadfile'
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # the auths shared by the test classes of this session (or xdist worker)
+    stopAuthFleet()
@@ -1,7 +1,9 @@
 #!/usr/bin/env python2
 
 from __future__ import print_function
+import atexit
 import errno
+import hashlib
 import shutil
 import os
 import socket
@@ -15,6 +17,7 @@ import dns.message
 import requests
 
 from proxyprotocol import ProxyProtocol
+import signedzonecache
 
 from eqdnsmessage import AssertEqualDNSMessageMixin
 
@@ -25,13 +28,65 @@ def have_ipv6():
     """
     try:
         sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
-        sock.bind(('::1', 56581))
+        sock.bind(('::1', 0))
         sock.close()
         return True
     except:
         return False
     return False
 
+def getWorkerID():
+    if not 'PYTEST_XDIST_WORKER' in os.environ:
+      return 0
+    workerName = os.environ['PYTEST_XDIST_WORKER']
+    return int(workerName[2:])
+
+def getWorkerPrefix():
+    """
+    The loopback prefix for the auths and responders of this worker: PREFIX
+    for the first one, the next ones each get the /24 after the previous one
+    """
+    prefix = os.environ['PREFIX'].split('.')
+    prefix[-1] = str(int(prefix[-1]) + getWorkerID())
+    return '.'.join(prefix)
+
+def workerHasIPv6():
+    """
+    ::1 is shared by all workers, only the first one gets to use it for auths
+    """
+    return getWorkerID() == 0 and have_ipv6()
+
+workerPorts = {}
+
+def pickAvailablePort():
+    global workerPorts
+    workerID = getWorkerID()
+    if workerID in workerPorts:
+      port = workerPorts[workerID] + 1
+    else:
+      port = 5300 + (workerID * 1000)
+    workerPorts[workerID] = port
+    return port
+
+# The auths of this worker that outlive the test class that started them, so
+# that the next classes needing the very same auth can use it as well. Keyed
+# by address, the values are (RecursorTest.authKey(), process)
+authFleet = {}
+# authKey() of the auth configs generated in this session, in configs/auths
+authFleetConfigs = set()
+
+def stopAuthFleet(keep=None):
+    """
+    Stop the auths of the fleet, except the ones in keep (address: authKey())
+    """
+    keep = keep or {}
+    for ipaddress, (key, auth) in list(authFleet.items()):
+        if keep.get(ipaddress) != key or auth.poll() is not None:
+            RecursorTest.killProcess(auth)
+            del authFleet[ipaddress]
+
+atexit.register(stopAuthFleet)
+
 
 class RecursorTest(AssertEqualDNSMessageMixin, unittest.TestCase):
     """
@@ -40,11 +95,11 @@ class RecursorTest(AssertEqualDNSMessageMixin, unittest.TestCase):
 
     _confdir = 'recursor'
 
-    _recursorPort = 5300
+    _recursorPort = pickAvailablePort()
 
     _recursor = None
 
-    _PREFIX = os.environ['PREFIX']
+    _PREFIX = getWorkerPrefix()
 
     _config_template_default = """
 daemon=no
@@ -90,8 +145,9 @@ logging:
     _roothints = """
 .                        3600 IN NS  ns.root.
 ns.root.                 3600 IN A   %s.8
-ns.root.                 3600 IN AAAA ::1
 """ % _PREFIX
+    if workerHasIPv6():
+        _roothints += "ns.root.                 3600 IN AAAA ::1\n"
     _root_DS = "63149 13 1 a59da3f5c1b97fcd5fa2b3b2b0ac91d38a60d33a"
 
     # The default SOA for zones in the authoritative servers
@@ -508,6 +564,10 @@ distributor-threads={threads}
                   threads=threads,
                   extra=extra))
 
+        # already there when restored from the signed zone cache
+        if os.path.exists(bind_dnssec_db):
+            return
+
         pdnsutilCmd = [os.environ['PDNSUTIL'],
                        '--config-dir=%s' % confdir,
                        'create-bind-db',
@@ -546,25 +606,40 @@ distributor-threads={threads}
         except subprocess.CalledProcessError as e:
             raise AssertionError('%s failed (%d): %s' % (pdnsutilCmd, e.returncode, e.output))
 
+    @classmethod
+    def generateAuth(cls, authconfdir, zoneinfo):
+        threads = zoneinfo['threads']
+        zones = zoneinfo['zones']
+
+        os.mkdir(authconfdir)
+
+        # the keys and NSEC(3) settings pdnsutil puts into the bind-dnssec db,
+        # from the signed zone cache when an earlier run did the same
+        signedZones = [(zone, cls._zones[zone].format(prefix=cls._PREFIX, soa=cls._SOA), cls._zone_keys.get(zone))
+                       for zone in zones if cls._zone_keys.get(zone, None)]
+        dbFiles = ['bind-dnssec.sqlite3']
+        cacheKey = signedzonecache.getCacheKey(cls, signedZones, dbFiles)
+        cached = signedzonecache.restoreFromCache(cacheKey, authconfdir, dbFiles)
+
+        cls.generateAuthConfig(authconfdir, threads)
+        cls.generateAuthNamedConf(authconfdir, zones)
+
+        for zone in zones:
+            cls.generateAuthZone(authconfdir,
+                                 zone,
+                                 cls._zones[zone])
+            if cls._zone_keys.get(zone, None) and not cached:
+                cls.secureZone(authconfdir, zone, cls._zone_keys.get(zone))
+
+        if not cached:
+            signedzonecache.storeInCache(cacheKey, authconfdir, dbFiles)
+
     @classmethod
     def generateAllAuthConfig(cls, confdir):
         if cls._auth_zones:
             for auth_suffix, zoneinfo in cls._auth_zones.items():
-                threads = zoneinfo['threads']
-                zones = zoneinfo['zones']
                 authconfdir = os.path.join(confdir, 'auth-%s' % auth_suffix)
-
-                os.mkdir(authconfdir)
-
-                cls.generateAuthConfig(authconfdir, threads)
-                cls.generateAuthNamedConf(authconfdir, zones)
-
-                for zone in zones:
-                    cls.generateAuthZone(authconfdir,
-                                         zone,
-                                         cls._zones[zone])
-                    if cls._zone_keys.get(zone, None):
-                        cls.secureZone(authconfdir, zone, cls._zone_keys.get(zone))
+                cls.generateAuth(authconfdir, zoneinfo)
 
     @classmethod
     def startAllAuth(cls, confdir):
@@ -574,6 +649,58 @@ distributor-threads={threads}
                 ipaddress = cls._PREFIX + '.' + auth_suffix
                 cls.startAuth(authconfdir, ipaddress)
 
+    @classmethod
+    def authKey(cls, auth_suffix, zoneinfo):
+        """
+        Hash of everything that goes into an auth of _auth_zones, auths with
+        the same hash serve the same content
+        """
+        secureZone = cls.secureZone.__func__
+        zones = [(zone, cls._zones[zone], cls._zone_keys.get(zone)) for zone in zoneinfo['zones']]
+        config = repr((cls._PREFIX, auth_suffix, zoneinfo['threads'], zones, cls._SOA,
+                       cls._auth_cmd, sorted(cls._auth_env.items()),
+                       secureZone.__module__, secureZone.__qualname__))
+        return hashlib.sha256(config.encode()).hexdigest()
+
+    _authFleetMethods = ('generateAllAuthConfig', 'generateAuth', 'generateAuthConfig',
+                         'generateAuthNamedConf', 'generateAuthZone', 'startAllAuth', 'startAuth')
+
+    @classmethod
+    def setUpAuth(cls, confdir):
+        """
+        Start the auths of _auth_zones, or keep the ones of the previous test
+        classes that are the same (see authKey). Their configs live in
+        configs/auths/<key>/auth-<suffix>, confdir links to them. Auths that
+        this class does not need are stopped, so only its own are running.
+        Classes that generate or start their auths differently get their own
+        ones in confdir, as before.
+        """
+        for method in cls._authFleetMethods:
+            if getattr(cls, method).__func__ is not getattr(RecursorTest, method).__func__:
+                stopAuthFleet()
+                cls.generateAllAuthConfig(confdir)
+                cls.startAllAuth(confdir)
+                return
+
+        wanted = {}
+        for auth_suffix, zoneinfo in (cls._auth_zones or {}).items():
+            wanted[cls._PREFIX + '.' + auth_suffix] = cls.authKey(auth_suffix, zoneinfo)
+        stopAuthFleet(keep=wanted)
+
+        for auth_suffix, zoneinfo in (cls._auth_zones or {}).items():
+            ipaddress = cls._PREFIX + '.' + auth_suffix
+            key = wanted[ipaddress]
+            authconfdir = os.path.join('configs', 'auths', key[:16], 'auth-%s' % auth_suffix)
+            if ipaddress not in authFleet:
+                if key not in authFleetConfigs:
+                    shutil.rmtree(os.path.dirname(authconfdir), ignore_errors=True)
+                    os.makedirs(os.path.dirname(authconfdir))
+                    cls.generateAuth(authconfdir, zoneinfo)
+                    authFleetConfigs.add(key)
+                cls.startAuth(authconfdir, ipaddress)
+                authFleet[ipaddress] = (key, cls._auths.pop(ipaddress))
+            os.symlink(os.path.abspath(authconfdir), os.path.join(confdir, 'auth-%s' % auth_suffix))
+
     @classmethod
     def waitForTCPSocket(cls, ipaddress, port):
         for try_number in range(0, 100):
@@ -595,7 +722,7 @@ distributor-threads={threads}
         authcmd.append('--config-dir=%s' % confdir)
         ipconfig = ipaddress
         # auth-8 is the auth serving the root, it gets an ipv6 address
-        if (confdir[-6:] == "auth-8") and have_ipv6():
+        if (confdir[-6:] == "auth-8") and workerHasIPv6():
             ipconfig += ',::1'
         authcmd.append('--local-address=%s' % ipconfig)
         print(' '.join(authcmd))
@@ -747,8 +874,7 @@ distributor-threads={threads}
 
         confdir = os.path.join('configs', cls._confdir)
         cls.createConfigDir(confdir)
-        cls.generateAllAuthConfig(confdir)
-        cls.startAllAuth(confdir)
+        cls.setUpAuth(confdir)
 
         cls.generateRecursorConfig(confdir)
         cls.startRecursor(confdir, cls._recursorPort)
@@ -791,6 +917,7 @@ distributor-threads={threads}
 
     @classmethod
     def tearDownAuth(cls):
+        # the auths of the fleet keep running for the next classes, see setUpAuth
         for _, auth in cls._auths.items():
             cls.killProcess(auth);
 
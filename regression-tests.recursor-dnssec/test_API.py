@@ -1,11 +1,11 @@
 import os
 import requests
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class APIAllowedRecursorTest(RecursorTest):
     _confdir = 'APIAllowedRecursor'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -30,7 +30,7 @@ api-key=%s
 
 class APIDeniedRecursorTest(RecursorTest):
     _confdir = 'APIDeniedRecursor'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
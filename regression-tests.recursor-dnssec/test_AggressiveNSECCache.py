@@ -1,5 +1,5 @@
 import dns
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 import os
 import requests
 import subprocess
@@ -8,7 +8,7 @@ import extendederrors
 
 class AggressiveNSECCacheBase(RecursorTest):
     __test__ = False
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 10
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
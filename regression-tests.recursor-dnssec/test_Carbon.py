@@ -6,7 +6,7 @@ import time
 import os
 from queue import Queue
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class CarbonTest(RecursorTest):
     _confdir = 'Carbon'
@@ -14,8 +14,8 @@ class CarbonTest(RecursorTest):
     _carbonInstance = 'Instance'
     _carbonServerName = "carbonname1"
     _carbonInterval = 2
-    _carbonServer1Port = 8000
-    _carbonServer2Port = 8001
+    _carbonServer1Port = pickAvailablePort()
+    _carbonServer2Port = pickAvailablePort()
     _carbonQueue1 = Queue()
     _carbonQueue2 = Queue()
     _carbonCounters = {}
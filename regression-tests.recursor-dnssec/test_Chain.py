@@ -2,7 +2,7 @@ import pytest
 import dns
 import os
 import time
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class ChainTest(RecursorTest):
     """
@@ -11,7 +11,7 @@ class ChainTest(RecursorTest):
     _auth_zones = RecursorTest._default_auth_zones
     _chainSize = 200
     _confdir = 'Chain'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -6,7 +6,7 @@ import threading
 import time
 import clientsubnetoption
 import unittest
-from recursortests import RecursorTest, have_ipv6
+from recursortests import RecursorTest, have_ipv6, pickAvailablePort
 from twisted.internet.protocol import DatagramProtocol
 from twisted.internet import reactor
 
@@ -16,6 +16,7 @@ nameECSInvalidScope = 'invalid-scope.ecs-echo.example.'
 ttlECS = 60
 ecsReactorRunning = False
 ecsReactorv6Running = False
+ecsReactorv6Port = pickAvailablePort()
 
 class ECSTest(RecursorTest):
     _config_template_default = """
@@ -90,7 +91,7 @@ ecs-add-for=0.0.0.0/0
             ecsReactorRunning = True
 
         if not ecsReactorv6Running and have_ipv6():
-            reactor.listenUDP(53000, UDPECSResponder(), interface='::1')
+            reactor.listenUDP(ecsReactorv6Port, UDPECSResponder(), interface='::1')
             ecsReactorv6Running = True
 
         if not reactor.running:
@@ -103,7 +104,7 @@ class NoECSTest(ECSTest):
 
     _config_template = """edns-subnet-allow-list=
 forward-zones=ecs-echo.example=%s.21
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', emptyECSText)
@@ -129,7 +130,7 @@ class IncomingNoECSTest(ECSTest):
     _config_template = """edns-subnet-allow-list=
 use-incoming-edns-subnet=yes
 forward-zones=ecs-echo.example=%s.21
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', emptyECSText)
@@ -156,7 +157,7 @@ class ECSByNameTest(ECSTest):
 
     _config_template = """edns-subnet-allow-list=ecs-echo.example.
 forward-zones=ecs-echo.example=%s.21
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '127.0.0.0/24')
@@ -190,7 +191,7 @@ ecs-ipv4-bits=32
 forward-zones=ecs-echo.example=%s.21
 ecs-ipv4-cache-bits=32
 ecs-ipv6-cache-bits=128
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '127.0.0.1/32')
@@ -222,7 +223,7 @@ class ECSByNameSmallerTest(ECSTest):
     _config_template = """edns-subnet-allow-list=ecs-echo.example.
 ecs-ipv4-bits=16
 forward-zones=ecs-echo.example=%s.21
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '127.0.0.0/16')
@@ -252,7 +253,7 @@ forward-zones=ecs-echo.example=%s.21
 ecs-scope-zero-address=2001:db8::42
 ecs-ipv4-cache-bits=32
 ecs-ipv6-cache-bits=128
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '192.0.2.0/24')
@@ -293,7 +294,7 @@ forward-zones=ecs-echo.example=%s.21
 ecs-scope-zero-address=192.168.0.1
 ecs-ipv4-cache-bits=32
 ecs-ipv6-cache-bits=128
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '192.0.2.1/32')
@@ -325,7 +326,7 @@ forward-zones=ecs-echo.example=%s.21
 ecs-scope-zero-address=192.168.0.1
 ecs-ipv4-cache-bits=32
 ecs-ipv6-cache-bits=128
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '192.0.0.0/16')
@@ -355,8 +356,8 @@ ecs-ipv6-bits=128
 ecs-ipv4-cache-bits=32
 ecs-ipv6-cache-bits=128
 query-local-address=::1
-forward-zones=ecs-echo.example=[::1]:53000
-    """
+forward-zones=ecs-echo.example=[::1]:%d
+    """ % (ecsReactorv6Port)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '2001:db8::1/128')
@@ -384,7 +385,7 @@ class ECSNameMismatchTest(ECSTest):
 
     _config_template = """edns-subnet-allow-list=not-the-right-name.example.
 forward-zones=ecs-echo.example=%s.21
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', emptyECSText)
@@ -409,7 +410,7 @@ class ECSByIPTest(ECSTest):
 
     _config_template = """edns-subnet-allow-list=%s.21
 forward-zones=ecs-echo.example=%s.21
-    """ % (os.environ['PREFIX'], os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX, RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '127.0.0.0/24')
@@ -439,7 +440,7 @@ forward-zones=ecs-echo.example=%s.21
 ecs-scope-zero-address=::1
 ecs-ipv4-cache-bits=32
 ecs-ipv6-cache-bits=128
-    """ % (os.environ['PREFIX'], os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX, RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', '192.0.2.0/24')
@@ -475,7 +476,7 @@ class ECSIPMismatchTest(ECSTest):
 
     _config_template = """edns-subnet-allow-list=192.0.2.1
 forward-zones=ecs-echo.example=%s.21
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
     def testSendECS(self):
         expected = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'TXT', emptyECSText)
@@ -504,7 +505,7 @@ class ECSWithProxyProtocolRecursorTest(ECSTest):
     forward-zones=ecs-echo.example=%s.21
     proxy-protocol-from=127.0.0.1/32
     allow-from=2001:db8::1/128
-""" % (os.environ['PREFIX'])
+""" % (RecursorTest._PREFIX)
 
     def testProxyProtocolPlusECS(self):
         qname = nameECS
@@ -599,7 +600,7 @@ class UDPECSResponder(DatagramProtocol):
         elif request.question[0].name == dns.name.from_text(nameECS) and request.question[0].rdtype == dns.rdatatype.NS:
             answer = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'NS', 'ns1.ecs-echo.example.')
             response.answer.append(answer)
-            additional = dns.rrset.from_text('ns1.ecs-echo.example.', 15, dns.rdataclass.IN, 'A', os.environ['PREFIX'] + '.21')
+            additional = dns.rrset.from_text('ns1.ecs-echo.example.', 15, dns.rdataclass.IN, 'A', RecursorTest._PREFIX + '.21')
             response.additional.append(additional)
 
         if ecso:
@@ -51,7 +51,7 @@ qname-minimization=no
 forward-zones=edns-tests.example=%s.22
 udp-truncation-threshold=%d
 edns-outgoing-bufsize=%d
-    """ % (os.environ['PREFIX'], _udpTruncationThreshold, _ednsOutgoingBufsize)
+    """ % (RecursorTest._PREFIX, _udpTruncationThreshold, _ednsOutgoingBufsize)
 
     @classmethod
     def startResponders(cls):
@@ -179,7 +179,7 @@ qname-minimization=no
 forward-zones=edns-tests.example=%s.22
 udp-truncation-threshold=%d
 edns-outgoing-bufsize=%d
-    """ % (os.environ['PREFIX'], _udpTruncationThreshold, _ednsOutgoingBufsize)
+    """ % (RecursorTest._PREFIX, _udpTruncationThreshold, _ednsOutgoingBufsize)
 
     def testEdnsBufferTestCase03(self):
         query = self.getMessage('03', 4096)
@@ -203,7 +203,7 @@ qname-minimization=no
 forward-zones=edns-tests.example=%s.22
 udp-truncation-threshold=%d
 edns-outgoing-bufsize=%d
-    """ % (os.environ['PREFIX'], _udpTruncationThreshold, _ednsOutgoingBufsize)
+    """ % (RecursorTest._PREFIX, _udpTruncationThreshold, _ednsOutgoingBufsize)
 
     def testEdnsBufferTestCase04(self):
         query = self.getMessage('04', 4096)
@@ -9,7 +9,7 @@ import threading
 import time
 import yaml
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class FWCatzServer(object):
 
@@ -227,7 +227,7 @@ class FWCatzServer(object):
                 print('Error in FWCatz socket: %s' % str(e))
                 sock.close()
 
-fwCatzServerPort = 4252
+fwCatzServerPort = pickAvailablePort()
 fwCatzServer = FWCatzServer(fwCatzServerPort)
 
 class FWCatzXFRRecursorTest(RecursorTest):
@@ -237,7 +237,7 @@ class FWCatzXFRRecursorTest(RecursorTest):
 
     global fwCatzServerPort
     _confdir = 'FWCatzXFRRecursor'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
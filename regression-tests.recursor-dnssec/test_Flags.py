@@ -2,7 +2,7 @@ import os
 import socket
 
 import dns
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 
 class FlagsTest(RecursorTest):
@@ -13,10 +13,10 @@ class FlagsTest(RecursorTest):
     _dnssec_setting = None
     _recursors = {}
 
-    _dnssec_setting_ports = {'off': 5300,
-                             'process-no-validate': 5301,
-                             'process': 5302,
-                             'validate': 5303}
+    _dnssec_setting_ports = {'off': pickAvailablePort(),
+                             'process-no-validate': pickAvailablePort(),
+                             'process': pickAvailablePort(),
+                             'validate': pickAvailablePort()}
 
     @classmethod
     def setUp(cls):
@@ -30,8 +30,7 @@ class FlagsTest(RecursorTest):
         confdir = os.path.join('configs', cls._confdir)
         cls.createConfigDir(confdir)
 
-        cls.generateAllAuthConfig(confdir)
-        cls.startAllAuth(confdir)
+        cls.setUpAuth(confdir)
 
         for dnssec_setting, port in cls._dnssec_setting_ports.items():
             cls._dnssec_setting = dnssec_setting
@@ -15,7 +15,7 @@ class InteropTest(RecursorTest):
 packetcache-ttl=0 # explicitly disable packetcache
 forward-zones=undelegated.secure.example=%s.12
 forward-zones+=undelegated.insecure.example=%s.12
-    """ % (os.environ['PREFIX'], os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX, RecursorTest._PREFIX)
 
     def testFORMERR(self):
         """
@@ -160,7 +160,7 @@ class InteropProcessTest(RecursorTest):
 packetcache-ttl=0 # explicitly disable packetcache
 forward-zones=undelegated.secure.example=%s.12
 forward-zones+=undelegated.insecure.example=%s.12
-    """ % (os.environ['PREFIX'], os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX, RecursorTest._PREFIX)
 
     def testNonApexDNSKEY2(self):
         """
@@ -242,7 +242,7 @@ class UDPResponder(DatagramProtocol):
             elif request.question[0].name == dns.name.from_text('insecure-formerr.example.') and request.question[0].rdtype == dns.rdatatype.NS:
                 answer = dns.rrset.from_text('insecure-formerr.example.', 15, dns.rdataclass.IN, 'NS', 'ns1.insecure-formerr.example.')
                 response.answer.append(answer)
-                additional = dns.rrset.from_text('ns1.insecure-formerr.example.', 15, dns.rdataclass.IN, 'A', '127.0.0.2')
+                additional = dns.rrset.from_text('ns1.insecure-formerr.example.', 15, dns.rdataclass.IN, 'A', RecursorTest._PREFIX + '.2')
                 response.additional.append(additional)
 
         self.transport.write(response.to_wire(), address)
@@ -239,7 +239,7 @@ class LuaHooksRecursorTest(RecursorTest):
 forward-zones=luahooks.example=%s.23
 log-common-errors=yes
 quiet=no
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
     _lua_dns_script_file = """
 
     allowedips = newNMG()
@@ -321,7 +321,7 @@ quiet=no
       return false
     end
 
-    """ % (os.environ['PREFIX'], os.environ['PREFIX'], os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX, RecursorTest._PREFIX, RecursorTest._PREFIX)
 
     @classmethod
     def startResponders(cls):
@@ -422,7 +422,7 @@ log-common-errors=yes
 pdns-distributes-queries=yes
 threads=2
 quiet=no
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
 
 class LuaDNS64Test(RecursorTest):
     """Tests the dq.followupAction("getFakeAAAARecords")"""
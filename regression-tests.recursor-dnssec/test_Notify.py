@@ -5,7 +5,7 @@ import os
 import requests
 import subprocess
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class NotifyTest(RecursorTest):
 
@@ -15,7 +15,7 @@ class NotifyTest(RecursorTest):
     }
 
     _confdir = 'Notify'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
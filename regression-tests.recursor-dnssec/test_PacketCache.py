@@ -5,7 +5,7 @@ import os
 import requests
 import subprocess
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class PacketCacheTest(RecursorTest):
 
@@ -15,7 +15,7 @@ class PacketCacheTest(RecursorTest):
     }
 
     _confdir = 'PacketCache'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
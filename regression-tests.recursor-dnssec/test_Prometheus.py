@@ -3,7 +3,7 @@ import requests
 import subprocess
 import unittest
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class RecPrometheusTest(RecursorTest):
  
@@ -42,7 +42,7 @@ class RecPrometheusTest(RecursorTest):
 
 class BasicPrometheusTest(RecPrometheusTest):
     _confdir = 'BasicPrometheus'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -67,7 +67,7 @@ api-key=%s
 
 class HttpsPrometheusTest(RecPrometheusTest):
     _confdir = 'HttpsPrometheus'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
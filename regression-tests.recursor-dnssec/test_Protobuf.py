@@ -19,7 +19,7 @@ try:
 except NameError:
   pass
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 def ProtobufConnectionHandler(queue, conn):
     data = None
@@ -66,7 +66,7 @@ class ProtobufServerParams:
     self.queue = Queue()
     self.port = port
 
-protobufServersParameters = [ProtobufServerParams(4243), ProtobufServerParams(4244)]
+protobufServersParameters = [ProtobufServerParams(pickAvailablePort()), ProtobufServerParams(pickAvailablePort())]
 protobufListeners = []
 for param in protobufServersParameters:
   listener = threading.Thread(name='Protobuf Listener', target=ProtobufListener, args=[param.queue, param.port])
@@ -12,12 +12,12 @@ try:
 except NameError:
     pass
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 from proxyprotocol import ProxyProtocol
 
 class ProxyProtocolAllowedTest(RecursorTest):
     _confdir = 'ProxyProtocolAllowed'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -9,7 +9,7 @@ import sys
 import threading
 import time
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class RPZServer(object):
 
@@ -222,7 +222,7 @@ class RPZServer(object):
                 sock.close()
 
 class RPZRecursorTest(RecursorTest):
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -375,7 +375,7 @@ log-rpz-changes=yes
         self.assertEqual(zone['transfers_full'], fullXFRCount)
         self.assertEqual(zone['transfers_success'], totalXFRCount)
 
-rpzServerPort = 4250
+rpzServerPort = pickAvailablePort()
 rpzServer = RPZServer(rpzServerPort)
 
 class RPZXFRRecursorTest(RPZRecursorTest):
@@ -389,7 +389,7 @@ class RPZXFRRecursorTest(RPZRecursorTest):
     -- The first server is a bogus one, to test that we correctly fail over to the second one
     rpzMaster({'127.0.0.1:9999', '127.0.0.1:%d'}, 'zone.rpz.', { refresh=1, includeSOA=true, dumpFile="configs/%s/rpz.zone.dump"})
     """ % (rpzServerPort, _confdir)
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -790,7 +790,7 @@ class RPZSimpleAuthServer(object):
             except socket.error as e:
                 print('Error in RPZ simple auth socket: %s' % str(e))
 
-rpzAuthServerPort = 4260
+rpzAuthServerPort = pickAvailablePort()
 rpzAuthServer = RPZSimpleAuthServer(rpzAuthServerPort)
 
 class RPZOrderingPrecedenceRecursorTest(RPZRecursorTest):
@@ -993,7 +993,6 @@ class RPZCNameChainCustomTest(RPZRecursorTest):
     (with QName Minimization).
     """
 
-    _PREFIX = os.environ['PREFIX']
     _confdir = 'RPZCNameChainCustom'
     _lua_config_file = """
     rpzFile('configs/%s/zone.rpz', { policyName="zone.rpz."})
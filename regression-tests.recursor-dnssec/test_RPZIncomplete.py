@@ -8,7 +8,7 @@ import sys
 import threading
 import time
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class BadRPZServer(object):
 
@@ -125,7 +125,7 @@ class BadRPZServer(object):
                 sock.close()
 
 class RPZIncompleteRecursorTest(RecursorTest):
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -166,7 +166,7 @@ log-rpz-changes=yes
         self.assertEqual(zone['transfers_success'], totalXFRCount)
         self.assertEqual(zone['transfers_failed'], failedXFRCount)
 
-badrpzServerPort = 4251
+badrpzServerPort = pickAvailablePort()
 badrpzServer = BadRPZServer(badrpzServerPort)
 
 class RPZXFRIncompleteRecursorTest(RPZIncompleteRecursorTest):
@@ -180,7 +180,7 @@ class RPZXFRIncompleteRecursorTest(RPZIncompleteRecursorTest):
     rpzMaster({'127.0.0.1:9999', '127.0.0.1:%d'}, 'zone.rpz.', { refresh=1 })
     """ % (badrpzServerPort)
     _confdir = 'RPZXFRIncompleteRecursor'
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
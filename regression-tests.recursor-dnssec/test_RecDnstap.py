@@ -308,7 +308,7 @@ dnstapFrameStreamServer({"%s"})
         # check the dnstap message corresponding to the UDP query
         dnstap = self.getFirstDnstap()
 
-        checkDnstapQuery(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.8')
+        checkDnstapQuery(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', self._PREFIX + '.8')
         # We don't expect a response
         checkDnstapNoExtra(self, dnstap)
         # We don't expect anything more, but we'll sleep anyway to avoid a LeakSanitizer race
@@ -369,7 +369,7 @@ dnstapNODFrameStreamServer({"%s"})
         # check the dnstap message corresponding to the UDP query
         dnstap = self.getFirstDnstap()
 
-        checkDnstapNOD(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', 5300, name)
+        checkDnstapNOD(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', self._recursorPort, name)
         # We don't expect a response
         checkDnstapNoExtra(self, dnstap)
         # We don't expect anything more
@@ -406,7 +406,7 @@ dnstapNODFrameStreamServer({"%s"}, {logNODs=false, logUDRs=true})
         # check the dnstap message corresponding to the UDP query
         dnstap = self.getFirstDnstap()
 
-        checkDnstapUDR(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', 5300, name)
+        checkDnstapUDR(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', self._recursorPort, name)
         # We don't expect a rpasesponse
         checkDnstapNoExtra(self, dnstap)
         # We don't expect anything more
@@ -441,10 +441,10 @@ dnstapNODFrameStreamServer({"%s"}, {logNODs=true, logUDRs=true})
         self.assertNotEqual(res, None)
 
         dnstap = self.getFirstDnstap()
-        checkDnstapUDR(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', 5300, name)
+        checkDnstapUDR(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', self._recursorPort, name)
 
         dnstap = self.getFirstDnstap()
-        checkDnstapNOD(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', 5300, name)
+        checkDnstapNOD(self, dnstap, dnstap_pb2.UDP, '127.0.0.1', '127.0.0.1', self._recursorPort, name)
 
         checkDnstapNoExtra(self, dnstap)
         # We don't expect anything more
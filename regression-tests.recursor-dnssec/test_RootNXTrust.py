@@ -4,7 +4,7 @@ import socket
 import time
 import extendederrors
 
-from recursortests import RecursorTest
+from recursortests import RecursorTest, pickAvailablePort
 
 class RootNXTrustRecursorTest(RecursorTest):
 
@@ -36,7 +36,7 @@ class RootNXTrustRecursorTest(RecursorTest):
 class RootNXTrustDisabledTest(RootNXTrustRecursorTest):
     _confdir = 'RootNXTrustDisabled'
     _auth_zones = RecursorTest._default_auth_zones
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -90,7 +90,7 @@ extended-resolution-errors
 class RootNXTrustEnabledTest(RootNXTrustRecursorTest):
     _confdir = 'RootNXTrustEnabled'
     _auth_zones = RecursorTest._default_auth_zones
-    _wsPort = 8042
+    _wsPort = pickAvailablePort()
     _wsTimeout = 2
     _wsPassword = 'secretpassword'
     _apiKey = 'secretapikey'
@@ -98,7 +98,7 @@ class RoutingTagTest(RoutingTagTest):
 use-incoming-edns-subnet=yes
 edns-subnet-allow-list=ecs-echo.example.
 forward-zones=ecs-echo.example=%s.24
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
     _lua_dns_script_file = """
 
 function gettag(remote, ednssubnet, localip, qname, qtype, ednsoptions, tcp, proxyProtocolValues)
@@ -172,7 +172,7 @@ class RoutingTagFFITest(RoutingTagTest):
 use-incoming-edns-subnet=yes
 edns-subnet-allow-list=ecs-echo.example.
 forward-zones=ecs-echo.example=%s.24
-    """ % (os.environ['PREFIX'])
+    """ % (RecursorTest._PREFIX)
     _lua_dns_script_file = """
 
 local ffi = require("ffi")
@@ -284,7 +284,7 @@ class UDPRoutingResponder(DatagramProtocol):
         elif request.question[0].name == dns.name.from_text(nameECS) and request.question[0].rdtype == dns.rdatatype.NS:
             answer = dns.rrset.from_text(nameECS, ttlECS, dns.rdataclass.IN, 'NS', 'ns1.ecs-echo.example.')
             response.answer.append(answer)
-            additional = dns.rrset.from_text('ns1.ecs-echo.example.', 15, dns.rdataclass.IN, 'A', os.environ['PREFIX'] + '.24')
+            additional = dns.rrset.from_text('ns1.ecs-echo.example.', 15, dns.rdataclass.IN, 'A', RecursorTest._PREFIX + '.24')
             response.additional.append(additional)
 
         if ecso:
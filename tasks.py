@@ -986,6 +986,7 @@ backend_regress_tests = dict(
         'remotebackend-unix',
         'remotebackend-http',
         'remotebackend-zeromq',
+        'remotebackend-prefork',
         'remotebackend-pipe-dnssec',
         'remotebackend-unix-dnssec',
         'remotebackend-http-dnssec',